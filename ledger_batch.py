@@ -0,0 +1,263 @@
+"""Serial and multi-process batch validation of ledger log streams.
+
+The parallel path splits the log into record-aligned chunks, validates them in a
+process pool and yields results in input order, so its output is identical to the
+serial path.
+"""
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from ledger_core import (
+    ParseTally,
+    RecordShapeError,
+    compile_rules,
+    iter_json_records,
+    iter_record_spans,
+    iter_stream_records,
+    iter_object_results,
+    iter_stream_spans,
+    rule_labels,
+)
+from ledger_columnar import iter_columnar_results
+from ledger_mmap import iter_buffer_records, iter_mmap_records, iter_range_boundaries, map_log
+from ledger_projection import projected_loads
+
+CHUNK_BYTES = 4 << 20  # raw record text handed to a worker at a time
+PENDING_PER_WORKER = 2  # chunks in flight per worker before the reader waits
+
+
+def _rules_for(rule_spec):
+    """Compile a rule spec, or return None (the default rules) when there is none."""
+    return None if rule_spec is None else compile_rules(rule_spec)
+
+
+def _loads_for(rules, project):
+    """Record parser: json.loads, or a projection parser reading only what rules check."""
+    return projected_loads(rules) if project else json.loads
+
+
+def validate_records(records, targets, rules=None, columnar=False, target_table=None, metrics=None,
+                     tally=None):
+    """Yield a per-object result for every ledger record in an iterable.
+    Results are compact ledger_core.ObjectResult records that read like validate_record's
+    dicts; no record dict outlives its own validation.
+    columnar=True validates the records in column batches instead of object by object.
+    target_table (a ledger_targets.TargetTable) gives each object its own targets.
+    metrics (a ledger_metrics.Metrics) times fetching each record as "scan" and each
+    record's validation as "validate". Records not shaped like a ledger record are
+    skipped and counted in tally.invalid (tally is a ledger_core.ParseTally, or None).
+    """
+    if metrics is not None:
+        records = metrics.timed_records(records)
+    if columnar:
+        yield from iter_columnar_results(records, targets, rules, target_table=target_table, tally=tally)
+        return
+    perf = time.perf_counter
+    labels = rule_labels(rules)
+    for data_all in records:
+        if not isinstance(data_all, dict):
+            continue
+        t0 = perf()
+        try:
+            results = list(iter_object_results(data_all, targets, rules, target_table, labels))
+        except RecordShapeError:
+            if tally is not None:
+                tally.invalid += 1
+            continue
+        if metrics is not None:
+            metrics.observe("validate", perf() - t0)
+        yield from results
+
+
+def _counted_loads(loads, metrics, tally):
+    if tally is not None:
+        loads = tally.counting(loads)
+    return loads if metrics is None else metrics.timed_loads(loads)
+
+
+def iter_results(stream, targets, rule_spec=None, columnar=False, project=False, target_table=None,
+                 metrics=None, dedup=None, tally=None):
+    """Validate a log stream in this process, yielding per-object results in order.
+    project=True parses only the record fields validation reads. dedup (a
+    ledger_dedup.Deduplicator) skips duplicate and replayed records. tally (a
+    ledger_core.ParseTally) counts the records parsed and the malformed blocks skipped.
+    """
+    rules = _rules_for(rule_spec)
+    loads = _counted_loads(_loads_for(rules, project), metrics, tally)
+    if dedup is None:
+        records = iter_stream_records(stream, loads=loads)
+    else:
+        records = dedup.iter_records(iter_stream_spans(stream), loads)
+    return validate_records(records, targets, rules, columnar, target_table, metrics, tally)
+
+
+def iter_chunks(stream, chunk_bytes=CHUNK_BYTES, dedup=None):
+    """Group the records of a log stream into newline-joined chunks of about chunk_bytes.
+    Chunks only ever split between records, and log noise between records is dropped.
+    With dedup, duplicate and replayed records are dropped here, before any worker sees them.
+    """
+    texts = iter_stream_spans(stream)
+    if dedup is not None:
+        texts = dedup.iter_texts(texts)
+    return _join_chunks(texts, chunk_bytes)
+
+
+def _join_chunks(texts, chunk_bytes):
+    parts = []
+    size = 0
+    for text in texts:
+        parts.append(text)
+        size += len(text)
+        if size >= chunk_bytes:
+            yield "\n".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield "\n".join(parts)
+
+
+def validate_chunk(chunk, targets, rule_spec=None, columnar=False, project=False, target_table=None):
+    """Worker entry point: validate one chunk and return its results as a list, with the
+    chunk's ParseTally. Rules travel as their spec and are compiled in the worker, since
+    checks are closures.
+    """
+    rules = _rules_for(rule_spec)
+    tally = ParseTally()
+    records = iter_json_records(chunk, loads=tally.counting(_loads_for(rules, project)))
+    return list(validate_records(records, targets, rules, columnar, target_table, tally=tally)), tally
+
+
+def validate_file_range(path, start, end, targets, rule_spec=None, columnar=False, project=False,
+                        target_table=None):
+    """Worker entry point: validate the records in one byte range of a log file, returning
+    them with the range's ParseTally. The worker maps the file itself, so only the
+    offsets cross the process boundary.
+    """
+    rules = _rules_for(rule_spec)
+    tally = ParseTally()
+    with map_log(path) as mm:
+        records = iter_buffer_records(mm, start, end, loads=tally.counting(_loads_for(rules, project)))
+        return list(validate_records(records, targets, rules, columnar, target_table, tally=tally)), tally
+
+
+def _drain_in_order(pool, jobs, max_pending, tally=None, metrics=None):
+    """Submit (fn, *args) jobs to the pool and yield their results in submission order.
+    At most max_pending jobs are in flight, so memory stays bounded no matter how far
+    the producer could run ahead of the pool. Each job's ParseTally is added to tally,
+    and its record and byte counts to metrics.
+    """
+    pending = deque()
+
+    def take():
+        results, part = pending.popleft().result()
+        if tally is not None:
+            tally.add(part)
+        if metrics is not None:
+            # The in-process path counts these in timed_loads: malformed blocks add bytes only.
+            metrics.inc("records", part.records)
+            metrics.inc("bytes", part.record_bytes + part.malformed_bytes)
+        return results
+
+    for fn, *args in jobs:
+        pending.append(pool.submit(fn, *args))
+        if len(pending) >= max_pending:
+            yield from take()
+    while pending:
+        yield from take()
+
+
+def iter_results_parallel(stream, targets, workers, chunk_bytes=CHUNK_BYTES, rule_spec=None,
+                          columnar=False, project=False, target_table=None, dedup=None, tally=None,
+                          metrics=None):
+    """Validate a log stream across a process pool, yielding per-object results in order.
+    metrics gets each chunk's record and byte counts; the stages run in the workers, untimed.
+    """
+    jobs = (
+        (validate_chunk, chunk, targets, rule_spec, columnar, project, target_table)
+        for chunk in iter_chunks(stream, chunk_bytes, dedup)
+    )
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from _drain_in_order(pool, jobs, workers * PENDING_PER_WORKER, tally, metrics)
+
+
+def iter_file_results_parallel(path, targets, workers, chunk_bytes=CHUNK_BYTES, rule_spec=None,
+                               columnar=False, project=False, target_table=None, dedup=None,
+                               tally=None, metrics=None):
+    """Validate a memory-mapped log file across a process pool, yielding results in order.
+    Without dedup only byte offsets go to the workers. With it, this process has to see
+    every record first, so the surviving record texts are sent in chunks instead.
+    """
+    with map_log(path) as mm, ProcessPoolExecutor(max_workers=workers) as pool:
+        if dedup is None:
+            jobs = (
+                (validate_file_range, path, start, end, targets, rule_spec, columnar, project, target_table)
+                for start, end in iter_range_boundaries(mm, chunk_bytes)
+            )
+        else:
+            texts = dedup.iter_texts(
+                mm[start:end].decode("utf-8", errors="replace") for start, end in iter_record_spans(mm)
+            )
+            jobs = (
+                (validate_chunk, chunk, targets, rule_spec, columnar, project, target_table)
+                for chunk in _join_chunks(texts, chunk_bytes)
+            )
+        yield from _drain_in_order(pool, jobs, workers * PENDING_PER_WORKER, tally, metrics)
+
+
+def resolve_workers(workers):
+    """Turn a --workers value into a usable process count; 0 means one per CPU.
+    Falls back to 1 on platforms where a process pool cannot be started.
+    """
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    workers = max(workers, 1)
+    if workers > 1:
+        try:
+            ProcessPoolExecutor(max_workers=1).shutdown()
+        except (NotImplementedError, OSError):
+            workers = 1
+    return workers
+
+
+def iter_batch_results(stream, targets, workers=1, chunk_bytes=CHUNK_BYTES, rule_spec=None,
+                       columnar=False, project=False, target_table=None, metrics=None, dedup=None,
+                       tally=None):
+    """Validate a log stream with the given worker count (1 = in this process).
+    metrics gets per-stage timings on the in-process path and record and byte counts on
+    both. dedup runs in this process on either path, and tally counts records and
+    malformed blocks on both.
+    """
+    workers = resolve_workers(workers)
+    if workers == 1:
+        return iter_results(stream, targets, rule_spec, columnar, project, target_table, metrics, dedup,
+                            tally)
+    return iter_results_parallel(stream, targets, workers, chunk_bytes, rule_spec, columnar, project,
+                                 target_table, dedup, tally, metrics)
+
+
+def _iter_mmap_deduped(path, loads, dedup):
+    with map_log(path) as mm:
+        yield from dedup.iter_records((mm[start:end] for start, end in iter_record_spans(mm)), loads)
+
+
+def iter_file_batch_results(path, targets, workers=1, chunk_bytes=CHUNK_BYTES, rule_spec=None,
+                            columnar=False, project=False, target_table=None, metrics=None, dedup=None,
+                            tally=None):
+    """Validate a log file through a memory map with the given worker count.
+    metrics gets per-stage timings on the in-process path and record and byte counts on
+    both. dedup runs in this process on either path, and tally counts records and
+    malformed blocks on both.
+    """
+    workers = resolve_workers(workers)
+    if workers == 1:
+        rules = _rules_for(rule_spec)
+        loads = _counted_loads(_loads_for(rules, project), metrics, tally)
+        if dedup is None:
+            records = iter_mmap_records(path, loads=loads)
+        else:
+            records = _iter_mmap_deduped(path, loads, dedup)
+        return validate_records(records, targets, rules, columnar, target_table, metrics, tally)
+    return iter_file_results_parallel(path, targets, workers, chunk_bytes, rule_spec, columnar,
+                                      project, target_table, dedup, tally, metrics)
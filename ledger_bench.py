@@ -0,0 +1,246 @@
+"""Benchmarks for the parsing, validation and rendering hot paths.
+
+Each benchmark runs one function over every item of a synthetic log (ledger_synth) at
+several scale tiers. It reports throughput, p50/p99 latency per call and the peak
+memory one full pass allocates. Results can be saved as a JSON baseline and a later
+run compared against it:
+
+    python ledger_bench.py --output baseline.json
+    python ledger_bench.py --compare baseline.json --threshold 0.2
+
+Latency is timed without tracing; peak memory comes from a separate tracemalloc pass,
+so the tracing overhead never shows up in the timings.
+"""
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+from ledger_batch import iter_results, validate_records
+from ledger_core import (
+    build_verification_rows,
+    extract_json,
+    extract_payload,
+    parse_iso_epoch,
+    parse_publish_time,
+)
+from ledger_render import job_details_html, object_panel_html, verification_table_html
+from ledger_synth import iter_log_lines
+
+# records, objects per record, content bytes per object
+TIERS = {
+    "small": (200, 1, 256),
+    "medium": (1000, 4, 2048),
+    "large": (250, 40, 4096),
+}
+TARGETS = ("CPI YOY Index", "1", "2024-03")
+EXPECTATIONS = ("10001", "ECO_RELEASE_001", "ECO0001")
+JOB_URL_TEMPLATE = "https://example.com/jobs/{job_id}"
+STREAM_NOISE = 0.5  # noise lines per record in the end-to-end stream benchmark
+STREAM_MALFORMED = 0.01
+
+
+def build_inputs(records, objects, content_bytes, seed=0):
+    """Pre-build every benchmark's inputs for one tier, so setup is never timed."""
+    lines = list(iter_log_lines(records, objects, content_bytes, seed=seed))
+    texts = [line[line.index("{"):] for line in lines]
+    parsed = [json.loads(text) for text in texts]
+    payloads = [(data_all, extract_payload(data_all)) for data_all in parsed]
+    obj_args = [
+        (meta, content, p["job_props"], p["job_meta"], data_all)
+        for data_all, p in payloads
+        for meta, content in p["objects"]
+    ]
+    rows = [
+        build_verification_rows(meta, TARGETS, None, content, props, job_meta)[0]
+        for meta, content, props, job_meta, _ in obj_args
+    ]
+    details = [
+        job_details_html(meta, content, props, job_meta, data_all, EXPECTATIONS, JOB_URL_TEMPLATE)
+        for meta, content, props, job_meta, data_all in obj_args
+    ]
+    stream_text = "\n".join(iter_log_lines(records, objects, content_bytes, STREAM_NOISE,
+                                           STREAM_MALFORMED, seed=seed))
+    return {
+        "lines": lines,
+        "texts": texts,
+        "pub_times": [p["pub_time_str"] for _, p in payloads],
+        "obj_args": obj_args,
+        "rows": rows,
+        "panels": list(zip(rows, details)),
+        "stream": [stream_text],
+        "records": [parsed],
+    }
+
+
+def _consume_stream(text):
+    for _ in iter_results(io.StringIO(text), TARGETS):
+        pass
+
+
+def _consume_records(records, columnar=False):
+    for _ in validate_records(records, TARGETS, columnar=columnar):
+        pass
+
+
+# name -> (inputs key, function of one input item, whether items carry a byte size)
+BENCHMARKS = {
+    "extract_json": ("lines", extract_json, True),
+    "json.loads": ("texts", json.loads, True),
+    "parse_publish_time": ("pub_times", parse_publish_time, False),
+    "parse_iso_epoch": ("pub_times", parse_iso_epoch, False),
+    "build_verification_rows": (
+        "obj_args",
+        lambda a: build_verification_rows(a[0], TARGETS, None, a[1], a[2], a[3]),
+        False,
+    ),
+    "verification_table_html": ("rows", lambda rows: verification_table_html(rows, True), False),
+    "job_details_html": (
+        "obj_args",
+        lambda a: job_details_html(a[0], a[1], a[2], a[3], a[4], EXPECTATIONS, JOB_URL_TEMPLATE),
+        False,
+    ),
+    "object_panel_html": ("panels", lambda p: object_panel_html(p[0], True, p[1]), False),
+    "stream_validate": ("stream", _consume_stream, True),
+    # The same parsed records validated object by object, then as columnar batches.
+    "validate_records": ("records", _consume_records, False),
+    "validate_columnar": ("records", lambda records: _consume_records(records, columnar=True), False),
+}
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def run_benchmark(fn, items, sized, repeat=3):
+    """Time fn over every item repeat times; returns the result dict for one benchmark."""
+    perf = time.perf_counter_ns
+    latencies = []
+    pass_seconds = []
+    for _ in range(repeat):
+        start = perf()
+        for item in items:
+            t0 = perf()
+            fn(item)
+            latencies.append(perf() - t0)
+        pass_seconds.append((perf() - start) / 1e9)
+
+    tracemalloc.start()
+    for item in items:
+        fn(item)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies.sort()
+    seconds = statistics.median(pass_seconds)
+    result = {
+        "calls": len(items),
+        "ops_per_sec": len(items) / seconds if seconds else 0.0,
+        "p50_us": _percentile(latencies, 0.50) / 1e3,
+        "p99_us": _percentile(latencies, 0.99) / 1e3,
+        "peak_kb": peak / 1024,
+    }
+    if sized:
+        total = sum(len(item) for item in items)
+        result["mb_per_sec"] = total / seconds / 1e6 if seconds else 0.0
+    return result
+
+
+def run_suite(tiers, names=None, repeat=3, seed=0, report=None):
+    """Run the named benchmarks (default all) on each tier; returns {tier: {name: result}}."""
+    results = {}
+    for tier in tiers:
+        inputs = build_inputs(*TIERS[tier], seed=seed)
+        results[tier] = {}
+        for name, (key, fn, sized) in BENCHMARKS.items():
+            if names and name not in names:
+                continue
+            results[tier][name] = run_benchmark(fn, inputs[key], sized, repeat)
+            if report:
+                report(tier, name, results[tier][name])
+    return results
+
+
+def format_row(tier, name, result):
+    mb = f"{result['mb_per_sec']:9.1f}" if "mb_per_sec" in result else f"{'-':>9}"
+    return (f"{tier:<7} {name:<24} {result['ops_per_sec']:>12,.0f} {mb} "
+            f"{result['p50_us']:>10.1f} {result['p99_us']:>10.1f} {result['peak_kb']:>10,.0f}")
+
+
+HEADER = (f"{'tier':<7} {'benchmark':<24} {'ops/s':>12} {'MB/s':>9} "
+          f"{'p50 us':>10} {'p99 us':>10} {'peak KB':>10}")
+
+
+def compare(results, baseline, threshold):
+    """Regressions against a baseline: (tier, name, metric, old, new) where a metric got
+    worse by more than threshold (a fraction). Throughput falls, latency and memory rise.
+    """
+    regressions = []
+    for tier, benches in results.items():
+        for name, new in benches.items():
+            old = baseline.get(tier, {}).get(name)
+            if not old:
+                continue
+            if new["ops_per_sec"] < old["ops_per_sec"] * (1 - threshold):
+                regressions.append((tier, name, "ops_per_sec", old["ops_per_sec"], new["ops_per_sec"]))
+            for metric in ("p50_us", "p99_us", "peak_kb"):
+                if old[metric] and new[metric] > old[metric] * (1 + threshold):
+                    regressions.append((tier, name, metric, old[metric], new[metric]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the ledger parsing, validation and rendering paths.")
+    parser.add_argument("--tiers", default="small,medium,large",
+                        help=f"Comma-separated scale tiers (default all: {', '.join(TIERS)})")
+    parser.add_argument("--bench", action="append", choices=list(BENCHMARKS),
+                        help="Run only this benchmark (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed passes per benchmark (default 3)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic log seed (default 0)")
+    parser.add_argument("--output", help="Write the results to this JSON baseline file")
+    parser.add_argument("--compare", help="Baseline JSON file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Relative change counted as a regression (default 0.2 = 20%%)")
+    args = parser.parse_args(argv)
+
+    tiers = [t.strip() for t in args.tiers.split(",") if t.strip()]
+    unknown = [t for t in tiers if t not in TIERS]
+    if unknown:
+        parser.error(f"unknown tier(s): {', '.join(unknown)}")
+
+    print(HEADER)
+    results = run_suite(tiers, args.bench, args.repeat, args.seed,
+                        report=lambda tier, name, result: print(format_row(tier, name, result), flush=True))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "tiers": {tier: TIERS[tier] for tier in tiers},
+                "results": results,
+            }, f, indent=2)
+        print(f"Baseline written to {args.output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.threshold)
+        for tier, name, metric, old, new in regressions:
+            print(f"REGRESSION {tier} {name} {metric}: {old:,.1f} -> {new:,.1f}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+"""Bounded, thread-safe LRU caches keyed on content hashes.
+
+The Streamlit app reruns from the top on every interaction; these caches let it skip
+re-parsing a payload it has already seen and re-validating when nothing relevant
+changed. Entries expire after a TTL and the caches are capped by entry count and by
+total weight (e.g. raw payload bytes), so memory stays bounded on a shared server.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+def payload_key(raw_input):
+    """Stable content hash of a raw log string."""
+    return hashlib.blake2b(raw_input.encode("utf-8", errors="surrogatepass"), digest_size=16).hexdigest()
+
+
+class TTLCache:
+    """LRU cache with an entry cap, an optional total-weight cap and a per-entry TTL."""
+
+    def __init__(self, max_entries=32, ttl_seconds=1800, max_weight=None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_weight = max_weight
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, weight, value)
+        self._weight = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value and mark it recently used, or default if absent/expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, value, weight=1):
+        """Store a value, evicting least recently used entries to stay within the caps.
+        A value heavier than max_weight on its own is not cached.
+        """
+        if self.max_weight is not None and weight > self.max_weight:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, weight, value)
+            self._weight += weight
+            while len(self._entries) > self.max_entries or (
+                self.max_weight is not None and self._weight > self.max_weight
+            ):
+                self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._weight = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _drop(self, key):
+        _, weight, _ = self._entries.pop(key)
+        self._weight -= weight
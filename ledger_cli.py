@@ -0,0 +1,688 @@
+"""Command-line batch validation for bbds_ledger.py log files.
+
+Usage:
+    python ledger_cli.py validate ledger.log [--ticker T] [--scaling S] [--period P] [--workers N]
+    python ledger_cli.py validate ledger.log --mmap --workers 0
+    python ledger_cli.py validate ledger.log --latency [--as-of 2024-03-12T13:00:00Z]
+    cat ledger.log | python ledger_cli.py validate -
+    python ledger_cli.py watch ledger.log [--from-start] [--offset-file state.json]
+    python ledger_cli.py fetch JOB_ID [JOB_ID ...] [--job-file ids.txt] [--humio-url URL]
+    python ledger_cli.py diff test.log prod.log [--ignore-env] [--ignore PATH]
+    python ledger_cli.py index ledger.log [--rebuild]
+    python ledger_cli.py lookup ledger.log --job-id J [--ticker-value T] [--agent-id A] [--ecoticker E]
+    python ledger_cli.py serve [--port 8765] [--workers 8] [--rules rules.json]
+    python ledger_cli.py history [--job-id J] [--env PROD] [--failed] [--since 7d] [--count]
+
+Streams the log, validates every ledger record it finds and writes one result line
+per object. Exits with status 1 if any object has a failing check. watch follows a
+growing log instead and validates records as they are appended, until interrupted.
+fetch pulls the ledger lines for a list of jobIds from a Humio search API and validates them.
+diff compares two logs record by record, e.g. a job's TEST run and its PROD run.
+index keeps a sidecar byte-offset index of a log up to date, and lookup uses it to seek
+straight to the records for a jobId, tickerValue, agentId or ecoticker and validate them.
+serve runs a local HTTP validation service for automation (see ledger_server.py).
+history queries the web app's validation history database.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from contextlib import ExitStack
+
+from ledger_batch import iter_batch_results, iter_file_batch_results, validate_records
+from ledger_core import ParseTally, compile_rules, load_rule_spec, parse_iso_epoch
+from ledger_dedup import DEDUP_CAPACITY, DEDUP_ERROR_RATE, DEDUP_MODES, Deduplicator, format_summary
+from ledger_diff import ENV_DIFF_PATHS, MISSING, diff_logs, diff_to_dict, is_identical, parse_ignore
+from ledger_jsonview import JsonPathError, format_json_path
+from ledger_history import PAGE_SIZE, HistoryStore, parse_age
+from ledger_index import INDEX_FIELDS, LogIndex, iter_span_records, read_spans
+from ledger_latency import LatencyStats, format_report
+from ledger_metrics import Metrics, write_prometheus
+from ledger_humio import FETCH_WORKERS, QUERY_START, HumioClient, iter_line_records, parse_job_ids
+from ledger_projection import projected_loads
+from ledger_server import (
+    DEFAULT_HOST,
+    DEFAULT_PORT,
+    DEFAULT_WORKERS,
+    MAX_BATCH_BYTES,
+    MAX_BODY_BYTES,
+    QUEUE_PER_WORKER,
+    ValidationServer,
+)
+from ledger_targets import load_target_table
+from ledger_watch import POLL_INTERVAL, LogFollower
+
+TSV_COLUMNS = ["jobId", "env", "object", "tickerValue", "pass", "fail", "warn", "review", "failing"]
+
+
+def open_log(path):
+    """Open a log file (or stdin for '-') as a text stream."""
+    if path == "-":
+        return sys.stdin
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def format_result(result, fmt):
+    """Render one per-object result as an output line."""
+    if fmt == "tsv":
+        values = [",".join(result[c]) if c == "failing" else result[c] for c in TSV_COLUMNS]
+        return "\t".join("" if v is None else str(v) for v in values)
+    if not isinstance(result, dict):
+        result = result.as_dict()  # a compact ObjectResult from the batch path
+    return json.dumps(result, separators=(",", ":"))
+
+
+def read_rules(path):
+    """Load and compile a --rules file; returns (spec, rules), or (None, None) for the defaults.
+    Raises OSError or ValueError for an unreadable or invalid file.
+    """
+    if not path:
+        return None, None
+    rule_spec = load_rule_spec(path)
+    return rule_spec, compile_rules(rule_spec)
+
+
+def read_target_table(path):
+    """Load a --targets-file expectations table, or None when there is none.
+    Raises OSError or ValueError for an unreadable or invalid file.
+    """
+    return load_target_table(path) if path else None
+
+
+def write_header(out, fmt):
+    if fmt == "tsv":
+        out.write("\t".join(TSV_COLUMNS) + "\n")
+
+
+def write_metrics(path, metrics):
+    try:
+        write_prometheus(path, [metrics])
+    except OSError as e:
+        print(f"Cannot write metrics file: {e}", file=sys.stderr)
+
+
+def make_latency(args):
+    """A LatencyStats for --latency / --latency-file, or None. Raises ValueError for a bad --as-of."""
+    if not (args.latency or args.latency_file):
+        return None
+    now = None
+    if getattr(args, "as_of", None):
+        now = parse_iso_epoch(args.as_of)
+        if now is None:
+            raise ValueError(f"--as-of is not an ISO-8601 timestamp: {args.as_of!r}")
+    return LatencyStats(now=now)
+
+
+def write_latency(args, latency):
+    report = latency.summary()
+    if args.latency:
+        for line in format_report(report):
+            print(line, file=sys.stderr)
+    if args.latency_file:
+        try:
+            with open(args.latency_file, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        except OSError as e:
+            print(f"Cannot write latency file: {e}", file=sys.stderr)
+
+
+def make_dedup(args):
+    """A Deduplicator for --dedup, or None. Raises ValueError for a bad --dedup-error-rate."""
+    if not args.dedup:
+        return None
+    return Deduplicator(args.dedup, args.dedup_capacity, args.dedup_error_rate)
+
+
+def report_malformed(tally):
+    if tally.malformed:
+        print(f"{tally.malformed} malformed blocks skipped ({tally.malformed_bytes:,} bytes)", file=sys.stderr)
+    if tally.invalid:
+        print(f"{tally.invalid} records skipped: not shaped like a ledger record", file=sys.stderr)
+
+
+def report_dedup(dedup, metrics=None):
+    for line in format_summary(dedup.summary()):
+        print(line, file=sys.stderr)
+    if metrics is not None and dedup.skipped:
+        metrics.inc("duplicates", dedup.skipped)
+
+
+def cmd_validate(args):
+    """Validate every record in a log file and write one line per object."""
+    targets = (args.ticker, args.scaling, args.period)
+    try:
+        rule_spec, _ = read_rules(args.rules)  # fail fast, before any worker starts
+        target_table = read_target_table(args.targets_file)
+        latency = make_latency(args)
+        dedup = make_dedup(args)
+    except (OSError, ValueError) as e:
+        print(f"Invalid rules, targets file, --as-of or --dedup options: {e}", file=sys.stderr)
+        return 2
+    metrics = Metrics({"mode": "batch"}) if args.metrics_file else None
+    tally = ParseTally()
+    out = sys.stdout
+    write_header(out, args.format)
+
+    objects = failed = 0
+    started = time.perf_counter()
+    try:
+        with ExitStack() as stack:
+            if args.mmap:
+                results = iter_file_batch_results(args.log, targets, args.workers, rule_spec=rule_spec,
+                                                  columnar=args.columnar, project=args.project,
+                                                  target_table=target_table, metrics=metrics, dedup=dedup,
+                                                  tally=tally)
+            else:
+                stream = stack.enter_context(open_log(args.log))
+                results = iter_batch_results(stream, targets, args.workers, rule_spec=rule_spec,
+                                             columnar=args.columnar, project=args.project,
+                                             target_table=target_table, metrics=metrics, dedup=dedup,
+                                             tally=tally)
+            if latency is not None:
+                results = latency.track(results)
+            for result in results:
+                out.write(format_result(result, args.format) + "\n")
+                objects += 1
+                if result["fail"]:
+                    failed += 1
+    except OSError as e:
+        print(f"Cannot read log: {e}", file=sys.stderr)
+        return 2
+
+    print(f"{objects} objects validated, {failed} with failures", file=sys.stderr)
+    report_malformed(tally)
+    if dedup is not None:
+        report_dedup(dedup, metrics)
+    if metrics is not None:
+        metrics.observe("run", time.perf_counter() - started, objects=objects, failed=failed)
+        write_metrics(args.metrics_file, metrics)
+    if latency is not None:
+        write_latency(args, latency)
+    return 1 if failed else 0
+
+
+def cmd_watch(args):
+    """Follow a log file and write one line per object as new records are appended."""
+    targets = (args.ticker, args.scaling, args.period)
+    try:
+        _, rules = read_rules(args.rules)
+        target_table = read_target_table(args.targets_file)
+        latency = make_latency(args)
+        dedup = make_dedup(args)
+    except (OSError, ValueError) as e:
+        print(f"Invalid rules, targets file or --dedup options: {e}", file=sys.stderr)
+        return 2
+    loads = projected_loads(rules) if args.project else json.loads
+    metrics = Metrics({"mode": "watch", "log": os.path.basename(args.log)}) if args.metrics_file else None
+    follower = LogFollower(args.log, targets, rules, offset_file=args.offset_file,
+                           from_start=args.from_start, loads=loads, target_table=target_table,
+                           metrics=metrics, latency=latency, dedup=dedup)
+    out = sys.stdout
+    write_header(out, args.format)
+    try:
+        while True:
+            results = follower.poll()
+            for result in results:
+                out.write(format_result(result, args.format) + "\n")
+            out.flush()
+            if metrics is not None and results:
+                write_metrics(args.metrics_file, metrics)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        follower.stop()
+        if metrics is not None:
+            write_metrics(args.metrics_file, metrics)
+    print(f"{follower.objects} objects validated, {follower.failed} with failures "
+          f"({follower.rotations} rotations)", file=sys.stderr)
+    report_malformed(follower.tally)
+    if dedup is not None:
+        report_dedup(dedup)
+    if latency is not None:
+        write_latency(args, latency)
+    return 0
+
+
+def cmd_fetch(args):
+    """Fetch the ledger lines for each jobId from Humio and write one line per object."""
+    targets = (args.ticker, args.scaling, args.period)
+    job_ids = parse_job_ids(" ".join(args.job_ids))
+    try:
+        _, rules = read_rules(args.rules)
+        target_table = read_target_table(args.targets_file)
+        if args.job_file:
+            with open(args.job_file, "r", encoding="utf-8") as f:
+                job_ids = parse_job_ids(" ".join(job_ids) + "\n" + f.read())
+    except (OSError, ValueError) as e:
+        print(f"Invalid input: {e}", file=sys.stderr)
+        return 2
+    if not job_ids:
+        print("No jobIds given", file=sys.stderr)
+        return 2
+    if not args.humio_url or not args.repository:
+        print("Set --humio-url and --repository (or HUMIO_API_URL and HUMIO_REPOSITORY)", file=sys.stderr)
+        return 2
+    loads = projected_loads(rules) if args.project else json.loads
+    try:
+        client = HumioClient(args.humio_url, args.repository, token=os.environ.get("HUMIO_API_TOKEN"),
+                             start=args.start)
+    except ValueError as e:
+        print(f"Invalid Humio URL: {e}", file=sys.stderr)
+        return 2
+    out = sys.stdout
+    write_header(out, args.format)
+
+    objects = failed = errors = 0
+    tally = ParseTally()
+    try:
+        for job_id, lines, error in client.fetch_jobs(job_ids, args.workers):
+            if error is not None:
+                print(error, file=sys.stderr)
+                errors += 1
+                continue
+            found = 0
+            for result in validate_records(iter_line_records(lines, loads), targets, rules,
+                                           target_table=target_table, tally=tally):
+                out.write(format_result(result, args.format) + "\n")
+                found += 1
+                if result["fail"]:
+                    failed += 1
+            if not found:
+                print(f"{job_id}: no ledger records found", file=sys.stderr)
+            objects += found
+    finally:
+        client.close()
+    print(f"{len(job_ids)} jobs, {objects} objects validated, {failed} with failures, "
+          f"{errors} failed queries", file=sys.stderr)
+    report_malformed(tally)
+    if errors:
+        return 2
+    return 1 if failed else 0
+
+
+def _change_text(change):
+    parts, a, b = change
+    old = "(missing)" if a is MISSING else json.dumps(a)[:120]
+    new = "(missing)" if b is MISSING else json.dumps(b)[:120]
+    return f"{format_json_path(parts) or '(whole object)'}: {old} -> {new}"
+
+
+def format_diff_text(result):
+    """Lines describing one paired (or unpaired) record of a diff_logs run."""
+    lines = [f"== {result['jobName']} ({result['jobId_a'] or '-'} -> {result['jobId_b'] or '-'})"]
+    if "diff" not in result:
+        lines.append(f"  only in {'A' if result['jobId_a'] else 'B'}")
+        return lines
+    diff = result["diff"]
+    lines += ["  " + _change_text(c) for c in diff["job"]]
+    for obj in diff["objects"]:
+        i, j = obj["index"]
+        lines += [f"  [{obj['ticker']} #{i + 1}/#{j + 1}] " + _change_text(c) for c in obj["changes"]]
+    lines += [f"  only in A: {o['ticker']} (#{o['index'] + 1})" for o in diff["only_a"]]
+    lines += [f"  only in B: {o['ticker']} (#{o['index'] + 1})" for o in diff["only_b"]]
+    lines.append(f"  {diff['same']} objects identical")
+    return lines
+
+
+def cmd_diff(args):
+    """Diff two logs record by record (records paired on jobName) and report what differs."""
+    try:
+        ignore = parse_ignore(list(args.ignore or ()) + (list(ENV_DIFF_PATHS) if args.ignore_env else []))
+    except JsonPathError as e:
+        print(f"Invalid --ignore path: {e}", file=sys.stderr)
+        return 2
+    out = sys.stdout
+    records = differing = 0
+    try:
+        for result in diff_logs(args.a, args.b, ignore):
+            records += 1
+            if "diff" in result and is_identical(result["diff"]):
+                continue
+            differing += 1
+            if args.format == "text":
+                out.write("\n".join(format_diff_text(result)) + "\n")
+            else:
+                if "diff" in result:
+                    result = {**result, "diff": diff_to_dict(result["diff"])}
+                out.write(json.dumps(result, separators=(",", ":")) + "\n")
+    except OSError as e:
+        print(f"Cannot read log: {e}", file=sys.stderr)
+        return 2
+    print(f"{records} records compared, {differing} differ", file=sys.stderr)
+    return 1 if differing else 0
+
+
+def open_index(args):
+    """The LogIndex for args.log, brought up to date unless --no-update; None (after an
+    error message) if the log or its index cannot be opened.
+    """
+    if not os.path.isfile(args.log):
+        print(f"No such file: {args.log}", file=sys.stderr)
+        return None
+    try:
+        index = LogIndex(args.log, args.index_file)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Cannot open index: {e}", file=sys.stderr)
+        return None
+    try:
+        if not getattr(args, "no_update", False):
+            index.update(rebuild=getattr(args, "rebuild", False))
+    except (OSError, sqlite3.Error) as e:
+        index.close()
+        print(f"Cannot index log: {e}", file=sys.stderr)
+        return None
+    return index
+
+
+def report_index_update(index):
+    if index.skipped:
+        print(f"{index.skipped} malformed blocks skipped", file=sys.stderr)
+    if index.pending:
+        print(f"Stopped at byte {index.stopped_at:,}: the record there ({index.pending:,} bytes so far) "
+              "has not closed yet; it is indexed by the next update", file=sys.stderr)
+
+
+def cmd_index(args):
+    """Build or update a log's sidecar index and print what it holds."""
+    started = time.perf_counter()
+    index = open_index(args)
+    if index is None:
+        return 2
+    with index:
+        stats = index.stats()
+    keys = ", ".join(f"{n} {field}" for field, n in stats["keys"].items())
+    print(f"{stats['records']} records indexed to byte {stats['indexed_to']:,} of {stats['log_bytes']:,} in "
+          f"{time.perf_counter() - started:.2f}s ({keys}) -> {index.index_path}", file=sys.stderr)
+    report_index_update(index)
+    return 0
+
+
+def cmd_lookup(args):
+    """Validate (or print) only the records of a log that match the given keys, found through
+    its sidecar index instead of a full scan.
+    """
+    targets = (args.ticker, args.scaling, args.period)
+    filters = {field: values for field, values in zip(INDEX_FIELDS, (
+        args.job_id, args.ticker_value, args.agent_id, args.ecoticker)) if values}
+    if not filters:
+        print("Give at least one of --job-id, --ticker-value, --agent-id or --ecoticker", file=sys.stderr)
+        return 2
+    try:
+        _, rules = read_rules(args.rules)
+        target_table = read_target_table(args.targets_file)
+    except (OSError, ValueError) as e:
+        print(f"Invalid rules or targets file: {e}", file=sys.stderr)
+        return 2
+    index = open_index(args)
+    if index is None:
+        return 2
+    with index:
+        spans = index.lookup(filters)
+    report_index_update(index)
+    if not spans:
+        print("No matching records", file=sys.stderr)
+        return 0
+    out = sys.stdout
+    if args.raw:
+        for text in read_spans(args.log, spans):
+            out.write(text + "\n")
+        print(f"{len(spans)} matching records", file=sys.stderr)
+        return 0
+
+    write_header(out, args.format)
+    loads = projected_loads(rules) if args.project else json.loads
+    tickers = set(args.ticker_value or ())
+    objects = failed = 0
+    tally = ParseTally()
+    for result in validate_records(iter_span_records(args.log, spans, loads), targets, rules,
+                                   target_table=target_table, tally=tally):
+        if tickers and result["tickerValue"] not in tickers:
+            continue  # another object of a record that matched on one of its tickers
+        out.write(format_result(result, args.format) + "\n")
+        objects += 1
+        if result["fail"]:
+            failed += 1
+    print(f"{len(spans)} matching records, {objects} objects validated, {failed} with failures",
+          file=sys.stderr)
+    report_malformed(tally)
+    return 1 if failed else 0
+
+
+def cmd_serve(args):
+    """Run the HTTP validation service until interrupted."""
+    try:
+        _, rules = read_rules(args.rules)
+        target_table = read_target_table(args.targets_file)
+    except (OSError, ValueError) as e:
+        print(f"Invalid rules or targets file: {e}", file=sys.stderr)
+        return 2
+    if args.workers < 1:
+        print("--workers must be at least 1", file=sys.stderr)
+        return 2
+    try:
+        server = ValidationServer((args.host, args.port), args.workers, args.queue,
+                                  (args.ticker, args.scaling, args.period), rules, target_table,
+                                  args.max_body_bytes, args.max_batch_bytes, access_log=args.access_log)
+    except OSError as e:
+        print(f"Cannot listen on {args.host}:{args.port}: {e}", file=sys.stderr)
+        return 2
+    host, port = server.server_address[:2]
+    print(f"Validating on http://{host}:{port} with {server.workers} workers "
+          f"(POST /validate, POST /validate/batch, GET /stats, GET /metrics)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        stats = server.stats()
+        print(f"{stats['requests']} requests served, {stats['rejected']} rejected", file=sys.stderr)
+    return 0
+
+
+def cmd_history(args):
+    """Print matching validation runs from the history database, newest first."""
+    if not os.path.exists(args.db):
+        print(f"No history database at {args.db}", file=sys.stderr)
+        return 2
+    try:
+        since = time.time() - parse_age(args.since) if args.since else None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    filters = {
+        "job_id": args.job_id,
+        "job_name": args.job_name,
+        "env": args.env,
+        "ticker": args.ticker,
+        "since": since,
+        "failed": True if args.failed else None,
+    }
+    store = HistoryStore(args.db)
+    try:
+        if args.count:
+            print(store.count(**filters))
+            return 0
+        for entry in store.query(args.limit, **filters):
+            print(json.dumps(entry, separators=(",", ":")))
+    finally:
+        store.close()
+    return 0
+
+
+def add_latency_args(parser, as_of=True):
+    """Add the publish-latency report options."""
+    parser.add_argument("--latency", action="store_true",
+                        help="Print publish-latency percentiles, slowest jobs/tickers and stalest records")
+    parser.add_argument("--latency-file", help="Write the publish-latency report here as JSON")
+    if as_of:
+        parser.add_argument("--as-of", metavar="TIMESTAMP",
+                            help="Measure drift against this ISO-8601 time instead of now "
+                                 "(for reports over old logs)")
+
+
+def add_dedup_args(parser):
+    """Add the duplicate / replay detection options."""
+    parser.add_argument("--dedup", nargs="?", const="exact", choices=DEDUP_MODES,
+                        help="Skip records already seen (same text, or same jobId/tickerValue/publishTime "
+                             "for every object) and report them; 'bloom' uses a fixed-size Bloom filter")
+    parser.add_argument("--dedup-capacity", type=int, default=DEDUP_CAPACITY,
+                        help=f"Fingerprints remembered, or per Bloom generation (default {DEDUP_CAPACITY:,})")
+    parser.add_argument("--dedup-error-rate", type=float, default=DEDUP_ERROR_RATE,
+                        help=f"Bloom filter false-positive rate (default {DEDUP_ERROR_RATE})")
+
+
+def add_target_args(parser):
+    """Add the scenario target options shared by validation commands."""
+    parser.add_argument("--ticker", default="", help="Target tickerValue")
+    parser.add_argument("--scaling", default="", help="Target scalingFactor")
+    parser.add_argument("--period", default="", help="Target observationPeriod")
+    parser.add_argument("--targets-file",
+                        help="CSV or JSON expectations table keyed by tickerValue or ecoticker; "
+                             "each object is checked against its own row")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Validate BORG ledger logs from the command line.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_validate = sub.add_parser("validate", help="Validate every record in a ledger log")
+    p_validate.add_argument("log", help="Path to a bbds_ledger.py log file, or '-' for stdin")
+    p_validate.add_argument("--format", choices=["jsonl", "tsv"], default="jsonl", help="Output format")
+    p_validate.add_argument("--workers", type=int, default=1,
+                            help="Worker processes (default 1, 0 = one per CPU)")
+    p_validate.add_argument("--mmap", action="store_true",
+                            help="Memory-map the log file instead of streaming it (not for stdin)")
+    p_validate.add_argument("--columnar", action="store_true",
+                            help="Validate records in column batches (uses NumPy when installed)")
+    p_validate.add_argument("--project", action="store_true",
+                            help="Parse only the record fields the rules read, skipping object content")
+    p_validate.add_argument("--rules", help="JSON rule spec to validate with instead of the default checks")
+    p_validate.add_argument("--metrics-file",
+                            help="Write per-stage timings and counters here in Prometheus text format "
+                                 "(stage timings need --workers 1)")
+    add_target_args(p_validate)
+    add_latency_args(p_validate)
+    add_dedup_args(p_validate)
+    p_validate.set_defaults(func=cmd_validate)
+
+    p_watch = sub.add_parser("watch", help="Follow a growing ledger log and validate new records")
+    p_watch.add_argument("log", help="Path to a bbds_ledger.py log file")
+    p_watch.add_argument("--format", choices=["jsonl", "tsv"], default="jsonl", help="Output format")
+    p_watch.add_argument("--from-start", action="store_true",
+                         help="Without a saved offset, start at the beginning instead of the end")
+    p_watch.add_argument("--offset-file",
+                         help="JSON file to persist the read offset in, so a restart resumes there")
+    p_watch.add_argument("--interval", type=float, default=POLL_INTERVAL,
+                         help=f"Seconds between checks for new lines (default {POLL_INTERVAL})")
+    p_watch.add_argument("--project", action="store_true",
+                         help="Parse only the record fields the rules read, skipping object content")
+    p_watch.add_argument("--rules", help="JSON rule spec to validate with instead of the default checks")
+    p_watch.add_argument("--metrics-file",
+                         help="Keep per-stage timings and counters here in Prometheus text format")
+    add_target_args(p_watch)
+    add_latency_args(p_watch, as_of=False)
+    add_dedup_args(p_watch)
+    p_watch.set_defaults(func=cmd_watch)
+
+    p_fetch = sub.add_parser("fetch", help="Fetch ledger records by jobId from Humio and validate them")
+    p_fetch.add_argument("job_ids", nargs="*", metavar="JOB_ID", help="jobIds to fetch")
+    p_fetch.add_argument("--job-file", help="File of jobIds, one per line (or comma separated)")
+    p_fetch.add_argument("--humio-url", default=os.environ.get("HUMIO_API_URL"),
+                         help="Humio base URL (default $HUMIO_API_URL); the token is read from $HUMIO_API_TOKEN")
+    p_fetch.add_argument("--repository", default=os.environ.get("HUMIO_REPOSITORY"),
+                         help="Humio repository to search (default $HUMIO_REPOSITORY)")
+    p_fetch.add_argument("--start", default=QUERY_START,
+                         help=f"Search window, in Humio relative time (default {QUERY_START})")
+    p_fetch.add_argument("--workers", type=int, default=FETCH_WORKERS,
+                         help=f"jobIds queried at once (default {FETCH_WORKERS})")
+    p_fetch.add_argument("--format", choices=["jsonl", "tsv"], default="jsonl", help="Output format")
+    p_fetch.add_argument("--project", action="store_true",
+                         help="Parse only the record fields the rules read, skipping object content")
+    p_fetch.add_argument("--rules", help="JSON rule spec to validate with instead of the default checks")
+    add_target_args(p_fetch)
+    p_fetch.set_defaults(func=cmd_fetch)
+
+    p_diff = sub.add_parser("diff", help="Diff two ledger records or logs, e.g. a TEST run and its PROD run")
+    p_diff.add_argument("a", help="First log file (e.g. the TEST run)")
+    p_diff.add_argument("b", help="Second log file (e.g. the PROD run)")
+    p_diff.add_argument("--ignore", action="append", metavar="PATH",
+                        help="Skip a field: a record path (data.jobProperties.agentId) or an object path "
+                             "(objectMetadata.releaseDate); repeatable")
+    p_diff.add_argument("--ignore-env", action="store_true",
+                        help=f"Skip the fields a TEST and a PROD run always differ in: {', '.join(ENV_DIFF_PATHS)}")
+    p_diff.add_argument("--format", choices=["jsonl", "text"], default="text", help="Output format")
+    p_diff.set_defaults(func=cmd_diff)
+
+    p_index = sub.add_parser("index", help="Build or update a log's sidecar byte-offset index")
+    p_index.add_argument("log", help="Path to a bbds_ledger.py log file")
+    p_index.add_argument("--index-file", help="Index file (default: the log path plus .index.sqlite3)")
+    p_index.add_argument("--rebuild", action="store_true", help="Index the whole log again from the start")
+    p_index.set_defaults(func=cmd_index)
+
+    p_lookup = sub.add_parser("lookup", help="Validate only the records matching a jobId, ticker, agentId "
+                                             "or ecoticker, found through the sidecar index")
+    p_lookup.add_argument("log", help="Path to a bbds_ledger.py log file")
+    p_lookup.add_argument("--job-id", action="append", help="Records with this jobId (repeatable)")
+    p_lookup.add_argument("--ticker-value", action="append",
+                          help="Objects with this tickerValue (repeatable); other objects of a record are left out")
+    p_lookup.add_argument("--agent-id", action="append", help="Records with this agentId (repeatable)")
+    p_lookup.add_argument("--ecoticker", action="append", help="Records with this ecoticker (repeatable)")
+    p_lookup.add_argument("--index-file", help="Index file (default: the log path plus .index.sqlite3)")
+    p_lookup.add_argument("--no-update", action="store_true",
+                          help="Use the index as it is instead of indexing newly appended records first")
+    p_lookup.add_argument("--raw", action="store_true", help="Print the matching record texts instead of validating")
+    p_lookup.add_argument("--format", choices=["jsonl", "tsv"], default="jsonl", help="Output format")
+    p_lookup.add_argument("--project", action="store_true",
+                          help="Parse only the record fields the rules read, skipping object content")
+    p_lookup.add_argument("--rules", help="JSON rule spec to validate with instead of the default checks")
+    add_target_args(p_lookup)
+    p_lookup.set_defaults(func=cmd_lookup)
+
+    p_serve = sub.add_parser("serve", help="Run a local HTTP validation service for automated callers")
+    p_serve.add_argument("--host", default=DEFAULT_HOST, help=f"Address to listen on (default {DEFAULT_HOST})")
+    p_serve.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default {DEFAULT_PORT}, 0 = any)")
+    p_serve.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                         help=f"Worker threads serving connections (default {DEFAULT_WORKERS})")
+    p_serve.add_argument("--queue", type=int,
+                         help=f"Connections waiting for a worker before new ones get 503 "
+                              f"(default {QUEUE_PER_WORKER} per worker)")
+    p_serve.add_argument("--max-body-bytes", type=int, default=MAX_BODY_BYTES,
+                         help=f"Largest /validate body (default {MAX_BODY_BYTES:,})")
+    p_serve.add_argument("--max-batch-bytes", type=int, default=MAX_BATCH_BYTES,
+                         help=f"Largest /validate/batch body (default {MAX_BATCH_BYTES:,})")
+    p_serve.add_argument("--access-log", action="store_true", help="Log every request to stderr")
+    p_serve.add_argument("--rules", help="JSON rule spec to validate with instead of the default checks")
+    add_target_args(p_serve)
+    p_serve.set_defaults(func=cmd_serve)
+
+    p_history = sub.add_parser("history", help="Query the validation history database")
+    p_history.add_argument("--db", default=os.environ.get(
+        "BORG_HISTORY_DB", os.path.join(os.path.expanduser("~"), ".borg_history.sqlite3")),
+        help="History database (default $BORG_HISTORY_DB or ~/.borg_history.sqlite3)")
+    p_history.add_argument("--job-id", help="Only runs of this jobId")
+    p_history.add_argument("--job-name", help="Only runs of this jobName")
+    p_history.add_argument("--env", choices=["PROD", "TEST", "INVALID"], help="Only runs in this environment")
+    p_history.add_argument("--ticker", help="Only runs that included this tickerValue")
+    p_history.add_argument("--failed", action="store_true", help="Only runs with a failing check")
+    p_history.add_argument("--since", help="Only runs newer than this age, e.g. 12h or 7d")
+    p_history.add_argument("--limit", type=int, default=PAGE_SIZE, help=f"Runs to print (default {PAGE_SIZE})")
+    p_history.add_argument("--count", action="store_true", help="Print the number of matching runs instead")
+    p_history.set_defaults(func=cmd_history)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "mmap", False) and args.log == "-":
+        parser.error("--mmap needs a log file path, not stdin")
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""Columnar validation of many ledger objects at once.
+
+Instead of running every compiled rule object by object, each checked field is pulled
+into one column for the whole batch and the rule is applied to the column with
+vectorized comparisons. NumPy is used when it is installed; otherwise the same table
+is built with plain lists and array('b') columns.
+"""
+import sys
+from array import array
+
+from ledger_core import (
+    CAT_FAIL,
+    CAT_NOT_APPLICABLE,
+    CAT_PASS,
+    CAT_REVIEW,
+    CAT_WARN,
+    CATEGORIES,
+    DEFAULT_RULES,
+    RULE_SOURCES,
+    TARGET_NAMES,
+    JobFields,
+    ObjectResult,
+    RecordShapeError,
+    env_label,
+    extract_payload,
+)
+
+try:
+    import numpy as np
+    _np_strings = getattr(np, "strings", np.char)  # NumPy 2 string ufuncs, else np.char
+except ImportError:  # optional dependency
+    np = None
+
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}
+
+# Fields carried into the table alongside the rule columns.
+EXTRA_FIELDS = ("wireId", "class")
+
+COLUMNAR_BATCH = 10000  # records per table when validating a stream
+
+
+def extract_column(source_lists, path):
+    """Pull one dotted rule path out of every object into a list, in a single comprehension."""
+    root, *keys = path.split(".")
+    items = source_lists[RULE_SOURCES.index(root)]
+    if len(keys) == 1:
+        key = keys[0]
+        return [item.get(key) for item in items]
+    column = []
+    for node in items:
+        for key in keys:
+            node = node.get(key) if isinstance(node, dict) else None
+        column.append(node)
+    return column
+
+
+def _object_array(values):
+    """1-D object array of values. np.array() would make equal-length lists a 2-D array."""
+    obj = np.empty(len(values), dtype=object)
+    obj[:] = values
+    return obj
+
+
+def _text_array(values):
+    """str() of each value as a string array. obj.astype(str) fails on list values."""
+    return np.array([str(v) for v in values], dtype=str)
+
+
+def _categories_numpy(rule, values, goal):
+    """Category codes for one rule over one column, using NumPy comparisons."""
+    obj = _object_array(values)
+    text = _text_array(values)
+    empty = (obj == None) | (_np_strings.str_len(_np_strings.strip(text)) == 0)  # noqa: E711
+
+    if rule.r_type == "binary":
+        codes = np.full(len(obj), CAT_FAIL, dtype=np.int8)
+        codes[obj == "YES"] = CAT_WARN
+        codes[obj == "NO"] = CAT_PASS
+    elif rule.r_type == "fixed" and isinstance(goal, str):
+        codes = np.where(obj == goal, CAT_PASS, CAT_FAIL).astype(np.int8)
+    elif rule.r_type == "target" and isinstance(goal, list):
+        goals = _object_array(goal)
+        codes = np.where(text == _text_array(goal), CAT_PASS, CAT_FAIL).astype(np.int8)
+        codes[goals == ""] = CAT_REVIEW
+    elif rule.r_type == "target":
+        if not goal:
+            codes = np.full(len(obj), CAT_REVIEW, dtype=np.int8)
+        else:
+            codes = np.where(text == str(goal), CAT_PASS, CAT_FAIL).astype(np.int8)
+    else:
+        # regex / range (and exotic fixed goals) keep their compiled per-value check.
+        codes = np.array([CATEGORIES.index(rule.check(v, goal)[2]) for v in values], dtype=np.int8)
+    codes[empty] = CAT_FAIL
+    return codes
+
+
+def _categories_python(rule, values, goal):
+    """Category codes for one rule over one column, without NumPy. A column of strings
+    repeats few distinct values, so each is checked once and the codes are looked up.
+    """
+    check = rule.check
+    if rule.r_type == "target" and isinstance(goal, list):  # per-object goals from a target table
+        return array('b', [CATEGORY_CODES[check(v, g)[2]] for v, g in zip(values, goal)])
+    try:
+        distinct = set(values)
+    except TypeError:  # unhashable values, such as lists
+        distinct = ()
+    # Only str and None: 1, 1.0 and True are equal as set members but not to every check.
+    if distinct and all(v is None or type(v) is str for v in distinct):
+        memo = {v: CATEGORY_CODES[check(v, goal)[2]] for v in distinct}
+        return array('b', map(memo.__getitem__, values))
+    return array('b', [CATEGORY_CODES[check(v, goal)[2]] for v in values])
+
+
+def validate_columnar(records, targets=("", "", ""), rules=None, use_numpy=None, target_table=None,
+                      tally=None):
+    """Validate every object in a batch of ledger records column by column.
+    Returns one result table: a dict of equal-length columns (identity fields and
+    'pass'/'fail'/'warn'/'review' counts) plus 'checks', which maps each rule label to its
+    column of category codes.
+    use_numpy=None picks NumPy when it is available. With a target_table, target rules
+    compare against a column of per-object goals instead of one goal. Records not
+    shaped like a ledger record are skipped and counted in tally.invalid, if given.
+    """
+    rules = DEFAULT_RULES if rules is None else rules
+    use_numpy = np is not None if use_numpy is None else use_numpy
+    target_values = dict(zip(TARGET_NAMES, targets))
+
+    # One pass over the records flattens every object into parallel per-source lists.
+    job_ids, job_names, pub_times, indexes = [], [], [], []
+    metas, contents, all_props, all_job_meta = [], [], [], []
+    for data_all in records:
+        try:
+            payload = extract_payload(data_all)
+        except RecordShapeError:
+            if tally is not None:
+                tally.invalid += 1
+            continue
+        job_props, job_meta = payload["job_props"], payload["job_meta"]
+        job_id, job_name, pub_time_str = payload["job_id"], job_props.get('jobName'), payload["pub_time_str"]
+        for i, (meta, content) in enumerate(payload["objects"]):
+            job_ids.append(job_id)
+            job_names.append(job_name)
+            pub_times.append(pub_time_str)
+            indexes.append(i)
+            metas.append(meta)
+            contents.append(content)
+            all_props.append(job_props)
+            all_job_meta.append(job_meta)
+    n = len(metas)
+    source_lists = (metas, contents, all_props, all_job_meta)
+
+    table = {
+        "jobId": job_ids,
+        "jobName": job_names,
+        "publishTime": pub_times,
+        "object": indexes,
+        "tickerValue": [meta.get("tickerValue") for meta in metas],
+        "env": [env_label(meta.get("isBorgTest")) for meta in metas],
+    }
+    for field in EXTRA_FIELDS:
+        table[field] = [meta.get(field) for meta in metas]
+    if target_table is not None:
+        row_targets = [dict(zip(TARGET_NAMES, target_table.targets_for(meta, job_meta, targets)))
+                       for meta, job_meta in zip(metas, all_job_meta)]
+
+    checks = table["checks"] = {}
+    rule_columns = []
+    for rule in rules:
+        values = extract_column(source_lists, rule.path)
+        if rule.target and target_table is not None:
+            goal = [row[rule.target] for row in row_targets]
+        else:
+            goal = target_values.get(rule.target) if rule.target else rule.goal
+        if use_numpy:
+            codes = _categories_numpy(rule, values, goal)
+        else:
+            codes = _categories_python(rule, values, goal)
+        for path, _, expected in rule.when:
+            for row, value in enumerate(extract_column(source_lists, path)):
+                if value != expected:
+                    codes[row] = CAT_NOT_APPLICABLE
+        checks[rule.label] = codes
+        rule_columns.append(codes)
+
+    if use_numpy:
+        stacked = np.vstack(rule_columns) if rule_columns else np.empty((0, n), dtype=np.int8)
+        for code, name in enumerate(CATEGORIES):
+            table[name] = (stacked == code).sum(axis=0)
+    else:
+        rows = list(zip(*rule_columns)) if rule_columns else [()] * n
+        for code, name in enumerate(CATEGORIES):
+            table[name] = array('l', [row.count(code) for row in rows])
+    return table
+
+
+def iter_table_results(table):
+    """Yield a compact ledger_core.ObjectResult per row of a result table, in the shape
+    validate_records yields.
+    """
+    labels = tuple(sys.intern(label) for label in table["checks"])
+    if not labels:
+        rows = [b""] * len(table["object"])
+    elif np is not None and isinstance(next(iter(table["checks"].values())), np.ndarray):
+        stacked = np.vstack(list(table["checks"].values())).T.astype(np.uint8)
+        rows = [row.tobytes() for row in stacked]
+    else:
+        # array('b').tobytes() is already each code & 0xFF; interleave the columns row-major.
+        width = len(labels)
+        packed = bytearray(len(table["object"]) * width)
+        for i, codes in enumerate(table["checks"].values()):
+            packed[i::width] = codes.tobytes()
+        rows = [bytes(packed[start:start + width]) for start in range(0, len(packed), width)]
+    identity = (table["jobId"], table["jobName"], table["object"], table["tickerValue"],
+                table["env"], table["publishTime"], rows)
+    job = None
+    for job_id, job_name, index, ticker, env, pub_time, codes in zip(*identity):
+        if index == 0:  # a record's objects are contiguous and numbered from 0
+            job = JobFields(job_id, job_name, pub_time, labels)
+        yield ObjectResult(job, index, ticker, env, codes)
+
+
+def iter_columnar_results(records, targets=("", "", ""), rules=None, batch_size=COLUMNAR_BATCH,
+                          target_table=None, tally=None):
+    """Validate a record stream in columnar batches of batch_size records, yielding
+    per-object result dicts in input order.
+    """
+    batch = []
+    for data_all in records:
+        batch.append(data_all)
+        if len(batch) >= batch_size:
+            yield from iter_table_results(validate_columnar(batch, targets, rules, target_table=target_table,
+                                                            tally=tally))
+            batch = []
+    if batch:
+        yield from iter_table_results(validate_columnar(batch, targets, rules, target_table=target_table,
+                                                        tally=tally))
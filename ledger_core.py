@@ -0,0 +1,918 @@
+"""Headless BORG ledger validation core.
+
+Everything in here is importable without Streamlit so the same extraction and
+validation logic can back the web app, the batch CLI and anything else.
+"""
+import json
+import re
+import sys
+from collections import namedtuple
+from collections.abc import Mapping
+from html import escape as html_escape
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+# --- CONFIGURATION ---
+DRIFT_THRESHOLD_SECONDS = 900  # 15 minutes
+EASTERN_TZ = ZoneInfo("America/New_York")
+STREAM_CHUNK_SIZE = 1 << 20  # 1 MiB reads when streaming log files
+
+
+# --- HELPER FUNCTIONS ---
+
+def safe(val):
+    """HTML-escape a value for safe embedding in markup."""
+    if val is None:
+        return "None"
+    return html_escape(str(val))
+
+
+# ISO-8601 timestamp: 1-9 fractional digits and an optional Z or +hh:mm / -hhmm offset
+# (none means UTC). Groups: date, hour, minute, second, fraction, Z, sign, offset h, offset m.
+_ISO_RE = re.compile(
+    r"(\d{4})-(\d{2})-(\d{2})[Tt ](\d{2}):(\d{2}):(\d{2})(?:[.,](\d{1,9}))?"
+    r"(?:([Zz])|([+-])(\d{2}):?(\d{2}))?"
+)
+
+
+def _parse_iso_fallback(text):
+    """Regex parse for what datetime.fromisoformat rejects before Python 3.11 ("Z", long fractions)."""
+    m = _ISO_RE.fullmatch(text)
+    if m is None:
+        return None
+    year, month, day, hh, mm, ss, frac, _, sign, off_h, off_m = m.groups()
+    tz = timezone.utc
+    if sign:
+        offset = timedelta(hours=int(off_h), minutes=int(off_m))
+        tz = timezone(offset if sign == "+" else -offset)
+    try:
+        return datetime(int(year), int(month), int(day), int(hh), int(mm), int(ss),
+                        int((frac or "0")[:6].ljust(6, "0")), tz)
+    except ValueError:
+        return None
+
+
+def parse_iso_time(text):
+    """Parse an ISO-8601 date and time into an aware datetime, or None on failure.
+    Accepts any fractional precision and a Z or numeric offset; no offset means UTC.
+    Anything shorter than a full date and time (a bare date, a week date) is rejected.
+    """
+    if not isinstance(text, str) or len(text) < 19 or text[4] + text[7] + text[10] not in ("--T", "--t", "-- "):
+        return None
+    try:
+        dt = datetime.fromisoformat(text)  # C parser; handles Z and 7-9 digit fractions from 3.11
+    except ValueError:
+        return _parse_iso_fallback(text)
+    return dt if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def parse_iso_epoch(text):
+    """Parse an ISO-8601 timestamp into Unix seconds (a float), or None on failure."""
+    dt = parse_iso_time(text)
+    return None if dt is None else dt.timestamp()
+
+
+def parse_publish_time(pub_time_str):
+    """Parse the publish timestamp string into a timezone-aware UTC datetime, or None on failure."""
+    dt = parse_iso_time(pub_time_str)
+    return None if dt is None else dt.astimezone(timezone.utc)
+
+
+def format_timestamp(dt_utc):
+    """Return (utc_str, eastern_str, tz_label) formatted timestamp strings, or None on failure."""
+    if dt_utc is None:
+        return None, None, None
+    formatted_utc = dt_utc.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt_utc.microsecond // 1000:03d}"
+    dt_eastern = dt_utc.astimezone(EASTERN_TZ)
+    formatted_eastern = dt_eastern.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt_eastern.microsecond // 1000:03d}"
+    tz_label = dt_eastern.strftime("%Z")  # "EST" or "EDT" depending on DST
+    return formatted_utc, formatted_eastern, tz_label
+
+
+# --- RECORD EXTRACTION ---
+
+MAX_RECORD_BYTES = 64 << 20  # an open block longer than this is given up as malformed
+SCAN_OPEN, SCAN_BROKEN = -1, -2  # _scan_record outcomes other than a closing position
+
+# A complete JSON string, or one of the groups: 1 = open brace, 2 = close brace,
+# 3 = quote of a string not closed before a newline or the end of the text, 4 = a
+# character that cannot appear in JSON outside a string (such as the letters of a log
+# level or logger name). JSON strings cannot hold a raw newline, so a string that runs
+# into one breaks its block. Compiled for str and bytes input.
+_RECORD_TOKEN_PATTERN = r'"[^"\\\n]*(?:\\.[^"\\\n]*)*"|(\{)|(\})|(")|([^ \t\r\n{}\[\],:"0-9+\-.eEtrufalsnNaIiy])'
+_RECORD_TOKEN_RE = re.compile(_RECORD_TOKEN_PATTERN)
+_RECORD_TOKEN_RE_BYTES = re.compile(_RECORD_TOKEN_PATTERN.encode())
+# How an open block may go on at the start of its next non-blank line, given the last
+# character of the line before: after "{" only a key or "}", after "[", "," or ":" a
+# value (or a closing bracket), after the end of a value only a separator or a closing
+# bracket. Anything else (a log timestamp after a complete value, a log level, a new
+# record after a "}") means the block was cut off. Whitespace-only lines do not count.
+_BLANK = " \t\r"
+_VALUE_STARTS = '{["-0123456789tfnNI'
+_FOLLOWS = {"{": '"}', "[": _VALUE_STARTS + "]", ",": _VALUE_STARTS + "}]", ":": _VALUE_STARTS}
+_AFTER_VALUE = ",:}]"
+
+
+def _char_sets(chars):
+    return frozenset(chars), frozenset(bytes([c]) for c in chars.encode())
+
+
+_BLANK_SETS = _char_sets(_BLANK)
+_FOLLOW_SETS = {key: _char_sets(value) for key, value in _FOLLOWS.items()}
+_FOLLOW_SETS.update({key.encode(): value for key, value in _FOLLOW_SETS.items()})
+_AFTER_VALUE_SETS = _char_sets(_AFTER_VALUE)
+
+
+def _can_follow(last, first, as_bytes):
+    """Whether a line starting with first can continue a block whose text so far ends with last."""
+    allowed = _FOLLOW_SETS.get(last)
+    return first in (allowed or _AFTER_VALUE_SETS)[as_bytes]
+
+
+def _last_char(text, lo, hi, last=None):
+    """The last non-blank character of text[lo:hi], or last if there is none."""
+    blank = _BLANK_SETS[not isinstance(text, str)]
+    while hi > lo:
+        char = text[hi - 1:hi]
+        if char not in blank:
+            return char
+        hi -= 1
+    return last
+
+
+def _first_char(text, pos, size):
+    """(index, character) of the first non-blank character at or after pos on its line,
+    with character "" at a newline and None when the text ends first.
+    """
+    blank = _BLANK_SETS[not isinstance(text, str)]
+    newline = "\n" if isinstance(text, str) else b"\n"
+    while pos < size:
+        char = text[pos:pos + 1]
+        if char == newline:
+            return pos, ""
+        if char not in blank:
+            return pos, char
+        pos += 1
+    return pos, None
+
+
+def _scan_record(text, pos, depth=0, last=None, stop=None):
+    """Scan from pos for the brace that closes a JSON object, looking no further than stop.
+    text may be a str or a bytes-like buffer such as bytes or an mmap.
+    Returns (end, depth, pos, last). end is the index just past the closing brace,
+    SCAN_OPEN if the text runs out first, in which case (depth, pos, last) let the scan
+    resume on more text, or SCAN_BROKEN if the block cannot be closed: it reaches a
+    character that is not JSON outside a string, a string runs into a newline, or a line
+    starts with something that cannot follow the end of the line before (see _FOLLOWS).
+    """
+    as_bytes = not isinstance(text, str)
+    token_re, newline = (_RECORD_TOKEN_RE_BYTES, b"\n") if as_bytes else (_RECORD_TOKEN_RE, "\n")
+    size = len(text) if stop is None else min(len(text), stop)
+    while True:
+        line_start = pos
+        nl = text.find(newline, pos, size)
+        for m in token_re.finditer(text, pos, size if nl == -1 else nl):
+            group = m.lastindex
+            if group == 1:
+                depth += 1
+            elif group == 2:
+                depth -= 1
+                if depth == 0:
+                    return m.end(), 0, m.end(), None
+            elif group == 3 and nl == -1:
+                return SCAN_OPEN, depth, m.start(), _last_char(text, line_start, m.start(), last)
+            elif group is not None:
+                return SCAN_BROKEN, depth, m.start(), last
+        if nl == -1:
+            return SCAN_OPEN, depth, size, _last_char(text, line_start, size, last)
+        last = _last_char(text, line_start, nl, last)
+        first_at, first = _first_char(text, nl + 1, size)
+        if first is None:
+            return SCAN_OPEN, depth, nl, last  # the next line's first character decides
+        if first and not _can_follow(last, first, as_bytes):
+            return SCAN_BROKEN, depth, nl, last
+        pos = first_at
+
+
+def _resync(text, start):
+    """Where scanning resumes after a broken block at start: the end of its first line."""
+    nl = text.find("\n" if isinstance(text, str) else b"\n", start)
+    return len(text) if nl == -1 else nl
+
+
+def next_record_line(text, pos):
+    """Start of the first line at or after pos that no open block can continue onto (see
+    _scan_record), or len(text). A scan from the start is never inside a block there, so
+    text can be split at that offset and each part scanned on its own.
+    """
+    if pos <= 0:
+        return 0
+    as_bytes = not isinstance(text, str)
+    newline = b"\n" if as_bytes else "\n"
+    size = len(text)
+    nl = text.find(newline, pos - 1)
+    while nl != -1:
+        first = _first_char(text, nl + 1, size)[1]
+        if first is None:
+            break
+        if first:
+            prev = text.rfind(newline, 0, nl) + 1
+            last = _last_char(text, prev, nl)
+            if last is not None and not _can_follow(last, first, as_bytes):
+                return nl + 1
+        nl = text.find(newline, nl + 1)
+    return size
+
+
+def iter_record_spans(raw_input, pos=0, partial=True):
+    """Yield (start, end) spans of top-level {...} blocks in a single pass.
+    raw_input may be a str or a bytes-like buffer such as an mmap. Text between blocks
+    (log prefixes, timestamps) is skipped. A block may span lines, whether or not it
+    follows log text on its first line. A block that cannot be closed (see _scan_record),
+    is still open after MAX_RECORD_BYTES, or is still open when the input ends, is yielded
+    as a span running to the end of its first line, which fails to parse; scanning resumes
+    on the next line, so a truncated record costs only itself. With partial=False a block
+    still open at the end is left out instead, as a record still being written, unless it
+    is longer than MAX_RECORD_BYTES.
+    """
+    opener = "{" if isinstance(raw_input, str) else b"{"
+    while True:
+        start = raw_input.find(opener, pos)
+        if start == -1:
+            return
+        end, _, _, _ = _scan_record(raw_input, start, stop=start + MAX_RECORD_BYTES)
+        if end < 0:
+            if end == SCAN_OPEN and not partial and len(raw_input) - start <= MAX_RECORD_BYTES:
+                return
+            end = _resync(raw_input, start)
+        yield start, end
+        pos = end
+
+
+def iter_json_records(raw_input, loads=json.loads):
+    """Yield every JSON object found in a raw log string, skipping noise and malformed blocks.
+    loads parses one record's text (e.g. a projection parser instead of json.loads).
+    """
+    for start, end in iter_record_spans(raw_input):
+        try:
+            yield loads(raw_input[start:end])
+        except json.JSONDecodeError:
+            continue
+
+
+class RecordScanner:
+    """Incremental splitter for top-level {...} blocks in text that arrives in pieces.
+    feed() takes the next piece (str, or bytes for byte-exact offsets) and returns the
+    blocks it completed, plus the first line of any block that could not be closed (it
+    fails to parse, so callers skip it as malformed). The block still open is kept as a
+    list of pieces and joined once when it closes. close() ends the input, resolving an
+    open block as iter_record_spans does at the end of its input.
+    """
+
+    def __init__(self, max_record_bytes=MAX_RECORD_BYTES):
+        self.max_record_bytes = max_record_bytes
+        self._parts = []  # pieces of the open block scanned so far
+        self._size = 0
+        self._carry = None  # unscanned tail (a string cut off by the piece's end) to rescan
+        self._open = False
+        self._depth = 0
+        self._last = None  # last non-blank character of the open block so far
+        self._broken = False  # the open block is broken and only its first line is still read
+
+    @property
+    def pending(self):
+        """Length of the unfinished block held back for the next piece."""
+        return self._size + (len(self._carry) if self._carry else 0)
+
+    def feed(self, chunk):
+        text = chunk if not self._carry else self._carry + chunk
+        self._carry = None
+        return self._scan(text, final=False)
+
+    def close(self):
+        """End of input: return what the block still open resolves into."""
+        if not self._open:
+            return []
+        text = self._carry if self._carry is not None else self._parts[0][:0]
+        self._carry = None
+        return self._scan(text, final=True)
+
+    def _take(self, piece):
+        parts, self._parts, self._size = self._parts, [], 0
+        return piece[:0].join(parts + [piece]) if parts else piece
+
+    def _scan(self, text, final):
+        opener, newline = ("{", "\n") if isinstance(text, str) else (b"{", b"\n")
+        blocks = []
+        pos = start = 0  # an open block carried over starts at the beginning of text
+        while True:
+            if self._broken:
+                # A block broken before its first line ended: it runs to the end of that line.
+                nl = text.find(newline)
+                if nl == -1 and not final:
+                    if self._size < self.max_record_bytes:
+                        self._parts.append(text)
+                        self._size += len(text)
+                    return blocks
+                nl = len(text) if nl == -1 else nl
+                blocks.append(self._take(text[:nl]))
+                self._open = self._broken = False
+                text, pos = text[nl:], 0
+            if not self._open:
+                start = text.find(opener, pos)
+                if start == -1:
+                    return blocks
+                self._open, self._depth, self._last, pos = True, 0, None, start
+            end, self._depth, pos, self._last = _scan_record(text, pos, self._depth, self._last)
+            if end >= 0:
+                blocks.append(self._take(text[start:end]))
+                self._open, pos = False, end
+                continue
+            if end == SCAN_OPEN and not final and self._size + pos - start <= self.max_record_bytes:
+                self._parts.append(text[start:pos])
+                self._size += pos - start
+                self._carry = text[pos:]
+                return blocks
+            # Broken: report the block's first line and rescan what follows it.
+            block = self._take(text[start:])
+            nl = block.find(newline)
+            if nl == -1 and not final:
+                self._parts.append(block)
+                self._size += len(block)
+                self._broken = True
+                return blocks
+            nl = len(block) if nl == -1 else nl
+            blocks.append(block[:nl])
+            self._open = False
+            text, pos = block[nl:], 0
+
+
+def iter_stream_spans(stream, chunk_size=STREAM_CHUNK_SIZE):
+    """Yield the raw text of every top-level {...} block in a text stream, reading it in chunks.
+    Only the block currently being scanned is held in memory, so arbitrarily large log files
+    stream in constant space. Blocks that cannot be closed are yielded cut at the end of
+    their first line, as iter_record_spans does.
+    """
+    scanner = RecordScanner()
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield from scanner.feed(chunk)
+    yield from scanner.close()
+
+
+def iter_stream_records(stream, chunk_size=STREAM_CHUNK_SIZE, loads=json.loads):
+    """Yield every JSON object from a text stream, skipping noise and malformed blocks."""
+    for text in iter_stream_spans(stream, chunk_size):
+        try:
+            yield loads(text)
+        except json.JSONDecodeError:
+            continue
+
+
+class ParseTally:
+    """Records parsed, and blocks skipped because they did not parse, with their lengths.
+    invalid counts the parsed records skipped as not shaped like a ledger record.
+    """
+
+    __slots__ = ("records", "record_bytes", "malformed", "malformed_bytes", "invalid")
+
+    def __init__(self, records=0, record_bytes=0, malformed=0, malformed_bytes=0, invalid=0):
+        self.records = records
+        self.record_bytes = record_bytes
+        self.malformed = malformed
+        self.malformed_bytes = malformed_bytes
+        self.invalid = invalid
+
+    def __reduce__(self):
+        return ParseTally, (self.records, self.record_bytes, self.malformed, self.malformed_bytes,
+                            self.invalid)
+
+    def counting(self, loads):
+        """Wrap a record parser so each call is counted as a record or a malformed block."""
+        def counted(text):
+            try:
+                value = loads(text)
+            except json.JSONDecodeError:
+                self.malformed += 1
+                self.malformed_bytes += len(text)
+                raise
+            self.records += 1
+            self.record_bytes += len(text)
+            return value
+        return counted
+
+    def add(self, other):
+        self.records += other.records
+        self.record_bytes += other.record_bytes
+        self.malformed += other.malformed
+        self.malformed_bytes += other.malformed_bytes
+        self.invalid += other.invalid
+
+
+def extract_json(raw_input, loads=json.loads):
+    """Extract and parse the first JSON object from a raw log string.
+    Raises the first JSONDecodeError if blocks were found but none of them parsed.
+    """
+    first_error = None
+    for start, end in iter_record_spans(raw_input):
+        try:
+            return loads(raw_input[start:end])
+        except json.JSONDecodeError as e:
+            first_error = first_error or e
+    if first_error is not None:
+        raise first_error
+    return None
+
+
+def format_drift(drift_seconds):
+    """Render a drift as "2h 5m" or "7m"."""
+    drift_hours = int(drift_seconds // 3600)
+    drift_mins = int((drift_seconds % 3600) // 60)
+    return f"{drift_hours}h {drift_mins}m" if drift_hours > 0 else f"{drift_mins}m"
+
+
+def check_drift(pub_dt, now=None):
+    """Return a human-readable drift string if the timestamp is stale, else None.
+    now (an aware datetime) is the reference clock; the current time by default.
+    """
+    if pub_dt is None:
+        return None
+    drift_seconds = ((now or datetime.now(timezone.utc)) - pub_dt).total_seconds()
+    if drift_seconds <= DRIFT_THRESHOLD_SECONDS:
+        return None
+    return format_drift(drift_seconds)
+
+
+def is_safe_url(url):
+    """Basic check that a URL uses https."""
+    return url and str(url).startswith("https://")
+
+
+# --- STATUS COLOURS ---
+PASS_BG = "rgba(76, 217, 100, 0.1)"
+PROD_BG = "rgba(76, 217, 100, 0.15)"
+WARN_BG = "rgba(255, 204, 0, 0.15)"
+FAIL_BG = "rgba(255, 59, 48, 0.15)"
+REVIEW_BG = "transparent"
+
+STATUS_MISSING = ("MISSING", FAIL_BG, "fail")
+STATUS_REVIEW = ("Review", REVIEW_BG, "review")
+
+# Category codes used instead of the 'pass'/'fail'/... strings in compact results and tables.
+CAT_PASS, CAT_FAIL, CAT_WARN, CAT_REVIEW = 0, 1, 2, 3
+CAT_NOT_APPLICABLE = -1  # rule skipped by its 'when' condition
+CATEGORIES = ("pass", "fail", "warn", "review")
+CATEGORY_CODES = {name: code for code, name in enumerate(CATEGORIES)}
+
+
+def compute_row_status(act, goal, r_type):
+    """Compute the (status_text, bg_color, category) for a single verification row.
+    category is one of: 'pass', 'fail', 'warn', 'review'.
+    """
+    is_empty = act is None or str(act).strip() == ""
+
+    if is_empty:
+        return STATUS_MISSING
+    elif r_type == "binary":
+        if act == "YES":
+            return "TEST", WARN_BG, "warn"
+        elif act == "NO":
+            return "PROD", PROD_BG, "pass"
+        else:
+            return f"INVALID (Exp: {safe(goal)})", FAIL_BG, "fail"
+    elif r_type == "fixed":
+        if act == goal:
+            return "OK", PASS_BG, "pass"
+        else:
+            return f"MISMATCH (Exp: {safe(goal)})", FAIL_BG, "fail"
+    elif r_type == "target" and goal:
+        if str(act) == str(goal):
+            return "MATCH", PASS_BG, "pass"
+        else:
+            return f"MISMATCH (Exp: {safe(goal)})", FAIL_BG, "fail"
+    else:
+        return STATUS_REVIEW
+
+
+# --- RULE ENGINE ---
+# A rule spec is a list of dicts, e.g. loaded from JSON:
+#   {"label": "sendToBorg", "path": "objectMetadata.sendToBorg", "type": "fixed", "expected": "YES"}
+# type is one of binary / fixed / target / regex / range ("numeric-range" is accepted for
+# range). A target rule's expected value is "$ticker", "$scaling" or "$period" (the
+# scenario target inputs) or a literal; a range rule's expected value is [min, max] with
+# either end null. An optional "when" mapping of path -> value limits the rule to matching
+# objects, e.g. {"objectMetadata.wireId": "778"}.
+# Paths start at one of RULE_SOURCES.
+
+RULE_SOURCES = ("objectMetadata", "contentMetadata", "jobProperties", "jobMetadata")
+TARGET_NAMES = ("ticker", "scaling", "period")
+
+DEFAULT_RULE_SPEC = [
+    {"label": "isBorgTest", "path": "objectMetadata.isBorgTest", "type": "binary", "expected": "YES/NO"},
+    {"label": "sendToBorg", "path": "objectMetadata.sendToBorg", "type": "fixed", "expected": "YES"},
+    {"label": "releaseDate", "path": "objectMetadata.releaseDate", "type": "fixed", "expected": "NO RELEASE DATE"},
+    {"label": "scalingFactor", "path": "objectMetadata.scalingFactor", "type": "target", "expected": "$scaling"},
+    {"label": "tickerValue", "path": "objectMetadata.tickerValue", "type": "target", "expected": "$ticker"},
+    {"label": "observationPeriod", "path": "objectMetadata.observationPeriod", "type": "target",
+     "expected": "$period"},
+]
+
+CompiledRule = namedtuple("CompiledRule", "label path r_type goal target getter check when")
+
+
+class RuleSpecError(ValueError):
+    """Raised when a rule spec cannot be compiled."""
+
+
+def _is_empty(act):
+    return act is None or str(act).strip() == ""
+
+
+def compile_path(path):
+    """Compile a dotted field path into an accessor over the (meta, content, props, job_meta) sources."""
+    root, *keys = path.split(".")
+    if root not in RULE_SOURCES:
+        raise RuleSpecError(f"Unknown rule path root '{root}' in '{path}'")
+    index = RULE_SOURCES.index(root)
+    if len(keys) == 1:
+        key = keys[0]
+        return lambda sources: sources[index].get(key)
+
+    def getter(sources):
+        node = sources[index]
+        for key in keys:
+            if not isinstance(node, dict):
+                return None
+            node = node.get(key)
+        return node
+    return getter
+
+
+def _compile_binary(goal):
+    invalid = (f"INVALID (Exp: {safe(goal)})", FAIL_BG, "fail")
+    test, prod = ("TEST", WARN_BG, "warn"), ("PROD", PROD_BG, "pass")
+
+    def check(act, _goal):
+        if act == "YES":
+            return test
+        if act == "NO":
+            return prod
+        return STATUS_MISSING if _is_empty(act) else invalid
+    return check
+
+
+def _compile_fixed(goal):
+    ok, mismatch = ("OK", PASS_BG, "pass"), (f"MISMATCH (Exp: {safe(goal)})", FAIL_BG, "fail")
+
+    def check(act, _goal):
+        if _is_empty(act):
+            return STATUS_MISSING
+        return ok if act == goal else mismatch
+    return check
+
+
+def _compile_target():
+    match = ("MATCH", PASS_BG, "pass")
+
+    def check(act, goal):
+        if _is_empty(act):
+            return STATUS_MISSING
+        if not goal:
+            return STATUS_REVIEW
+        if str(act) == str(goal):
+            return match
+        return f"MISMATCH (Exp: {safe(goal)})", FAIL_BG, "fail"
+    return check
+
+
+def _compile_regex(goal):
+    try:
+        pattern = re.compile(goal)
+    except (re.error, TypeError) as e:
+        raise RuleSpecError(f"Invalid regex rule pattern {goal!r}: {e}") from e
+    match, mismatch = ("MATCH", PASS_BG, "pass"), (f"MISMATCH (Exp: /{safe(goal)}/)", FAIL_BG, "fail")
+
+    def check(act, _goal):
+        if _is_empty(act):
+            return STATUS_MISSING
+        return match if pattern.fullmatch(str(act)) else mismatch
+    return check
+
+
+def _compile_range(goal):
+    if not isinstance(goal, (list, tuple)) or len(goal) != 2:
+        raise RuleSpecError(f"Range rule expects [min, max], got {goal!r}")
+    try:
+        low = float("-inf") if goal[0] is None else float(goal[0])
+        high = float("inf") if goal[1] is None else float(goal[1])
+    except (TypeError, ValueError) as e:
+        raise RuleSpecError(f"Range rule bounds must be numbers, got {goal!r}") from e
+    bounds = "..".join("" if bound is None else safe(bound) for bound in goal)
+    ok = ("OK", PASS_BG, "pass")
+    out_of_range = (f"OUT OF RANGE (Exp: {bounds})", FAIL_BG, "fail")
+    not_numeric = ("INVALID (Exp: number)", FAIL_BG, "fail")
+
+    def check(act, _goal):
+        if _is_empty(act):
+            return STATUS_MISSING
+        try:
+            value = float(act)
+        except (TypeError, ValueError):
+            return not_numeric
+        return ok if low <= value <= high else out_of_range
+    return check
+
+
+_RULE_COMPILERS = {
+    "binary": _compile_binary,
+    "fixed": _compile_fixed,
+    "regex": _compile_regex,
+    "range": _compile_range,
+    "numeric-range": _compile_range,
+}
+
+
+def compile_rules(spec):
+    """Compile a rule spec into a tuple of CompiledRule with prebuilt accessors and checks."""
+    compiled = []
+    for rule in spec:
+        try:
+            label, path, r_type = rule["label"], rule["path"], rule["type"]
+        except KeyError as e:
+            raise RuleSpecError(f"Rule {rule!r} is missing {e}") from e
+        goal = rule.get("expected")
+        target = None
+        if r_type == "target":
+            if isinstance(goal, str) and goal.startswith("$"):
+                target = goal[1:]
+                if target not in TARGET_NAMES:
+                    raise RuleSpecError(f"Unknown target '{goal}' in rule '{label}'")
+            check = _compile_target()
+        elif r_type in _RULE_COMPILERS:
+            check = _RULE_COMPILERS[r_type](goal)
+        else:
+            raise RuleSpecError(f"Unknown rule type '{r_type}' in rule '{label}'")
+        when = tuple((p, compile_path(p), value) for p, value in rule.get("when", {}).items())
+        compiled.append(CompiledRule(label, path, r_type, goal, target, compile_path(path), check, when))
+    return tuple(compiled)
+
+
+def load_rule_spec(path):
+    """Load a rule spec (a JSON list of rule dicts) from a file."""
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    if not isinstance(spec, list):
+        raise RuleSpecError(f"{path}: rule spec must be a JSON list")
+    return spec
+
+
+DEFAULT_RULES = compile_rules(DEFAULT_RULE_SPEC)
+
+
+# --- VALIDATION ---
+
+def env_label(is_borg):
+    """Map an isBorgTest value to its environment label: TEST, PROD or INVALID."""
+    if is_borg == "YES":
+        return "TEST"
+    if is_borg == "NO":
+        return "PROD"
+    return "INVALID"
+
+
+def build_verification_rows(meta, targets, rules=None, content=None, job_props=None, job_meta=None,
+                            target_table=None):
+    """Build the verification rows and return (rows_with_status, counts).
+    Each row: (label, actual, goal, r_type, status_text, bg, category).
+    counts: dict with keys 'pass', 'fail', 'warn', 'review'.
+    rules is a compiled rule set from compile_rules (default: DEFAULT_RULES).
+    target_table (a ledger_targets.TargetTable) gives this object its own targets, with
+    targets as the fallback.
+    """
+    if target_table is not None:
+        targets = target_table.targets_for(meta, job_meta, targets)
+    target_values = dict(zip(TARGET_NAMES, targets))
+    sources = (meta, content or {}, job_props or {}, job_meta or {})
+
+    counts = {"pass": 0, "fail": 0, "warn": 0, "review": 0}
+    rows_with_status = []
+    for rule in DEFAULT_RULES if rules is None else rules:
+        if rule.when and not all(get(sources) == value for _, get, value in rule.when):
+            continue
+        act = rule.getter(sources)
+        goal = target_values.get(rule.target) if rule.target else rule.goal
+        status_text, bg, category = rule.check(act, goal)
+        counts[category] += 1
+        rows_with_status.append((rule.label, act, goal, rule.r_type, status_text, bg, category))
+
+    return rows_with_status, counts
+
+
+class RecordShapeError(ValueError):
+    """Raised for JSON that parsed but is not shaped like a ledger record."""
+
+
+_JSON_TYPE_NAMES = {dict: "an object", list: "an array", str: "a string", int: "a number",
+                    float: "a number", bool: "a boolean", type(None): "null"}
+
+
+def _json_type(value):
+    return _JSON_TYPE_NAMES.get(type(value), type(value).__name__)
+
+
+def _node(parent, key, kind=dict):
+    """parent[key] when it is a kind (dict or list); empty when missing or null."""
+    value = parent.get(key)
+    if value is None:
+        return kind()
+    if not isinstance(value, kind):
+        raise RecordShapeError(f"'{key}' is {_json_type(value)}, expected {_json_type(kind())}")
+    return value
+
+
+def _object_sources(obj, index):
+    """(objectMetadata, contentMetadata) of one entry of data.objects."""
+    if not isinstance(obj, dict):
+        raise RecordShapeError(f"objects[{index}] is {_json_type(obj)}, expected an object")
+    content = _node(obj, 'objectContent', list)
+    first = content[0] if content and content[0] is not None else {}
+    if not isinstance(first, dict):
+        raise RecordShapeError(f"objects[{index}].objectContent[0] is {_json_type(first)}, expected an object")
+    return _node(obj, 'objectMetadata'), _node(first, 'contentMetadata')
+
+
+def extract_payload(data_all):
+    """Pull the fields the validator reads out of a parsed ledger record.
+    Returns a dict with the job-level fields and an "objects" list of (meta, content) pairs.
+    Missing or null fields read as empty. Raises RecordShapeError when a field holds the
+    wrong kind of value, e.g. "data": "ok" or a null in "objects".
+    """
+    if not isinstance(data_all, dict):
+        raise RecordShapeError(f"The record is {_json_type(data_all)}, expected an object")
+    data = _node(data_all, 'data')
+    return {
+        "job_id": _node(data_all, 'key').get('jobId'),
+        "job_props": _node(data, 'jobProperties'),
+        "job_meta": _node(data, 'jobMetadata'),
+        "pub_time_str": _node(data_all, 'metadata').get('bbds.context.publishTime'),
+        "objects": [_object_sources(obj, i) for i, obj in enumerate(_node(data, 'objects', list))],
+    }
+
+
+# --- COMPACT RESULTS ---
+# Batch validation keeps one ObjectResult per object instead of a result dict: the job
+# fields are shared by every object of a record, the statuses are one byte per rule and
+# repeated strings (tickers, job names, status patterns) are interned.
+
+RESULT_KEYS = ("jobId", "jobName", "object", "tickerValue", "env", "publishTime", *CATEGORIES, "failing")
+_NA_BYTE = CAT_NOT_APPLICABLE & 0xFF  # CAT_NOT_APPLICABLE as stored in ObjectResult.codes
+_INTERNED_CODES = {}
+MAX_INTERNED_CODES = 4096  # distinct status patterns shared between results
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def intern_codes(codes):
+    """Share one bytes object per distinct status pattern (most objects have the same few)."""
+    shared = _INTERNED_CODES.get(codes)
+    if shared is None:
+        if len(_INTERNED_CODES) >= MAX_INTERNED_CODES:
+            return codes
+        shared = _INTERNED_CODES[codes] = codes
+    return shared
+
+
+class JobFields:
+    """The record-level fields every ObjectResult of one ledger record shares."""
+
+    __slots__ = ("job_id", "job_name", "publish_time", "labels")
+
+    def __init__(self, job_id, job_name, publish_time, labels):
+        self.job_id = job_id
+        self.job_name = _intern(job_name)
+        self.publish_time = publish_time
+        self.labels = labels  # rule labels, in the order of ObjectResult.codes
+
+    def __reduce__(self):
+        return JobFields, (self.job_id, self.job_name, self.publish_time, self.labels)
+
+
+class ObjectResult(Mapping):
+    """Compact per-object result: shared JobFields, the object index, tickerValue, env and
+    one category code per rule (bytes; CAT_NOT_APPLICABLE is stored as 0xFF).
+    Reads like the dict validate_record returns (result["fail"], result["failing"]);
+    as_dict() builds that dict.
+    """
+
+    __slots__ = ("job", "index", "ticker", "env", "codes")
+
+    def __init__(self, job, index, ticker, env, codes):
+        self.job = job
+        self.index = index
+        self.ticker = _intern(ticker)
+        self.env = env
+        self.codes = intern_codes(codes)
+
+    def __reduce__(self):
+        return ObjectResult, (self.job, self.index, self.ticker, self.env, self.codes)
+
+    @property
+    def failing(self):
+        return [label for label, code in zip(self.job.labels, self.codes) if code == CAT_FAIL]
+
+    def __getitem__(self, key):
+        try:
+            return _RESULT_FIELDS[key](self)
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __iter__(self):
+        return iter(RESULT_KEYS)
+
+    def __len__(self):
+        return len(RESULT_KEYS)
+
+    def as_dict(self):
+        job, codes = self.job, self.codes
+        return {
+            "jobId": job.job_id,
+            "jobName": job.job_name,
+            "object": self.index,
+            "tickerValue": self.ticker,
+            "env": self.env,
+            "publishTime": job.publish_time,
+            "pass": codes.count(CAT_PASS),
+            "fail": codes.count(CAT_FAIL),
+            "warn": codes.count(CAT_WARN),
+            "review": codes.count(CAT_REVIEW),
+            "failing": self.failing,
+        }
+
+    def __repr__(self):
+        return f"ObjectResult({self.as_dict()!r})"
+
+
+_RESULT_FIELDS = {
+    "jobId": lambda r: r.job.job_id,
+    "jobName": lambda r: r.job.job_name,
+    "object": lambda r: r.index,
+    "tickerValue": lambda r: r.ticker,
+    "env": lambda r: r.env,
+    "publishTime": lambda r: r.job.publish_time,
+    **{name: (lambda r, code=code: r.codes.count(code)) for name, code in CATEGORY_CODES.items()},
+    "failing": lambda r: r.failing,
+}
+
+
+def rule_labels(rules=None):
+    """Labels of a compiled rule set, in rule order, as interned strings."""
+    return tuple(sys.intern(rule.label) for rule in (DEFAULT_RULES if rules is None else rules))
+
+
+def object_codes(sources, target_values, rules):
+    """Category codes for one object's (meta, content, props, job_meta) sources, one byte
+    per rule, without building the status rows.
+    """
+    codes = bytearray()
+    for rule in rules:
+        if rule.when and not all(get(sources) == value for _, get, value in rule.when):
+            codes.append(_NA_BYTE)
+            continue
+        goal = target_values.get(rule.target) if rule.target else rule.goal
+        codes.append(CATEGORY_CODES[rule.check(rule.getter(sources), goal)[2]])
+    return bytes(codes)
+
+
+def iter_object_results(data_all, targets=("", "", ""), rules=None, target_table=None, labels=None):
+    """Validate every object in a parsed ledger record, yielding an ObjectResult per object.
+    Each object's dicts are only read while its codes are computed; the results keep
+    none of them. labels is rule_labels(rules), passed in to share one tuple across records.
+    Raises RecordShapeError, before yielding anything, for a record extract_payload rejects.
+    """
+    rules = DEFAULT_RULES if rules is None else rules
+    payload = extract_payload(data_all)
+    job_props, job_meta = payload["job_props"], payload["job_meta"]
+    job = JobFields(
+        payload["job_id"],
+        job_props.get('jobName'),
+        payload["pub_time_str"],
+        rule_labels(rules) if labels is None else labels,
+    )
+    target_values = dict(zip(TARGET_NAMES, targets))
+    for i, (meta, content) in enumerate(payload["objects"]):
+        if target_table is not None:
+            target_values = dict(zip(TARGET_NAMES, target_table.targets_for(meta, job_meta, targets)))
+        codes = object_codes((meta, content, job_props, job_meta), target_values, rules)
+        yield ObjectResult(job, i, meta.get("tickerValue"), env_label(meta.get('isBorgTest')), codes)
+
+
+def validate_record(data_all, targets=("", "", ""), rules=None, target_table=None):
+    """Validate every object in a parsed ledger record.
+    Returns one summary dict per object: job/env identity, status counts and failing fields.
+    Raises RecordShapeError for a record that is not shaped like a ledger record.
+    """
+    return [result.as_dict() for result in iter_object_results(data_all, targets, rules, target_table)]
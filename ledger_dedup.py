@@ -0,0 +1,259 @@
+"""Streaming duplicate and replay detection for ledger logs.
+
+Retries re-publish records, and a log can hold many copies of one job. Each record
+gets two kinds of fingerprint. A content fingerprint (a hash of the record text) is
+checked before the record is parsed. Identity fingerprints, one per
+(jobId, tickerValue, publishTime), catch a replay that was re-serialised with
+different bytes. A record whose content was seen before is a duplicate. A record
+whose every object identity was seen before is a replay. Neither is validated again;
+both are counted, by jobId, so retry storms show up in the summary.
+
+Fingerprints live in a bounded exact set (the oldest are forgotten past the cap) or in
+a Bloom filter sized for a capacity and a false-positive rate. The filter rotates
+through two generations, so memory stays fixed however long a watch runs.
+"""
+import json
+import math
+import re
+import struct
+from collections import Counter
+from functools import partial
+from hashlib import blake2b
+
+from ledger_projection import build_projection, parse_projected
+
+DEDUP_MODES = ("exact", "bloom")
+DEDUP_CAPACITY = 250_000  # fingerprints remembered (exact, ~120 bytes each) or per Bloom generation
+DEDUP_ERROR_RATE = 0.001
+TOP_JOBS = 10  # jobIds listed in the summary
+MAX_TRACKED_JOBS = 10000  # jobIds whose duplicate counts are kept
+# jobId of a duplicate, read from its text without parsing it.
+_JOB_ID_RE = re.compile(r'"jobId"\s*:\s*"((?:[^"\\]|\\.)*)"')
+_JOB_ID_RE_BYTES = re.compile(_JOB_ID_RE.pattern.encode())
+IDENTITY_PATHS = (
+    "key.jobId",
+    'metadata["bbds.context.publishTime"]',
+    "data.objects[*].objectMetadata.tickerValue",
+)
+
+
+def fingerprint(data):
+    """16-byte content hash of a record's text (str or bytes)."""
+    if isinstance(data, str):
+        data = data.encode("utf-8", "surrogatepass")
+    return blake2b(data, digest_size=16).digest()
+
+
+class BoundedSet:
+    """Exact set of fingerprints that forgets the oldest past max_entries."""
+
+    def __init__(self, max_entries=DEDUP_CAPACITY):
+        self.max_entries = max_entries
+        self._entries = {}  # insertion-ordered; used as an ordered set
+
+    def add(self, key):
+        """Add key; return True if it was already present."""
+        if key in self._entries:
+            return True
+        self._entries[key] = None
+        if len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+        return False
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def nbytes(self):
+        return len(self._entries) * 120  # rough: dict slot plus a 16-byte bytes object
+
+
+class BloomFilter:
+    """Bloom filter over 16-byte fingerprints in two rotating generations.
+    Each generation is sized so that capacity entries give about error_rate false
+    positives. When the current one is full it becomes the previous one and a fresh one
+    starts, so the rate stays near error_rate (at most about twice it, while both are
+    consulted) and memory stays fixed.
+    """
+
+    def __init__(self, capacity=DEDUP_CAPACITY, error_rate=DEDUP_ERROR_RATE):
+        if not 0 < error_rate < 1:
+            raise ValueError(f"error_rate must be between 0 and 1, got {error_rate}")
+        self.capacity = max(int(capacity), 1)
+        self.error_rate = error_rate
+        self.bits = max(8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = min(16, max(1, round(self.bits / self.capacity * math.log(2))))  # 16 words = 64 bytes
+        self._unpack = struct.Struct(f"<{self.hashes}I").unpack
+        self._current = bytearray((self.bits + 7) // 8)
+        self._previous = None
+        self._count = 0
+
+    def _positions(self, key):
+        # One wide hash of the fingerprint, cut into hashes 32-bit words at C speed.
+        words = self._unpack(blake2b(key, digest_size=4 * self.hashes).digest())
+        bits = self.bits
+        return [w % bits for w in words]
+
+    @staticmethod
+    def _contains(array, positions):
+        for p in positions:
+            if not array[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+    def __contains__(self, key):
+        positions = self._positions(key)
+        return self._contains(self._current, positions) or (
+            self._previous is not None and self._contains(self._previous, positions))
+
+    def add(self, key):
+        """Add a key; return True if it was (probably) already present."""
+        positions = self._positions(key)
+        if self._contains(self._current, positions):
+            return True
+        seen = self._previous is not None and self._contains(self._previous, positions)
+        if self._count >= self.capacity:
+            self._previous, self._current, self._count = self._current, bytearray(len(self._current)), 0
+        current = self._current
+        for p in positions:
+            current[p >> 3] |= 1 << (p & 7)
+        self._count += 1
+        return seen
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def nbytes(self):
+        return len(self._current) * (1 if self._previous is None else 2)
+
+
+class Deduplicator:
+    """Skips records whose content, or whose every object identity, was seen before."""
+
+    def __init__(self, mode="exact", capacity=DEDUP_CAPACITY, error_rate=DEDUP_ERROR_RATE):
+        if mode not in DEDUP_MODES:
+            raise ValueError(f"Unknown dedup mode '{mode}' (expected one of {', '.join(DEDUP_MODES)})")
+        self.mode = mode
+        if mode == "bloom":
+            self._content = BloomFilter(capacity, error_rate)
+            self._identity = BloomFilter(capacity, error_rate)
+        else:
+            self._content = BoundedSet(capacity)
+            self._identity = BoundedSet(capacity)
+        self.records = 0  # records that parsed, duplicates included; malformed blocks are left to ParseTally
+        self.duplicates = 0
+        self.replays = 0
+        self.by_job = Counter()
+        self._unparsed = None  # content fingerprint of the text last checked, until it parses
+        self._identity_loads = partial(parse_projected, projection=build_projection(IDENTITY_PATHS))
+
+    @property
+    def skipped(self):
+        return self.duplicates + self.replays
+
+    def _count(self, job_id):
+        if job_id in self.by_job or len(self.by_job) < MAX_TRACKED_JOBS:
+            self.by_job[job_id] += 1
+
+    def seen_content(self, text):
+        """True if the same text was seen before as a record that parsed (a duplicate).
+        Otherwise the text is only remembered once seen_identity() is given its parsed
+        record, so a malformed block repeated is never reported as a duplicate.
+        """
+        key = fingerprint(text)
+        if key in self._content:
+            self.records += 1
+            self.duplicates += 1
+            m = (_JOB_ID_RE if isinstance(text, str) else _JOB_ID_RE_BYTES).search(text)
+            job_id = m.group(1) if m else None
+            if isinstance(job_id, bytes):
+                job_id = job_id.decode("utf-8", errors="replace")
+            self._count(job_id)
+            return True
+        self._unparsed = key
+        return False
+
+    def seen_identity(self, data_all):
+        """True if every (jobId, tickerValue, publishTime) in a parsed record was seen before.
+        The record is counted, and its identities and the content fingerprint from the
+        preceding seen_content() are remembered, either way.
+        """
+        if not isinstance(data_all, dict):
+            return False
+        self.records += 1
+        if self._unparsed is not None:
+            self._content.add(self._unparsed)
+            self._unparsed = None
+        key = data_all.get("key")
+        job_id = key.get("jobId") if isinstance(key, dict) else None
+        metadata = data_all.get("metadata")
+        pub = metadata.get("bbds.context.publishTime") if isinstance(metadata, dict) else None
+        data = data_all.get("data")
+        objects = data.get("objects") if isinstance(data, dict) else None
+        tickers = [
+            obj["objectMetadata"].get("tickerValue")
+            for obj in objects if isinstance(obj, dict) and isinstance(obj.get("objectMetadata"), dict)
+        ] if isinstance(objects, list) else []
+        seen = True
+        for ticker in tickers or [None]:
+            ident = repr((job_id, ticker, pub)).encode("utf-8", "surrogatepass")
+            if not self._identity.add(blake2b(ident, digest_size=16).digest()):
+                seen = False
+        if seen:
+            self.replays += 1
+            self._count(job_id)
+        return seen
+
+    def iter_records(self, texts, loads=json.loads):
+        """Parse the record texts that are neither duplicates nor replays, skipping malformed ones."""
+        for text in texts:
+            if self.seen_content(text):
+                continue
+            try:
+                data_all = loads(text if isinstance(text, str) else text.decode("utf-8", errors="replace"))
+            except json.JSONDecodeError:
+                continue
+            if self.seen_identity(data_all):
+                continue
+            yield data_all
+
+    def iter_texts(self, texts):
+        """Pass through the record texts that are neither duplicates nor replays, unparsed.
+        Identities are read with a projection parse that skips object content.
+        """
+        for text in texts:
+            if self.seen_content(text):
+                continue
+            try:
+                identity = self._identity_loads(text)
+            except json.JSONDecodeError:
+                yield text  # let the validator skip it as it would without dedup
+                continue
+            if self.seen_identity(identity):
+                continue
+            yield text
+
+    def summary(self, top=TOP_JOBS):
+        """Counts, memory used and the jobIds replayed most often."""
+        return {
+            "mode": self.mode,
+            "records": self.records,
+            "duplicates": self.duplicates,
+            "replays": self.replays,
+            "fingerprint_bytes": self._content.nbytes + self._identity.nbytes,
+            "top_jobs": [{"jobId": job_id, "skipped": n} for job_id, n in self.by_job.most_common(top + 1)
+                         if job_id is not None][:top],
+        }
+
+
+def format_summary(summary):
+    """Text rendering of Deduplicator.summary() for a terminal."""
+    lines = [f"{summary['duplicates']} duplicate and {summary['replays']} replayed records skipped "
+             f"of {summary['records']} ({summary['mode']}, {summary['fingerprint_bytes'] / 1e6:.1f} MB of fingerprints)"]
+    if summary["top_jobs"]:
+        lines.append("Most replayed jobIds: " + ", ".join(f"{j['jobId']} ({j['skipped']})" for j in summary["top_jobs"]))
+    return lines
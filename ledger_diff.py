@@ -0,0 +1,270 @@
+"""Structural diff of two ledger records, e.g. a job's TEST run against its PROD run.
+
+Both records are hashed bottom-up first: every dict and list gets a 16-byte digest of
+its contents (key order ignored). The diff then walks the two trees together and
+stops at any pair of subtrees whose digests match, so an unchanged branch such as a
+multi-kilobyte objectContent costs one comparison however large it is. Objects are
+paired by tickerValue rather than by position, and only the fields that differ are
+reported. Whole logs are paired record by record on jobName; the second log is only
+indexed up front, and each record is decoded when its pair comes up.
+"""
+from collections import defaultdict, deque
+from functools import partial
+from hashlib import blake2b
+
+from ledger_jsonview import format_json_path, parse_json_path, preview_json
+from ledger_mmap import decode_span, map_log
+from ledger_core import iter_record_spans
+from ledger_projection import build_projection, parse_projected
+
+DIGEST_SIZE = 16
+# Fields that always differ between the TEST and the PROD run of one job.
+ENV_DIFF_PATHS = ("key.jobId", 'metadata["bbds.context.publishTime"]', "objectMetadata.isBorgTest")
+PAIR_PATHS = ("key.jobId", "data.jobProperties.jobName")
+
+
+class _Missing:
+    """Marks the side of a change where the field does not exist."""
+
+    def __repr__(self):
+        return "MISSING"
+
+
+MISSING = _Missing()
+
+
+def _leaf_bytes(value):
+    if isinstance(value, str):
+        data = value.encode("utf-8", "surrogatepass")
+        return b"s%d:" % len(data) + data
+    data = f"{type(value).__name__}:{value!r}".encode()
+    return b"v%d:" % len(data) + data
+
+
+def _digest(value, memo):
+    """Digest of one value; containers' digests are also stored in memo by id()."""
+    if isinstance(value, dict):
+        h = blake2b(b"d", digest_size=DIGEST_SIZE)
+        for key in sorted(value):
+            h.update(_leaf_bytes(key))
+            h.update(_digest(value[key], memo))
+    elif isinstance(value, list):
+        h = blake2b(b"l", digest_size=DIGEST_SIZE)
+        for item in value:
+            h.update(_digest(item, memo))
+    else:
+        return _leaf_bytes(value)
+    digest = memo[id(value)] = h.digest()
+    return digest
+
+
+def subtree_digests(value):
+    """Map id() of every dict and list in value to its content digest.
+    The ids are only meaningful while value is alive.
+    """
+    memo = {}
+    _digest(value, memo)
+    return memo
+
+
+def _walk(a, b, parts, da, db, ignore, skip, changes):
+    if parts in ignore:
+        return
+    if isinstance(a, dict) and isinstance(b, dict):
+        if da[id(a)] == db[id(b)]:
+            return
+        for key in a:
+            child = parts + (key,)
+            if child in skip:
+                continue
+            if key in b:
+                _walk(a[key], b[key], child, da, db, ignore, skip, changes)
+            elif child not in ignore:
+                changes.append((child, a[key], MISSING))
+        for key in b:
+            child = parts + (key,)
+            if key not in a and child not in skip and child not in ignore:
+                changes.append((child, MISSING, b[key]))
+    elif isinstance(a, list) and isinstance(b, list):
+        if da[id(a)] == db[id(b)]:
+            return
+        for i in range(max(len(a), len(b))):
+            child = parts + (i,)
+            if i >= len(b):
+                changes.append((child, a[i], MISSING))
+            elif i >= len(a):
+                changes.append((child, MISSING, b[i]))
+            else:
+                _walk(a[i], b[i], child, da, db, ignore, skip, changes)
+    elif a != b or type(a) is not type(b):
+        changes.append((parts, a, b))
+
+
+def _pair_objects(objects_a, objects_b, da, db):
+    """Pair objects by tickerValue. Within a ticker, identical objects pair first, then the
+    rest in order of appearance. Returns (pairs of (i, j), indexes only in a, only in b).
+    """
+    def key(obj, digests):
+        return _ticker(obj), digests.get(id(obj))
+
+    exact = defaultdict(deque)
+    for j, obj in enumerate(objects_b):
+        exact[key(obj, db)].append(j)
+    pairs, unmatched_a, taken = [], [], set()
+    for i, obj in enumerate(objects_a):
+        queue = exact.get(key(obj, da))
+        if queue:
+            j = queue.popleft()
+            pairs.append((i, j))
+            taken.add(j)
+        else:
+            unmatched_a.append(i)
+
+    by_ticker = defaultdict(deque)
+    for j, obj in enumerate(objects_b):
+        if j not in taken:
+            by_ticker[_ticker(obj)].append(j)
+    only_a = []
+    for i in unmatched_a:
+        queue = by_ticker.get(_ticker(objects_a[i]))
+        if queue:
+            pairs.append((i, queue.popleft()))
+        else:
+            only_a.append(i)
+    only_b = sorted(j for queue in by_ticker.values() for j in queue)
+    pairs.sort()
+    return pairs, only_a, only_b
+
+
+def _ticker(obj):
+    meta = obj.get("objectMetadata") if isinstance(obj, dict) else None
+    return meta.get("tickerValue") if isinstance(meta, dict) else None
+
+
+def _objects(data_all):
+    data = data_all.get("data")
+    objects = data.get("objects") if isinstance(data, dict) else None
+    return objects if isinstance(objects, list) else []
+
+
+def parse_ignore(paths):
+    """Turn ignore path strings (data.jobProperties.agentId, objectMetadata.isBorgTest)
+    into the part tuples diff_records matches against; a path ignores its whole subtree.
+    """
+    return frozenset(tuple(parse_json_path(path)) for path in paths)
+
+
+def diff_records(a, b, ignore=frozenset()):
+    """Diff two parsed ledger records.
+    Job-level changes carry full paths; object changes carry paths relative to the object
+    (objectMetadata.scalingFactor), so ignore may mix both kinds (see parse_ignore).
+    Returns a dict: "job" (changes outside data.objects), "objects" (one entry per paired
+    object that differs), "only_a"/"only_b" (unpaired objects) and "same" (identical pairs).
+    A change is a (path parts, value in a, value in b) tuple, with MISSING for an absent side.
+    """
+    da, db = subtree_digests(a), subtree_digests(b)
+    job_changes = []
+    if da[id(a)] != db[id(b)]:
+        _walk(a, b, (), da, db, ignore, {("data", "objects")}, job_changes)
+
+    objects_a, objects_b = _objects(a), _objects(b)
+    pairs, only_a, only_b = _pair_objects(objects_a, objects_b, da, db)
+    object_diffs = []
+    same = 0
+    for i, j in pairs:
+        obj_a, obj_b = objects_a[i], objects_b[j]
+        changes = []
+        if not (isinstance(obj_a, dict) and isinstance(obj_b, dict)):
+            if obj_a != obj_b:
+                changes.append(((), obj_a, obj_b))
+        elif da[id(obj_a)] != db[id(obj_b)]:
+            _walk(obj_a, obj_b, (), da, db, ignore, frozenset(), changes)
+        if changes:
+            object_diffs.append({"ticker": _ticker(obj_a), "index": (i, j), "changes": changes})
+        else:
+            same += 1
+    return {
+        "job": job_changes,
+        "objects": object_diffs,
+        "only_a": [{"ticker": _ticker(objects_a[i]), "index": i} for i in only_a],
+        "only_b": [{"ticker": _ticker(objects_b[j]), "index": j} for j in only_b],
+        "same": same,
+    }
+
+
+def is_identical(diff):
+    return not (diff["job"] or diff["objects"] or diff["only_a"] or diff["only_b"])
+
+
+def _display(value):
+    return preview_json(value, max_depth=2, max_items=10, max_str=120)
+
+
+def change_dict(change):
+    """One change as a JSON-friendly dict; a missing side is left out."""
+    parts, a, b = change
+    out = {"path": format_json_path(parts)}
+    if a is not MISSING:
+        out["a"] = _display(a)
+    if b is not MISSING:
+        out["b"] = _display(b)
+    return out
+
+
+def diff_to_dict(diff):
+    """diff_records output with every change as a change_dict."""
+    return {
+        "job": [change_dict(c) for c in diff["job"]],
+        "objects": [
+            {"ticker": o["ticker"], "index": list(o["index"]), "changes": [change_dict(c) for c in o["changes"]]}
+            for o in diff["objects"]
+        ],
+        "only_a": diff["only_a"],
+        "only_b": diff["only_b"],
+        "same": diff["same"],
+    }
+
+
+def index_log(buf):
+    """(jobId, jobName, start, end) for every record in a mapped log, read by projection
+    so object content is never decoded.
+    """
+    loads = partial(parse_projected, projection=build_projection(PAIR_PATHS))
+    index = []
+    for start, end in iter_record_spans(buf):
+        record = decode_span(buf, start, end, loads)
+        if not isinstance(record, dict):
+            continue
+        key = record.get("key") if isinstance(record.get("key"), dict) else {}
+        data = record.get("data") if isinstance(record.get("data"), dict) else {}
+        props = data.get("jobProperties") if isinstance(data.get("jobProperties"), dict) else {}
+        index.append((key.get("jobId"), props.get("jobName"), start, end))
+    return index
+
+
+def diff_logs(path_a, path_b, ignore=frozenset()):
+    """Diff two log files record by record, pairing records on jobName (repeats in order).
+    Two single-record logs are diffed directly whatever their jobNames. Yields one dict
+    per record: jobName, jobId_a / jobId_b (None when unpaired) and, for pairs, "diff".
+    """
+    with map_log(path_a) as buf_a, map_log(path_b) as buf_b:
+        index_a, index_b = index_log(buf_a), index_log(buf_b)
+        if len(index_a) == 1 and len(index_b) == 1:
+            pairs, only_b = [(index_a[0], index_b[0])], []
+        else:
+            by_name = defaultdict(deque)
+            for entry in index_b:
+                by_name[entry[1]].append(entry)
+            pairs = [(entry, by_name[entry[1]].popleft() if by_name.get(entry[1]) else None)
+                     for entry in index_a]
+            only_b = sorted((e for queue in by_name.values() for e in queue), key=lambda e: e[2])
+        for entry_a, entry_b in pairs:
+            result = {"jobName": entry_a[1], "jobId_a": entry_a[0], "jobId_b": None}
+            if entry_b is not None:
+                record_a = decode_span(buf_a, entry_a[2], entry_a[3])
+                record_b = decode_span(buf_b, entry_b[2], entry_b[3])
+                result["jobId_b"] = entry_b[0]
+                result["diff"] = diff_records(record_a, record_b, ignore)
+            yield result
+        for entry_b in only_b:
+            yield {"jobName": entry_b[1], "jobId_a": None, "jobId_b": entry_b[0]}
@@ -0,0 +1,205 @@
+"""Persistent validation history in a local SQLite database.
+
+Every validation run becomes one row, indexed on job_id, job_name, env and time, with
+the run's tickers in a side table indexed by ticker. Questions such as "has this jobId
+ever failed in PROD this week?" are then index lookups however long the history gets.
+Writes are queued and committed in batches; any read flushes the queue first, so a
+caller always sees its own runs. Pages are fetched by keyset (id < cursor), so paging
+deep into the history costs the same as the first page.
+"""
+import re
+import sqlite3
+import threading
+import time
+
+PAGE_SIZE = 20
+BATCH_SIZE = 50  # queued runs that force a commit
+FLUSH_SECONDS = 2.0  # oldest a queued run gets before the next add commits it
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS validations (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    job_id TEXT,
+    job_name TEXT,
+    env TEXT,
+    pub_time TEXT,
+    pass INTEGER NOT NULL DEFAULT 0,
+    fail INTEGER NOT NULL DEFAULT 0,
+    warn INTEGER NOT NULL DEFAULT 0,
+    review INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS validation_tickers (
+    validation_id INTEGER NOT NULL REFERENCES validations(id) ON DELETE CASCADE,
+    ticker TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_validations_job_id ON validations(job_id);
+CREATE INDEX IF NOT EXISTS idx_validations_job_name ON validations(job_name);
+CREATE INDEX IF NOT EXISTS idx_validations_env ON validations(env);
+CREATE INDEX IF NOT EXISTS idx_validations_ts ON validations(ts);
+CREATE INDEX IF NOT EXISTS idx_validation_tickers ON validation_tickers(ticker);
+CREATE INDEX IF NOT EXISTS idx_validation_tickers_id ON validation_tickers(validation_id);
+"""
+# Single-column indexes on purpose: SQLite keys each entry by rowid as well, so an
+# equality lookup comes back already in id order and pages need no sort.
+
+_COLUMNS = "id, ts, job_id, job_name, env, pub_time, pass, fail, warn, review"
+_AGE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*([smhdw])")
+_AGE_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+
+def parse_age(text):
+    """Turn a relative age such as "15m", "36h" or "7d" into seconds."""
+    m = _AGE_RE.fullmatch(text.strip().lower())
+    if not m:
+        raise ValueError(f"Expected an age like 15m, 12h or 7d, got {text!r}")
+    return float(m.group(1)) * _AGE_UNITS[m.group(2)]
+
+
+class HistoryStore:
+    """Thread-safe, batched store of validation runs backed by one SQLite file."""
+
+    def __init__(self, path, batch_size=BATCH_SIZE, flush_seconds=FLUSH_SECONDS):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+        self._pending = []  # (row, tickers) not yet committed
+        self._oldest_pending = None
+        self._lock = threading.Lock()
+
+    def add(self, job_id, job_name, env, counts, pub_time=None, tickers=(), ts=None):
+        """Queue one validation run; it is committed with the next batch."""
+        row = (
+            time.time() if ts is None else ts,
+            job_id, job_name, env, pub_time,
+            counts.get("pass", 0), counts.get("fail", 0), counts.get("warn", 0), counts.get("review", 0),
+        )
+        tickers = tuple(dict.fromkeys(str(t) for t in tickers if t))
+        with self._lock:
+            self._pending.append((row, tickers))
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+            if (len(self._pending) >= self.batch_size
+                    or time.monotonic() - self._oldest_pending >= self.flush_seconds):
+                self._flush_locked()
+
+    def flush(self):
+        """Commit every queued run."""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._pending:
+            return
+        with self._conn:
+            for row, tickers in self._pending:
+                cur = self._conn.execute(
+                    "INSERT INTO validations (ts, job_id, job_name, env, pub_time, pass, fail, warn, review) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    row,
+                )
+                if tickers:
+                    self._conn.executemany(
+                        "INSERT INTO validation_tickers (validation_id, ticker) VALUES (?, ?)",
+                        [(cur.lastrowid, ticker) for ticker in tickers],
+                    )
+        self._pending = []
+        self._oldest_pending = None
+
+    @staticmethod
+    def _where(job_id=None, job_name=None, env=None, ticker=None, since=None, until=None,
+               failed=None, search=None):
+        clauses, params = [], []
+        if job_id:
+            clauses.append("job_id = ?")
+            params.append(job_id)
+        if job_name:
+            clauses.append("job_name = ?")
+            params.append(job_name)
+        if env:
+            clauses.append("env = ?")
+            params.append(env)
+        if ticker:
+            clauses.append("id IN (SELECT validation_id FROM validation_tickers WHERE ticker = ?)")
+            params.append(ticker)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        if failed is not None:
+            clauses.append("fail > 0" if failed else "fail = 0")
+        if search:
+            # Exact jobId or ticker, or a jobName prefix as an index range rather than LIKE.
+            clauses.append(
+                "(job_id = ? OR (job_name >= ? AND job_name < ?) "
+                "OR id IN (SELECT validation_id FROM validation_tickers WHERE ticker = ?))"
+            )
+            params.extend((search, search, search + "\uffff", search))
+        return clauses, params
+
+    def query(self, limit=PAGE_SIZE, before_id=None, **filters):
+        """Return up to limit runs matching the filters, newest first.
+        Filters: job_id, job_name, env, ticker (exact), since/until (epoch seconds),
+        failed (True/False) and search (jobId, ticker or jobName prefix). Pass the last
+        returned id as before_id to get the next page.
+        """
+        clauses, params = self._where(**filters)
+        if before_id is not None:
+            clauses.append("id < ?")
+            params.append(before_id)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self._flush_locked()
+            rows = self._conn.execute(
+                f"SELECT {_COLUMNS} FROM validations {where} ORDER BY id DESC LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+            tickers = {}
+            if rows:
+                marks = ",".join("?" * len(rows))
+                for validation_id, ticker in self._conn.execute(
+                    f"SELECT validation_id, ticker FROM validation_tickers WHERE validation_id IN ({marks})",
+                    [row[0] for row in rows],
+                ):
+                    tickers.setdefault(validation_id, []).append(ticker)
+        return [
+            {
+                "id": row[0],
+                "ts": row[1],
+                "job_id": row[2],
+                "job_name": row[3],
+                "env": row[4],
+                "pub_time": row[5],
+                "counts": {"pass": row[6], "fail": row[7], "warn": row[8], "review": row[9]},
+                "tickers": tickers.get(row[0], []),
+            }
+            for row in rows
+        ]
+
+    def count(self, **filters):
+        """Number of runs matching the same filters as query()."""
+        clauses, params = self._where(**filters)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            self._flush_locked()
+            return self._conn.execute(f"SELECT COUNT(*) FROM validations {where}", params).fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._pending = []
+            self._oldest_pending = None
+            with self._conn:
+                self._conn.execute("DELETE FROM validation_tickers")
+                self._conn.execute("DELETE FROM validations")
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._conn.close()
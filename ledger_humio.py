@@ -0,0 +1,198 @@
+"""Fetch ledger records by jobId from a Humio-compatible search API.
+
+HumioClient posts one search per jobId to <base_url>/api/v1/repositories/<repo>/query
+and reads the NDJSON event stream back line by line; each event's @rawstring is a log
+line that goes through the usual record scanner. Requests share a small pool of
+keep-alive connections, several jobIds are queried at once from a thread pool, and
+responses are held in a short-TTL cache so asking for the same job twice within a
+minute does not hit the server again. Standard library only, so the CLI can use it.
+"""
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from http.client import HTTPConnection, HTTPException, HTTPSConnection, RemoteDisconnected
+from urllib.parse import quote, urlsplit
+
+from ledger_cache import TTLCache
+from ledger_core import iter_json_records
+
+QUERY_TEMPLATE = '"{job_id}"'  # free-text search for the jobId anywhere in the event
+QUERY_START = "15m"  # same look-back window as the dashboard links
+MAX_CONNECTIONS = 8
+FETCH_WORKERS = 8
+CACHE_TTL_SECONDS = 60
+CACHE_MAX_ENTRIES = 256
+CACHE_MAX_MB = 64  # raw event text held across cached responses
+REQUEST_TIMEOUT = 30
+
+# A reused keep-alive connection the server has already closed fails with one of these;
+# the request is then retried once on a fresh connection.
+_STALE_ERRORS = (RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+
+class HumioQueryError(OSError):
+    """Raised when a search request fails or the server answers with an error status."""
+
+
+class ConnectionPool:
+    """Thread-safe pool of keep-alive HTTP(S) connections to one host.
+    At most max_connections are open at once; callers beyond that wait for a free one.
+    """
+
+    def __init__(self, base_url, max_connections=MAX_CONNECTIONS, timeout=REQUEST_TIMEOUT):
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"Expected an http(s) base URL, got {base_url!r}")
+        self._conn_cls = HTTPSConnection if parts.scheme == "https" else HTTPConnection
+        self.host = parts.hostname
+        self.port = parts.port
+        self.path_prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()  # most recently used first: likeliest to still be open
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def _new(self):
+        return self._conn_cls(self.host, self.port, timeout=self.timeout)
+
+    def _get(self):
+        try:
+            return self._idle.get_nowait(), True
+        except queue.Empty:
+            return self._new(), False
+
+    @contextmanager
+    def request(self, method, path, body=None, headers=None):
+        """Send a request and yield the response for streaming.
+        The connection goes back to the pool unless the caller raised while reading it.
+        """
+        self._slots.acquire()
+        conn = None
+        try:
+            conn, reused = self._get()
+            try:
+                conn.request(method, self.path_prefix + path, body=body, headers=headers or {})
+                response = conn.getresponse()
+            except _STALE_ERRORS:
+                conn.close()
+                if not reused:
+                    raise
+                conn = self._new()
+                conn.request(method, self.path_prefix + path, body=body, headers=headers or {})
+                response = conn.getresponse()
+            yield response
+            response.read()  # drain what the caller left so the connection can be reused
+            if not response.will_close:
+                self._idle.put(conn)
+                conn = None
+        finally:
+            if conn is not None:
+                conn.close()
+            self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def job_query(job_id, template=QUERY_TEMPLATE):
+    """Humio query string for one jobId; quotes and backslashes in the id are escaped."""
+    escaped = str(job_id).replace("\\", "\\\\").replace('"', '\\"')
+    return template.format(job_id=escaped)
+
+
+class HumioClient:
+    """Search a Humio repository for the ledger lines of one or many jobIds."""
+
+    def __init__(self, base_url, repository, token=None, start=QUERY_START,
+                 query_template=QUERY_TEMPLATE, max_connections=MAX_CONNECTIONS,
+                 timeout=REQUEST_TIMEOUT, cache_ttl=CACHE_TTL_SECONDS):
+        self.repository = repository
+        self.token = token
+        self.start = start
+        self.query_template = query_template
+        self.pool = ConnectionPool(base_url, max_connections, timeout)
+        self.cache = TTLCache(CACHE_MAX_ENTRIES, cache_ttl, max_weight=CACHE_MAX_MB << 20)
+
+    def _headers(self):
+        headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/x-ndjson",
+            "Connection": "keep-alive",
+        }
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    def iter_job_lines(self, job_id):
+        """Run the search for one jobId and yield each matching event's raw log line."""
+        body = json.dumps({
+            "queryString": job_query(job_id, self.query_template),
+            "start": self.start,
+            "isLive": False,
+        })
+        path = f"/api/v1/repositories/{quote(self.repository, safe='')}/query"
+        try:
+            with self.pool.request("POST", path, body, self._headers()) as response:
+                if response.status != 200:
+                    detail = response.read(512).decode("utf-8", errors="replace").strip()
+                    raise HumioQueryError(f"Humio query for {job_id} failed: HTTP {response.status} {detail}")
+                for line in response:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    raw = event.get("@rawstring") if isinstance(event, dict) else None
+                    if raw:
+                        yield raw
+        except (HTTPException, OSError) as e:
+            if isinstance(e, HumioQueryError):
+                raise
+            raise HumioQueryError(f"Humio query for {job_id} failed: {e}") from e
+
+    def fetch_job(self, job_id):
+        """Return the raw log lines for one jobId, from the response cache when fresh."""
+        key = (job_id, self.start, self.query_template)
+        lines = self.cache.get(key)
+        if lines is None:
+            lines = list(self.iter_job_lines(job_id))
+            self.cache.put(key, lines, weight=sum(len(line) for line in lines) or 1)
+        return lines
+
+    def _fetch_or_error(self, job_id):
+        try:
+            return job_id, self.fetch_job(job_id), None
+        except HumioQueryError as e:
+            return job_id, [], e
+
+    def fetch_jobs(self, job_ids, workers=FETCH_WORKERS):
+        """Query several jobIds concurrently, yielding (job_id, lines, error) in input order.
+        A failed query yields its error instead of stopping the others.
+        """
+        job_ids = list(dict.fromkeys(job_ids))  # drop repeats, keep order
+        if len(job_ids) <= 1 or workers <= 1:
+            yield from map(self._fetch_or_error, job_ids)
+            return
+        with ThreadPoolExecutor(max_workers=min(workers, len(job_ids))) as executor:
+            yield from executor.map(self._fetch_or_error, job_ids)
+
+    def close(self):
+        self.pool.close()
+
+
+def iter_line_records(lines, loads=json.loads):
+    """Yield the ledger records found in fetched raw log lines."""
+    for line in lines:
+        yield from iter_json_records(line, loads=loads)
+
+
+def parse_job_ids(text):
+    """Split pasted text (one per line, or comma/space separated) into jobIds, in order."""
+    return list(dict.fromkeys(text.replace(",", " ").split()))
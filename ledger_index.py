@@ -0,0 +1,252 @@
+"""Sidecar byte-offset index of a ledger log, for seeking straight to one job's records.
+
+One scan of the log maps every record's jobId, tickerValue, agentId and ecoticker to
+the record's byte offset and length, in a SQLite file next to the log. A lookup is then
+an index query plus one seek and read per matching record, however large the log is.
+The index remembers how far into the log it got, so update() only scans the bytes
+appended since. A log that was rotated or truncated (its first bytes changed, or it
+shrank) is indexed again from the start. Records are read with a projection parser, so
+object content is never decoded.
+"""
+import json
+import os
+import sqlite3
+from functools import partial
+from hashlib import blake2b
+
+from ledger_core import iter_record_spans
+from ledger_mmap import decode_span, map_log
+from ledger_projection import build_projection, parse_projected
+
+INDEX_FIELDS = {
+    "jobId": "key.jobId",
+    "tickerValue": "data.objects[*].objectMetadata.tickerValue",
+    "agentId": "data.jobProperties.agentId",
+    "ecoticker": "data.jobMetadata.ecoticker",
+}
+INDEX_SUFFIX = ".index.sqlite3"
+HEAD_BYTES = 4096  # leading log bytes fingerprinted to notice rotation or truncation
+COMMIT_RECORDS = 20000  # records indexed per transaction
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS log_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    head BLOB NOT NULL,
+    head_length INTEGER NOT NULL,
+    indexed_to INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    start INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS record_keys (
+    field TEXT NOT NULL,
+    value TEXT NOT NULL,
+    record_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_record_keys ON record_keys(field, value);
+"""
+# records.id follows log order, and an equality lookup on (field, value) comes back in
+# record_id order, so matches are read front to back without a sort.
+
+
+class IndexBusy(Exception):
+    """Another process indexed the same bytes first; this update stopped."""
+
+
+def index_file_for(log_path, index_dir=None):
+    """Sidecar index path: next to the log, or inside index_dir named after a hash of the
+    log's absolute path (for logs in directories the reader cannot write to).
+    """
+    if not index_dir:
+        return log_path + INDEX_SUFFIX
+    digest = blake2b(os.path.abspath(log_path).encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(index_dir, f"{os.path.basename(log_path)}.{digest}{INDEX_SUFFIX}")
+
+
+def _dict(value):
+    return value if isinstance(value, dict) else {}
+
+
+def _key_text(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return None
+
+
+def record_keys(record):
+    """Distinct (field, value) pairs one parsed ledger record is indexed under."""
+    data = _dict(record.get("data"))
+    values = [
+        ("jobId", _dict(record.get("key")).get("jobId")),
+        ("agentId", _dict(data.get("jobProperties")).get("agentId")),
+        ("ecoticker", _dict(data.get("jobMetadata")).get("ecoticker")),
+    ]
+    objects = data.get("objects")
+    if isinstance(objects, list):
+        values += [("tickerValue", _dict(obj.get("objectMetadata")).get("tickerValue"))
+                   for obj in objects if isinstance(obj, dict)]
+    keys = {}
+    for field, value in values:
+        text = _key_text(value)
+        if text:
+            keys[(field, text)] = None
+    return list(keys)
+
+
+class LogIndex:
+    """Byte-offset index of one log file, stored in a SQLite sidecar."""
+
+    def __init__(self, log_path, index_path=None):
+        self.log_path = log_path
+        self.index_path = index_path or index_file_for(log_path)
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.index_path, timeout=30, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode = WAL")
+        self._conn.executescript(SCHEMA)
+        self._loads = partial(parse_projected, projection=build_projection(INDEX_FIELDS.values()))
+        self.skipped = 0  # malformed blocks the last update passed over
+        self.stopped_at = None  # offset of the unclosed record the last update stopped at, or None
+        self.pending = 0  # bytes from stopped_at to the end of the log
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _state(self):
+        """(head, head_length, indexed_to), or None before the first update."""
+        return self._conn.execute("SELECT head, head_length, indexed_to FROM log_state").fetchone()
+
+    def update(self, rebuild=False):
+        """Index the records appended since the last update: the whole log the first time,
+        after rebuild=True, or when the log was rotated or truncated. A record still being
+        written at the end of the log is left for the next update; where it starts and its
+        size are kept in stopped_at and pending. Returns the number of records added.
+        """
+        with map_log(self.log_path) as buf:
+            state = self._state()
+            indexed_to = 0 if state is None else state[2]
+            added = 0
+            self.skipped = self.pending = 0
+            self.stopped_at = None
+            try:
+                if state is not None and (rebuild or not self._same_log(buf, state)):
+                    self._write([], [], None, indexed_to, buf, reset=True)
+                    indexed_to = 0
+                records, keys = [], []
+                next_id = self._conn.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM records").fetchone()[0]
+                end = indexed_to
+                for start, end in iter_record_spans(buf, indexed_to, partial=False):
+                    record = decode_span(buf, start, end, self._loads)
+                    if isinstance(record, dict):
+                        records.append((next_id, start, end - start))
+                        keys += [(field, value, next_id) for field, value in record_keys(record)]
+                        next_id += 1
+                    else:
+                        self.skipped += 1
+                    if len(records) >= COMMIT_RECORDS:
+                        self._write(records, keys, end, indexed_to, buf)
+                        added += len(records)
+                        records, keys, indexed_to = [], [], end
+                if end > indexed_to:
+                    self._write(records, keys, end, indexed_to, buf)
+                    added += len(records)
+                    indexed_to = end
+                # Every block before it was yielded, so the next brace opens the unclosed record.
+                start = buf.find(b"{", indexed_to)
+                if start != -1:
+                    self.stopped_at, self.pending = start, len(buf) - start
+            except IndexBusy:
+                pass
+            return added
+
+    @staticmethod
+    def _same_log(buf, state):
+        head, head_length, indexed_to = state
+        if len(buf) < max(indexed_to, head_length):
+            return False
+        return blake2b(buf[:head_length], digest_size=16).digest() == head
+
+    def _write(self, records, keys, indexed_to, expected, buf, reset=False):
+        """Commit one batch and advance indexed_to, unless another process moved it first."""
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            state = self._state()
+            if (state[2] if state else 0) != expected:
+                raise IndexBusy()
+            if reset:
+                conn.execute("DELETE FROM record_keys")
+                conn.execute("DELETE FROM records")
+                conn.execute("DELETE FROM log_state")
+            else:
+                conn.executemany("INSERT INTO records (id, start, length) VALUES (?, ?, ?)", records)
+                conn.executemany("INSERT INTO record_keys (field, value, record_id) VALUES (?, ?, ?)", keys)
+                head_length = min(HEAD_BYTES, len(buf))
+                conn.execute(
+                    "INSERT OR REPLACE INTO log_state (id, head, head_length, indexed_to) VALUES (1, ?, ?, ?)",
+                    (blake2b(buf[:head_length], digest_size=16).digest(), head_length, indexed_to),
+                )
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def lookup(self, filters):
+        """(start, length) spans of the records matching filters, in log order.
+        filters maps an INDEX_FIELDS name to a value or a list of values; a record must
+        match every field given, and any of that field's values.
+        """
+        clauses, params = [], []
+        for field, values in filters.items():
+            if field not in INDEX_FIELDS:
+                raise ValueError(f"Unknown index field '{field}' (expected one of {', '.join(INDEX_FIELDS)})")
+            values = [values] if isinstance(values, str) else list(values)
+            if not values:
+                continue
+            clauses.append("id IN (SELECT record_id FROM record_keys WHERE field = ? AND value IN "
+                           f"({', '.join('?' * len(values))}))")
+            params += [field, *values]
+        if not clauses:
+            raise ValueError("No lookup keys given")
+        return self._conn.execute(
+            f"SELECT start, length FROM records WHERE {' AND '.join(clauses)} ORDER BY id", params
+        ).fetchall()
+
+    def stats(self):
+        """Records indexed, bytes covered (and the log's size) and distinct values per field."""
+        state = self._state()
+        distinct = dict(self._conn.execute(
+            "SELECT field, COUNT(DISTINCT value) FROM record_keys GROUP BY field"
+        ).fetchall())
+        return {
+            "records": self._conn.execute("SELECT COUNT(*) FROM records").fetchone()[0],
+            "indexed_to": state[2] if state else 0,
+            "log_bytes": os.path.getsize(self.log_path),
+            "keys": {field: distinct.get(field, 0) for field in INDEX_FIELDS},
+        }
+
+
+def read_spans(log_path, spans):
+    """Yield the text of each (start, length) span of a log file, seeking to each in turn."""
+    with open(log_path, "rb") as f:
+        for start, length in spans:
+            f.seek(start)
+            yield f.read(length).decode("utf-8", errors="replace")
+
+
+def iter_span_records(log_path, spans, loads=json.loads):
+    """Parse the records at the given spans, skipping any that no longer parse."""
+    for text in read_spans(log_path, spans):
+        try:
+            yield loads(text)
+        except json.JSONDecodeError:
+            continue
@@ -0,0 +1,118 @@
+"""Size-bounded previews and path lookup for large parsed ledger payloads.
+
+Used by the raw JSON viewer so a multi-megabyte record is never serialized to the
+browser in full: only a depth- and length-limited preview of the chosen subtree is.
+"""
+import re
+
+PREVIEW_MAX_DEPTH = 3
+PREVIEW_MAX_ITEMS = 25
+PREVIEW_MAX_STR = 300
+
+# Path segments: .key / key, [17], ["key.with.dots"], [*]
+_PATH_TOKEN_RE = re.compile(r'\.?([^.\[\]"*]+)|\[(\d+|\*)\]|\["((?:[^"\\]|\\.)*)"\]')
+
+WILDCARD = ...  # a [*] segment: every item of a list
+
+
+class JsonPathError(KeyError):
+    """Raised when a viewer path does not resolve inside the payload."""
+
+    def __str__(self):
+        return self.args[0] if self.args else ""
+
+
+def parse_json_path(path):
+    """Split a path like data.objects[17] or metadata["bbds.context.publishTime"] into keys/indexes.
+    A [*] segment becomes WILDCARD.
+    """
+    parts = []
+    pos = 0
+    path = path.strip()
+    while pos < len(path):
+        m = _PATH_TOKEN_RE.match(path, pos)
+        if not m or m.end() == pos:
+            raise JsonPathError(f"Cannot parse path at '{path[pos:]}'")
+        key, index, quoted = m.groups()
+        if index == "*":
+            parts.append(WILDCARD)
+        elif index is not None:
+            parts.append(int(index))
+        elif quoted is not None:
+            parts.append(quoted.replace('\\"', '"'))
+        else:
+            parts.append(key)
+        pos = m.end()
+    return parts
+
+
+_PLAIN_KEY_RE = re.compile(r'[^.\[\]"*\s]+')
+
+
+def format_json_path(parts):
+    """Inverse of parse_json_path: join keys/indexes into data.objects[17] style text."""
+    out = []
+    for part in parts:
+        if part is WILDCARD:
+            out.append("[*]")
+        elif isinstance(part, int):
+            out.append(f"[{part}]")
+        elif _PLAIN_KEY_RE.fullmatch(part):
+            out.append(f".{part}" if out else part)
+        else:
+            out.append('["' + part.replace('"', '\\"') + '"]')
+    return "".join(out)
+
+
+def resolve_json_path(data, path):
+    """Return the subtree of data at path ('' is the whole payload)."""
+    node = data
+    walked = ""
+    for part in parse_json_path(path):
+        if part is WILDCARD:
+            raise JsonPathError("[*] selects many items; pick one index to view")
+        if isinstance(part, int):
+            if not isinstance(node, list) or part >= len(node):
+                raise JsonPathError(f"{walked or 'root'} has no index [{part}]")
+            walked += f"[{part}]"
+        else:
+            if not isinstance(node, dict) or part not in node:
+                raise JsonPathError(f"{walked or 'root'} has no key '{part}'")
+            walked += f".{part}" if walked else part
+        node = node[part]
+    return node
+
+
+def _summary(value):
+    if isinstance(value, dict):
+        return f"{{... {len(value)} keys}}"
+    return f"[... {len(value)} items]"
+
+
+def preview_json(value, max_depth=PREVIEW_MAX_DEPTH, max_items=PREVIEW_MAX_ITEMS, max_str=PREVIEW_MAX_STR):
+    """Return a truncated copy of value that is cheap to serialize.
+    Containers below max_depth collapse to a summary string, containers longer than
+    max_items keep their first items plus a marker, and long strings are cut.
+    """
+    if isinstance(value, str):
+        if len(value) > max_str:
+            return value[:max_str] + f"... ({len(value) - max_str} more chars)"
+        return value
+    if not isinstance(value, (dict, list)):
+        return value
+    if max_depth <= 0:
+        return _summary(value)
+
+    if isinstance(value, dict):
+        preview = {}
+        for n, (key, child) in enumerate(value.items()):
+            if n == max_items:
+                preview["..."] = f"{len(value) - max_items} more keys"
+                break
+            preview[key] = preview_json(child, max_depth - 1, max_items, max_str)
+        return preview
+
+    preview = [preview_json(child, max_depth - 1, max_items, max_str) for child in value[:max_items]]
+    if len(value) > max_items:
+        preview.append(f"... {len(value) - max_items} more items")
+    return preview
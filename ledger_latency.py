@@ -0,0 +1,203 @@
+"""Publish-latency analytics: how stale ledger records are when they are validated.
+
+Drift is the reference clock minus a record's bbds.context.publishTime. The clock is
+captured once per batch (or once per watch poll) instead of once per record, so a
+whole batch is measured against the same instant. Drifts are kept in a flat
+array('d') for exact percentiles, bucketed into fixed histograms per jobName and per
+tickerValue, and the worst publishes are kept in a bounded heap, so millions of
+records cost a few bytes each rather than an object apiece.
+"""
+import heapq
+import threading
+import time
+from array import array
+from itertools import count
+
+from ledger_core import DRIFT_THRESHOLD_SECONDS, format_drift, parse_iso_epoch
+from ledger_metrics import Histogram
+
+# Upper bounds in seconds; the last bucket (+Inf) is implicit. Negative drift (a publish
+# time ahead of the clock) lands in the first bucket.
+DRIFT_BUCKETS = (1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 900.0, 1800.0, 3600.0, 14400.0, 86400.0)
+PERCENTILES = (0.5, 0.9, 0.99, 0.999)
+WORST = 20  # stale publishes kept for the report
+MAX_GROUPS = 10000  # per-job / per-ticker histograms; later names share one overflow group
+OVERFLOW_GROUP = "(other)"
+
+
+def _bound(seconds):
+    """A histogram bound for JSON: None past the last bucket instead of inf."""
+    return None if seconds == float("inf") else seconds
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+class LatencyStats:
+    """Drift distribution of a batch of ledger records against one captured clock."""
+
+    def __init__(self, now=None, stale_seconds=DRIFT_THRESHOLD_SECONDS, worst=WORST, buckets=DRIFT_BUCKETS):
+        self.now = time.time() if now is None else now
+        self.stale_seconds = stale_seconds
+        self.buckets = buckets
+        self.drifts = array("d")
+        self.histogram = Histogram(buckets)
+        self.by_job = {}
+        self.by_ticker = {}
+        self.records = 0
+        self.unparseable = 0
+        self.stale = 0
+        self._worst = []  # min-heap of (drift, seq, job_id, job_name, publish_time)
+        self._worst_size = worst
+        self._seq = count()
+        self._record_drift = None  # drift of the record whose objects are being tracked
+        self._lock = threading.Lock()
+
+    def set_clock(self, now=None):
+        """Capture the reference clock for the next batch (the current time by default)."""
+        self.now = time.time() if now is None else now
+
+    def _group(self, groups, name):
+        hist = groups.get(name)
+        if hist is None:
+            if len(groups) >= MAX_GROUPS:
+                name = OVERFLOW_GROUP
+                hist = groups.get(name)
+            if hist is None:
+                hist = groups[name] = Histogram(self.buckets)
+        return hist
+
+    def add(self, publish_time, job_id=None, job_name=None):
+        """Record one ledger record's publish time; returns its drift in seconds, or None
+        when the timestamp is missing or unparseable.
+        """
+        epoch = parse_iso_epoch(publish_time)
+        with self._lock:
+            self.records += 1
+            if epoch is None:
+                self.unparseable += 1
+                return None
+            drift = self.now - epoch
+            self.drifts.append(drift)
+            self.histogram.observe(drift)
+            self._group(self.by_job, job_name).observe(drift)
+            if drift > self.stale_seconds:
+                self.stale += 1
+                entry = (drift, next(self._seq), job_id, job_name, publish_time)
+                if len(self._worst) < self._worst_size:
+                    heapq.heappush(self._worst, entry)
+                elif drift > self._worst[0][0]:
+                    heapq.heapreplace(self._worst, entry)
+            return drift
+
+    def add_results(self, results):
+        """Record the publish times behind a list of validate_record results.
+        Each record is counted once (at its object 0); every object's ticker gets the drift.
+        """
+        for result in results:
+            if result["object"] == 0:
+                self._record_drift = self.add(result["publishTime"], result["jobId"], result["jobName"])
+            if self._record_drift is not None:
+                with self._lock:
+                    self._group(self.by_ticker, result["tickerValue"]).observe(self._record_drift)
+
+    def track(self, results):
+        """Pass validate_record results through unchanged, recording their publish times."""
+        for result in results:
+            self.add_results((result,))
+            yield result
+
+    def worst(self):
+        """The stalest publishes, worst first, as dicts."""
+        with self._lock:
+            entries = sorted(self._worst, reverse=True)
+        return [
+            {"drift_s": drift, "drift": format_drift(drift), "jobId": job_id, "jobName": job_name,
+             "publishTime": publish_time}
+            for drift, _, job_id, job_name, publish_time in entries
+        ]
+
+    def brief(self):
+        """Cheap running figures for a live display: counts plus histogram p50/p99 bounds
+        (no sort, so it can be called on every refresh of a long-running watch).
+        """
+        with self._lock:
+            return {
+                "records": self.records,
+                "stale": self.stale,
+                "p50_s": _bound(self.histogram.quantile(0.5)),
+                "p99_s": _bound(self.histogram.quantile(0.99)),
+            }
+
+    @staticmethod
+    def _group_rows(groups, limit):
+        rows = [
+            {"name": name, "count": h.count, "mean_s": h.sum / h.count if h.count else 0.0,
+             "p50_s": _bound(h.quantile(0.5)), "p99_s": _bound(h.quantile(0.99))}
+            for name, h in groups.items()
+        ]
+        rows.sort(key=lambda row: (-(row["p99_s"] or float("inf")), -row["mean_s"], str(row["name"])))
+        return rows[:limit]
+
+    def summary(self, groups=20):
+        """Plain-dict report: totals, exact drift percentiles, the histogram, the worst
+        groups by p99 (histogram bucket bound) and the stalest publishes.
+        """
+        with self._lock:
+            ordered = sorted(self.drifts)
+            hist = self.histogram
+            report = {
+                "now": self.now,
+                "records": self.records,
+                "parsed": len(ordered),
+                "unparseable": self.unparseable,
+                "stale": self.stale,
+                "stale_seconds": self.stale_seconds,
+                "min_s": ordered[0] if ordered else 0.0,
+                "max_s": ordered[-1] if ordered else 0.0,
+                "mean_s": hist.sum / hist.count if hist.count else 0.0,
+                "percentiles": {f"p{q * 100:g}": _percentile(ordered, q) for q in PERCENTILES},
+                "histogram": [
+                    {"le": _bound(bound), "count": n}
+                    for bound, n in zip(self.buckets + (float("inf"),), hist.counts)
+                ],
+                "by_job": self._group_rows(self.by_job, groups),
+                "by_ticker": self._group_rows(self.by_ticker, groups),
+            }
+        report["worst"] = self.worst()
+        return report
+
+
+def format_seconds(seconds):
+    """Render a drift for a report: "4.2s" under a minute, else "2h 5m" / "7m".
+    None (a histogram bound past the last bucket) renders as "inf".
+    """
+    if seconds is None:
+        return "inf"
+    if abs(seconds) < 60:
+        return f"{seconds:.1f}s"
+    return ("-" if seconds < 0 else "") + format_drift(abs(seconds))
+
+
+def format_report(report, top=5):
+    """Text rendering of summary() for a terminal."""
+    if not report["parsed"]:
+        return [f"Publish latency: no parseable publish times in {report['records']} records"]
+    pcts = " ".join(f"{name}={format_seconds(v)}" for name, v in report["percentiles"].items())
+    lines = [
+        f"Publish latency over {report['parsed']} records ({report['unparseable']} unparseable): "
+        f"{pcts} max={format_seconds(report['max_s'])}",
+        f"{report['stale']} published more than {format_seconds(report['stale_seconds'])} before the clock",
+    ]
+    for title, key in (("jobName", "by_job"), ("tickerValue", "by_ticker")):
+        if report[key]:
+            lines.append(f"Slowest by {title} (p99 bucket bound, mean, records):")
+            lines += [f"  {row['name']}: <={format_seconds(row['p99_s'])} {format_seconds(row['mean_s'])} "
+                      f"{row['count']}" for row in report[key][:top]]
+    if report["worst"]:
+        lines.append("Stalest publishes:")
+        lines += [f"  {w['drift']} {w['publishTime']} {w['jobName']} {w['jobId']}" for w in report["worst"]]
+    return lines
@@ -0,0 +1,245 @@
+"""Low-overhead stage timers and counters, exported in Prometheus text format.
+
+A Metrics registry holds counters (records, objects, bytes, failed objects, skipped
+duplicates, rejected service connections) and one
+fixed-bucket histogram per stage (scan, decode, validate, render, ...). Observing is a
+perf_counter delta, a bisect and a few additions under a lock, so it is cheap enough
+to wrap every record. prometheus_text() renders any number of registries as one
+exposition, which write_prometheus() publishes atomically for a node exporter
+textfile collector to scrape.
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Upper bounds in seconds; the last bucket (+Inf) is implicit.
+DEFAULT_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+COUNTERS = ("records", "objects", "bytes", "failed", "duplicates", "rejected")
+COUNTER_HELP = {
+    "records": "Ledger records parsed.",
+    "objects": "Ledger objects validated.",
+    "bytes": "Record bytes decoded.",
+    "failed": "Objects with at least one failing check.",
+    "duplicates": "Ledger records skipped as duplicates or replays.",
+    "rejected": "HTTP connections turned away because the validation service was full.",
+}
+PREFIX = "borg_ledger"
+
+_perf = time.perf_counter
+
+
+class Histogram:
+    """Fixed-bucket latency histogram; counts[i] covers (buckets[i-1], buckets[i]]."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (inf past the last bucket)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Counters and per-stage histograms for one pipeline (labels e.g. {"mode": "batch"})."""
+
+    def __init__(self, labels=None, buckets=DEFAULT_BUCKETS):
+        self.labels = dict(labels or {})
+        self.buckets = buckets
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.stages = {}
+        self.started = time.time()
+        self.updated = None
+        self._last_decode = [0.0]  # decode time inside the current timed_records step
+        self._lock = threading.Lock()
+
+    def inc(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+            self.updated = time.time()
+
+    def observe(self, stage, seconds, **counts):
+        """Record one stage duration, plus optional counter increments in the same update."""
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram(self.buckets)
+            hist.observe(seconds)
+            for name, n in counts.items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            self.updated = time.time()
+
+    @contextmanager
+    def stage(self, name):
+        """Time the with-block as one observation of a stage."""
+        t0 = _perf()
+        try:
+            yield
+        finally:
+            self.observe(name, _perf() - t0)
+
+    def count_results(self, results):
+        """Count objects and failed objects in a list of validate_record results."""
+        self.inc("objects", len(results))
+        failed = sum(1 for r in results if r["fail"])
+        if failed:
+            self.inc("failed", failed)
+
+    def timed_loads(self, loads):
+        """Wrap a record parser so each call counts a record and its bytes and is timed
+        as "decode". The time is also added to the step timed_records is measuring.
+        """
+        last = self._last_decode
+
+        def timed(text):
+            t0 = _perf()
+            try:
+                value = loads(text)
+            except Exception:
+                elapsed = _perf() - t0
+                last[0] += elapsed
+                self.observe("decode", elapsed, bytes=len(text))
+                raise
+            elapsed = _perf() - t0
+            last[0] += elapsed
+            self.observe("decode", elapsed, records=1, bytes=len(text))
+            return value
+        return timed
+
+    def timed_records(self, records):
+        """Wrap a record iterator so the time spent producing each record, less the time
+        inside the timed_loads parser, is observed as "scan". Meant for one pipeline per
+        registry: two interleaved timed_records loops would misattribute decode time.
+        """
+        last = self._last_decode
+        it = iter(records)
+        while True:
+            last[0] = 0.0
+            t0 = _perf()
+            try:
+                record = next(it)
+            except StopIteration:
+                return
+            self.observe("scan", _perf() - t0 - last[0])
+            yield record
+
+    def merge(self, other):
+        """Add another registry's counters and histograms (same buckets) into this one."""
+        with other._lock:
+            counters = dict(other.counters)
+            stages = {name: (list(h.counts), h.sum, h.count) for name, h in other.stages.items()}
+            updated = other.updated
+        with self._lock:
+            for name, n in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + n
+            for name, (counts, total, count) in stages.items():
+                hist = self.stages.get(name)
+                if hist is None:
+                    hist = self.stages[name] = Histogram(self.buckets)
+                hist.counts = [a + b for a, b in zip(hist.counts, counts)]
+                hist.sum += total
+                hist.count += count
+            if updated is not None:
+                self.updated = max(self.updated or 0, updated)
+
+    def snapshot(self):
+        """Plain-dict copy for display: counters, elapsed seconds and per-stage stats."""
+        with self._lock:
+            stages = {
+                name: {
+                    "count": h.count,
+                    "total_s": h.sum,
+                    "mean_ms": h.sum / h.count * 1e3 if h.count else 0.0,
+                    "p50_ms": h.quantile(0.50) * 1e3,
+                    "p99_ms": h.quantile(0.99) * 1e3,
+                }
+                for name, h in self.stages.items()
+            }
+            return {
+                "labels": dict(self.labels),
+                "counters": dict(self.counters),
+                "elapsed_s": time.time() - self.started,
+                "stages": stages,
+            }
+
+
+def _labels(labels, **extra):
+    items = {**labels, **extra}
+    if not items:
+        return ""
+    escaped = (
+        f'{k}="' + str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') + '"'
+        for k, v in items.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def prometheus_text(registries):
+    """Render registries as one Prometheus text exposition (one HELP/TYPE per family)."""
+    snapshots = []
+    for m in registries:
+        with m._lock:
+            snapshots.append((
+                m.labels, dict(m.counters), m.started, m.updated,
+                {name: (h.buckets, list(h.counts), h.sum, h.count) for name, h in m.stages.items()},
+            ))
+    lines = []
+    for name in COUNTERS:
+        family = f"{PREFIX}_{name}_total"
+        lines += [f"# HELP {family} {COUNTER_HELP[name]}", f"# TYPE {family} counter"]
+        lines += [f"{family}{_labels(labels)} {counters.get(name, 0)}" for labels, counters, *_ in snapshots]
+
+    family = f"{PREFIX}_stage_seconds"
+    lines += [f"# HELP {family} Time spent per item in each pipeline stage.", f"# TYPE {family} histogram"]
+    for labels, _, _, _, stages in snapshots:
+        for stage, (buckets, counts, total, count) in sorted(stages.items()):
+            cumulative = 0
+            for bound, n in zip(buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(f"{family}_bucket{_labels(labels, stage=stage, le=_number(bound))} {cumulative}")
+            lines.append(f"{family}_sum{_labels(labels, stage=stage)} {_number(total)}")
+            lines.append(f"{family}_count{_labels(labels, stage=stage)} {count}")
+
+    family = f"{PREFIX}_start_time_seconds"
+    lines += [f"# HELP {family} When the pipeline started, in Unix time.", f"# TYPE {family} gauge"]
+    lines += [f"{family}{_labels(labels)} {_number(started)}" for labels, _, started, _, _ in snapshots]
+    family = f"{PREFIX}_last_update_seconds"
+    lines += [f"# HELP {family} Last time the pipeline processed anything, in Unix time.",
+              f"# TYPE {family} gauge"]
+    lines += [f"{family}{_labels(labels)} {_number(updated)}"
+              for labels, _, _, updated, _ in snapshots if updated is not None]
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path, registries):
+    """Write the exposition through a temp file and rename, so scrapes never see half a file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(registries))
+    os.replace(tmp, path)
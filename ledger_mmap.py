@@ -0,0 +1,70 @@
+"""Memory-mapped ingestion of large ledger log files.
+
+The log is never read into a Python string: record boundaries are found by scanning
+the mapped bytes in place and only each record's own byte range is decoded. Mapped
+pages are backed by the file, so the OS can drop them again under memory pressure.
+"""
+import json
+import mmap
+from contextlib import contextmanager
+
+from ledger_core import iter_record_spans, next_record_line
+
+EMPTY = b""
+
+
+@contextmanager
+def map_log(path):
+    """Memory-map a log file read-only; yields b"" for an empty file."""
+    with open(path, "rb") as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # zero-length files cannot be mapped
+            yield EMPTY
+            return
+        try:
+            if hasattr(mm, "madvise"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield mm
+        finally:
+            mm.close()
+
+
+def decode_span(buf, start, end, loads=json.loads):
+    """Parse the JSON record in buf[start:end], or return None if it is malformed.
+    Undecodable bytes are replaced, as when the log is streamed in text mode.
+    """
+    try:
+        return loads(buf[start:end].decode("utf-8", errors="replace"))
+    except json.JSONDecodeError:
+        return None
+
+
+def iter_buffer_records(buf, start=0, end=None, loads=json.loads):
+    """Yield every JSON object whose block starts in buf[start:end]."""
+    end = len(buf) if end is None else end
+    for span_start, span_end in iter_record_spans(buf, start):
+        if span_start >= end:
+            return
+        data_all = decode_span(buf, span_start, span_end, loads)
+        if data_all is not None:
+            yield data_all
+
+
+def iter_mmap_records(path, loads=json.loads):
+    """Yield every JSON object in a log file, scanning it through a memory map."""
+    with map_log(path) as mm:
+        yield from iter_buffer_records(mm, loads=loads)
+
+
+def iter_range_boundaries(buf, range_bytes):
+    """Split buf into (start, end) byte ranges of roughly range_bytes each, without scanning
+    it for records. Every range starts on a line no record continues onto, so a range's
+    records are those iter_buffer_records finds from its start, exactly as in one scan.
+    """
+    size = len(buf)
+    start = 0
+    while start < size:
+        end = next_record_line(buf, start + range_bytes)
+        yield start, end
+        start = end
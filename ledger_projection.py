@@ -0,0 +1,233 @@
+"""Projection parsing: decode only the parts of a ledger record the validator reads.
+
+A projection is a tree built from paths such as data.objects[*].objectMetadata.
+parse_projected walks the record text once. Values on a projected path are decoded
+with the C JSON scanner; large values off every path (objectContent bodies in
+particular) are jumped over with a regex and never turned into Python objects. Small
+containers are decoded whole, since that is cheaper than walking them. The result
+has the same shape as json.loads output, so the rest of the pipeline works on it
+unchanged; it just lacks the bulky branches nothing reads.
+"""
+import json
+import re
+from functools import partial
+from json.decoder import scanstring
+
+from ledger_core import DEFAULT_RULES, RULE_SOURCES
+from ledger_jsonview import WILDCARD, parse_json_path
+
+TAKE = True  # leaf marker: decode the whole value at this path
+
+# Paths every validation result reads, whatever the rules are.
+BASE_PATHS = (
+    "key.jobId",
+    'metadata["bbds.context.publishTime"]',
+    "data.objects[*].objectMetadata.isBorgTest",
+    "data.objects[*].objectMetadata.tickerValue",
+    "data.objects[*].objectMetadata.wireId",
+    "data.objects[*].objectMetadata.class",
+    "data.jobProperties.jobName",
+    "data.jobMetadata.ecoticker",  # expectations table lookup
+)
+
+# Where each rule source lives inside a ledger record.
+SOURCE_PATHS = {
+    "objectMetadata": "data.objects[*].objectMetadata",
+    "contentMetadata": "data.objects[*].objectContent[0].contentMetadata",
+    "jobProperties": "data.jobProperties",
+    "jobMetadata": "data.jobMetadata",
+}
+
+# Containers shorter than this are decoded whole by the C scanner: walking them key by
+# key in Python costs more than decoding what they hold.
+DECODE_INLINE_CHARS = 4096
+SKIP_NESTING = 8  # container depth one skip match covers; deeper content steps bracket by bracket
+
+try:
+    re.compile("a*+")
+    _ONCE = "+"  # possessive repeats (Python 3.11+): no backtracking state on long bodies
+except re.error:
+    _ONCE = ""
+
+_WS_RE = re.compile(r"[ \t\n\r]*")
+# Skipped strings and scalars are checked as json.loads checks them. Inside a skipped
+# container only the characters between strings are; the order of its tokens is not.
+_STRING = rf'"[^"\\\x00-\x1f]*{_ONCE}(?:\\(?:["\\/bfnrt]|u[0-9a-fA-F]{{4}})[^"\\\x00-\x1f]*{_ONCE})*{_ONCE}"'
+_SCALAR = (rf"-?(?:0|[1-9]\d*{_ONCE})(?:\.\d+{_ONCE})?(?:[eE][-+]?\d+{_ONCE})?"
+           r"|true|false|null|NaN|-?Infinity")
+_PLAIN = rf"[-+.0-9aefilnrstuyEIN \t\n\r,:]*{_ONCE}"  # the characters of scalars and separators
+_STRING_RE = re.compile(_STRING)
+_SCALAR_RE = re.compile(_SCALAR)
+# Everything up to the next bracket, with strings consumed whole; group 1 is the bracket.
+_BRACKET_RE = re.compile(rf'{_PLAIN}(?:{_STRING}{_PLAIN})*{_ONCE}([\[\]{{}}]?)')
+
+
+def _container_pattern(depth):
+    """Regex matching a whole container nested up to depth levels, strings included.
+    Brackets are not paired by kind: skipped content is only delimited, not checked.
+    """
+    inner = f"{_PLAIN}(?:{_STRING}{_PLAIN})*{_ONCE}"
+    for _ in range(depth - 1):
+        inner = rf"{_PLAIN}(?:(?:{_STRING}|[\[{{]{inner}[\]}}]){_PLAIN})*{_ONCE}"
+    return re.compile(rf"[\[{{]{inner}[\]}}]")
+
+
+_CONTAINER_RE = _container_pattern(SKIP_NESTING)
+
+_decoder = json.JSONDecoder()
+
+
+def build_projection(paths):
+    """Merge dotted paths into a projection tree of nested dicts ending in TAKE."""
+    tree = {}
+    for path in paths:
+        parts = parse_json_path(path)
+        node = tree
+        for part in parts[:-1]:
+            child = node.get(part)
+            if child is TAKE:
+                break  # an ancestor is already taken whole
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = TAKE
+    return tree
+
+
+def projection_for_rules(rules=None):
+    """Projection covering BASE_PATHS plus every field a compiled rule set reads."""
+    paths = list(BASE_PATHS)
+    for rule in DEFAULT_RULES if rules is None else rules:
+        for path in [rule.path] + [when_path for when_path, _, _ in rule.when]:
+            root, _, rest = path.partition(".")
+            if root in RULE_SOURCES:
+                # Keys are plain dotted names in rule paths; quote each for the path parser.
+                paths.append(SOURCE_PATHS[root] + "".join(f'["{key}"]' for key in rest.split(".")))
+    return build_projection(paths)
+
+
+def _error(msg, s, idx):
+    return json.JSONDecodeError(msg, s, min(idx, len(s)))
+
+
+def _container_end(s, idx):
+    """Index just past the container opening at idx, or -1 if it never closes."""
+    m = _CONTAINER_RE.match(s, idx)
+    if m:
+        return m.end()
+    depth = 0  # nested deeper than SKIP_NESTING: step from bracket to bracket
+    pos = idx
+    while True:
+        m = _BRACKET_RE.match(s, pos)
+        bracket = m.group(1)
+        if not bracket:
+            return -1
+        pos = m.end()
+        if bracket == "{" or bracket == "[":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
+
+
+def _skip_value(s, idx):
+    """Return the index just past the JSON value starting at idx, without decoding it."""
+    c = s[idx:idx + 1]
+    if c == '"':
+        m = _STRING_RE.match(s, idx)
+        end = m.end() if m else -1
+    elif c == "{" or c == "[":
+        end = _container_end(s, idx)
+    else:
+        m = _SCALAR_RE.match(s, idx)
+        end = m.end() if m else -1
+    if end == -1:
+        _decoder.raw_decode(s, idx)  # raises json.loads' own error for the value
+        raise _error("Malformed value", s, idx)
+    return end
+
+
+def _parse_value(s, idx, spec):
+    """Decode the value at idx under a projection spec; returns (value, end)."""
+    if spec is TAKE:
+        return _decoder.raw_decode(s, idx)
+    c = s[idx:idx + 1]
+    if c == "{" or c == "[":
+        limit = idx + DECODE_INLINE_CHARS
+        if limit >= len(s) or _CONTAINER_RE.match(s, idx, limit):
+            return _decoder.raw_decode(s, idx)  # small: decoding beats walking
+        if c == "{":
+            return _parse_object(s, idx, spec)
+        return _parse_array(s, idx, spec)
+    return _decoder.raw_decode(s, idx)  # a scalar where a container was projected
+
+
+def _parse_object(s, idx, spec):
+    result = {}
+    idx = _WS_RE.match(s, idx + 1).end()
+    if s[idx:idx + 1] == "}":
+        return result, idx + 1
+    while True:
+        if s[idx:idx + 1] != '"':
+            raise _error("Expecting property name enclosed in double quotes", s, idx)
+        key, idx = scanstring(s, idx + 1)
+        idx = _WS_RE.match(s, idx).end()
+        if s[idx:idx + 1] != ":":
+            raise _error("Expecting ':' delimiter", s, idx)
+        idx = _WS_RE.match(s, idx + 1).end()
+        sub = spec.get(key)
+        if sub is None:
+            idx = _skip_value(s, idx)
+        else:
+            result[key], idx = _parse_value(s, idx, sub)
+        idx = _WS_RE.match(s, idx).end()
+        c = s[idx:idx + 1]
+        if c == "}":
+            return result, idx + 1
+        if c != ",":
+            raise _error("Expecting ',' delimiter", s, idx)
+        idx = _WS_RE.match(s, idx + 1).end()
+
+
+def _parse_array(s, idx, spec):
+    every = spec.get(WILDCARD)
+    result = []
+    idx = _WS_RE.match(s, idx + 1).end()
+    if s[idx:idx + 1] == "]":
+        return result, idx + 1
+    n = 0
+    while True:
+        sub = every if every is not None else spec.get(n)
+        if sub is None:
+            idx = _skip_value(s, idx)
+        else:
+            value, idx = _parse_value(s, idx, sub)
+            result.extend([None] * (n - len(result)))  # skipped items keep their slots as None
+            result.append(value)
+        n += 1
+        idx = _WS_RE.match(s, idx).end()
+        c = s[idx:idx + 1]
+        if c == "]":
+            return result, idx + 1
+        if c != ",":
+            raise _error("Expecting ',' delimiter", s, idx)
+        idx = _WS_RE.match(s, idx + 1).end()
+
+
+def parse_projected(s, projection):
+    """Parse a JSON record, dropping large branches that are not on a projected path.
+    Raises json.JSONDecodeError on malformed input, like json.loads, with one exception:
+    inside a skipped container the tokens are not parsed, so a misspelled literal, a
+    missing or extra comma or colon, or a ] closing a {, goes unnoticed there.
+    """
+    idx = _WS_RE.match(s, 0).end()
+    value, end = _parse_value(s, idx, projection)
+    end = _WS_RE.match(s, end).end()
+    if end != len(s):
+        raise _error("Extra data", s, end)
+    return value
+
+
+def projected_loads(rules=None):
+    """A json.loads replacement that keeps only what validating with rules reads."""
+    return partial(parse_projected, projection=projection_for_rules(rules))
@@ -0,0 +1,124 @@
+"""Pre-escaped HTML builders for the verification views.
+
+Each builder returns one HTML string, so a whole object (verification table plus job
+details) can be sent to the browser as a single element instead of dozens of
+columns and markdown deltas. All values go through safe(); nothing here imports
+Streamlit.
+"""
+from ledger_core import is_safe_url, safe
+
+STATUS_ICONS = {
+    "pass": "&#9989;",
+    "fail": "&#10060;",
+    "warn": "&#129514;",
+    "review": "&#128064;",
+}
+
+# Special overrides for binary field display
+BINARY_STATUS_TEXT = {
+    "TEST": "&#129514; TEST",
+    "PROD": "&#128640; PROD",
+}
+
+
+def display_status(r_type, status_text, category):
+    """Return the status cell text with its icon."""
+    if r_type == "binary" and status_text in BINARY_STATUS_TEXT:
+        return BINARY_STATUS_TEXT[status_text]
+    return f"{STATUS_ICONS.get(category, '')} {status_text}"
+
+
+def verification_table_html(rows_with_status, has_targets):
+    """Build the whole verification table as one HTML string."""
+    table_class = "verify-table" if has_targets else "verify-table verify-no-targets"
+    parts = [
+        f'<div class="{table_class}"><div class="verify-row verify-head">'
+        '<span>Field</span><span>Actual</span>'
+        + ('<span>Target</span>' if has_targets else '')
+        + '<span class="verify-status">Status</span></div>'
+    ]
+    for label, act, goal, r_type, status_text, bg, category in rows_with_status:
+        target_cell = ""
+        if has_targets:
+            target_display = safe(goal) if r_type == "target" and goal else "-"
+            target_cell = f'<span class="verify-target">{target_display}</span>'
+        parts.append(
+            f'<div class="verify-row" style="background:{bg};">'
+            f'<span class="verify-label">{safe(label)}</span>'
+            f'<span class="verify-actual">{safe(act)}</span>{target_cell}'
+            f'<span class="verify-status">{display_status(r_type, status_text, category)}</span></div>'
+        )
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def _copyable_item(label, value, err=""):
+    """A detail row whose value is a click-to-select code span."""
+    shown = safe(value) if value else "None"
+    return (
+        f"<div class='detail-item'><span class='detail-label'>{safe(label)}:{err}</span>"
+        f"<code class='copy-value'>{shown}</code></div>"
+    )
+
+
+def _mismatch(actual, expected):
+    """Inline mismatch marker when an expectation is set and differs."""
+    if expected and str(actual) != str(expected):
+        return f" &#10060; Expected: {safe(expected)}"
+    return ""
+
+
+def job_details_html(meta, content, job_props, job_meta, data_all, expectations, job_url_template):
+    """Build the job details panel as one HTML string.
+    job_url_template is a URL with a {job_id} placeholder for the Humio log link.
+    """
+    e_agent, e_jobname, e_ecoticker = expectations
+    w_id, c_id = meta.get("wireId"), meta.get("class")
+    cqa = ' <span class="cqa-tag">[CQA]</span>' if (w_id == "778" and c_id == "1") else ""
+
+    parsed_job_id = (data_all.get('key') or {}).get('jobId')
+    agent_id = job_props.get('agentId')
+    eco_ticker = job_meta.get('ecoticker')
+    job_name = job_props.get('jobName')
+
+    job_name_err = ""
+    if e_jobname and str(job_name) != str(e_jobname):
+        job_name_err = f" <span style='color:#ff3b30;'>&#10060; (Exp: {safe(e_jobname)})</span>"
+
+    source_url = content.get('sourceUrl')
+    if source_url and is_safe_url(source_url):
+        source_display = f"<a href='{safe(source_url)}' target='_blank'>{safe(source_url)}</a>"
+    else:
+        source_display = safe(source_url) if source_url else "None"
+
+    parts = [
+        "<div class='job-details'><h3>Job Details</h3>",
+        _copyable_item("Agent ID", agent_id, _mismatch(agent_id, e_agent)),
+        _copyable_item("Job ID", parsed_job_id),
+        f"<div class='detail-item'><span class='detail-label'>Job Name:</span>"
+        f"<span class='detail-value'>{safe(job_name)}</span>{job_name_err}</div>",
+        _copyable_item("Eco Ticker", eco_ticker, _mismatch(eco_ticker, e_ecoticker)),
+        f"<div class='detail-item'><span class='detail-label'>Wire / Class:</span>"
+        f"<span class='detail-value'>{safe(w_id)} / {safe(c_id)}</span>{cqa}</div>",
+        f"<div class='detail-item'><span class='detail-label'>Source URL:</span>"
+        f"<div class='detail-value' style='font-size:0.85em;'>{source_display}</div></div>",
+    ]
+    if parsed_job_id:
+        humio_job_url = job_url_template.format(job_id=safe(parsed_job_id))
+        parts.append(
+            f'<a href="{humio_job_url}" target="_blank" class="humio-link">'
+            f'&#128279; Job ID - Humio Log</a>'
+        )
+    parts.append("</div>")
+    return "".join(parts)
+
+
+def object_panel_html(rows_with_status, has_targets, details_html):
+    """Lay out the verification table and job details side by side in one element."""
+    return (
+        '<div class="object-panel">'
+        f'<div class="object-panel-main"><h3>Verification</h3>'
+        f'{verification_table_html(rows_with_status, has_targets)}</div>'
+        f'<div class="object-panel-side">{details_html}</div>'
+        '</div>'
+    )
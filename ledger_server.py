@@ -0,0 +1,448 @@
+"""Local HTTP validation service for automated callers, without Streamlit.
+
+POST /validate takes one ledger record: the record itself, a raw log line, or an
+envelope {"record": {...} | "log": "...", "targets": {...}}. It answers with the record's
+verification rows (the same extraction and build_verification_rows the app shows) and
+an overall pass/fail. POST /validate/batch takes NDJSON (or any log text) and streams
+back one NDJSON result per object, then a summary line. An optional first line
+{"targets": {...}} sets the batch's targets. GET /stats reports latency and
+throughput as JSON, GET /metrics in Prometheus text format, GET /health liveness.
+
+Connections are served by a fixed pool of worker threads behind a bounded queue; when
+both are full, a new connection gets 503 at once instead of piling up. A kept-alive
+connection is closed after its current response while others are queued, so idle
+clients cannot hold every worker. Request bodies must declare a Content-Length within
+the configured limits. Batches are read and answered record by record, so a large
+batch never sits in memory.
+"""
+import html
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import urlsplit
+
+from ledger_batch import validate_records
+from ledger_core import (
+    CATEGORIES,
+    DRIFT_THRESHOLD_SECONDS,
+    TARGET_NAMES,
+    ParseTally,
+    RecordShapeError,
+    build_verification_rows,
+    env_label,
+    extract_json,
+    extract_payload,
+    iter_stream_spans,
+    parse_iso_epoch,
+)
+from ledger_metrics import Metrics, prometheus_text
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+DEFAULT_WORKERS = 8
+QUEUE_PER_WORKER = 4  # accepted connections waiting for a worker before new ones get 503
+MAX_BODY_BYTES = 4 << 20  # one record for /validate
+MAX_BATCH_BYTES = 256 << 20  # one NDJSON batch for /validate/batch
+READ_CHUNK = 64 << 10
+WRITE_CHUNK = 16 << 10  # streamed NDJSON is sent in chunks of about this size
+KEEPALIVE_SECONDS = 5  # idle time before a kept-alive connection gives its worker back
+RATE_WINDOW = 60  # seconds of completed requests behind the recent throughput figure
+ENDPOINTS = {"/validate": "single", "/validate/batch": "batch"}  # path -> latency stage
+
+
+class RequestError(ValueError):
+    """A request the service rejects; carries the HTTP status to answer with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_targets(value):
+    """A {"ticker", "scaling", "period"} mapping as a targets tuple (missing names are "")."""
+    if value is None:
+        return ("", "", "")
+    if not isinstance(value, dict):
+        raise RequestError(400, '"targets" must be an object')
+    unknown = set(value) - set(TARGET_NAMES)
+    if unknown:
+        raise RequestError(400, f"Unknown targets {', '.join(sorted(unknown))} "
+                                f"(expected {', '.join(TARGET_NAMES)})")
+    return tuple("" if value.get(name) is None else str(value[name]) for name in TARGET_NAMES)
+
+
+def verify_record(data_all, targets, rules=None, target_table=None, now=None):
+    """Extraction plus build_verification_rows for one parsed ledger record, as a
+    JSON-ready dict: job identity, publish drift, per-object counts, failing labels and
+    every checked row, and "passed" (no failing check on any object).
+    """
+    payload = extract_payload(data_all)
+    job_props, job_meta = payload["job_props"], payload["job_meta"]
+    totals = dict.fromkeys(CATEGORIES, 0)
+    objects = []
+    for i, (meta, content) in enumerate(payload["objects"]):
+        rows, counts = build_verification_rows(meta, targets, rules, content, job_props, job_meta, target_table)
+        for name in CATEGORIES:
+            totals[name] += counts[name]
+        objects.append({
+            "object": i,
+            "tickerValue": meta.get("tickerValue"),
+            "env": env_label(meta.get("isBorgTest")),
+            **counts,
+            "failing": [row[0] for row in rows if row[6] == "fail"],
+            "checks": [
+                {"label": label, "actual": actual, "expected": goal, "type": r_type,
+                 "status": html.unescape(status), "category": category}
+                for label, actual, goal, r_type, status, _, category in rows
+            ],
+        })
+    epoch = parse_iso_epoch(payload["pub_time_str"])
+    drift = None if epoch is None else (time.time() if now is None else now) - epoch
+    return {
+        "jobId": payload["job_id"],
+        "jobName": job_props.get("jobName"),
+        "publishTime": payload["pub_time_str"],
+        "drift_s": drift,
+        "stale": drift is not None and drift > DRIFT_THRESHOLD_SECONDS,
+        "passed": totals["fail"] == 0,
+        **totals,
+        "objects": objects,
+    }
+
+
+class _Throughput:
+    """Completed requests per second over the last RATE_WINDOW seconds, in one-second buckets."""
+
+    def __init__(self, window=RATE_WINDOW):
+        self.window = window
+        self._counts = [0] * window
+        self._seconds = [0] * window
+        self._lock = threading.Lock()
+
+    def add(self):
+        now = int(time.time())
+        slot = now % self.window
+        with self._lock:
+            if self._seconds[slot] != now:
+                self._seconds[slot], self._counts[slot] = now, 0
+            self._counts[slot] += 1
+
+    def rate(self):
+        now = int(time.time())
+        with self._lock:
+            # The current second is still filling, so average over the full seconds before it.
+            done = sum(n for second, n in zip(self._seconds, self._counts) if now - self.window < second < now)
+        return done / (self.window - 1)
+
+
+class _Body:
+    """File-like view of a request body that stops at its Content-Length."""
+
+    def __init__(self, rfile, length):
+        self._rfile = rfile
+        self.remaining = length
+
+    def read(self, size=READ_CHUNK):
+        if self.remaining <= 0:
+            return b""
+        data = self._rfile.read(min(size, self.remaining))
+        self.remaining -= len(data)
+        if not data:
+            self.remaining = 0
+        return data
+
+
+class ValidationHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "BorgLedgerValidator/1.0"
+    timeout = KEEPALIVE_SECONDS
+    disable_nagle_algorithm = True  # headers and body are separate writes; don't hold the second back
+
+    def log_message(self, format, *args):
+        if self.server.access_log:
+            super().log_message(format, *args)
+
+    # --- responses ---
+
+    def end_headers(self):
+        if self.server.waiting:  # hand this worker to a queued connection after this response
+            self.send_header("Connection", "close")
+        super().end_headers()
+
+    def _send_json(self, status, body):
+        data = json.dumps(body, separators=(",", ":")).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_text(self, status, text, content_type="text/plain; charset=utf-8"):
+        data = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, error):
+        self._send_json(error.status, {"error": str(error)})
+
+    def _write_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+
+    # --- requests ---
+
+    def _body(self, limit):
+        if "chunked" in self.headers.get("Transfer-Encoding", "").lower():
+            raise RequestError(411, "Send the body with a Content-Length")
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            raise RequestError(411, "Content-Length required") from None
+        if length < 0:
+            raise RequestError(400, "Invalid Content-Length")
+        if length > limit:
+            raise RequestError(413, f"Body of {length} bytes exceeds the {limit}-byte limit")
+        return _Body(self.rfile, length)
+
+    def _discard(self, body):
+        """Drain an unread body so the connection can be reused; close it if that is too much."""
+        if body.remaining > READ_CHUNK:
+            self.close_connection = True
+            return
+        while body.read():
+            pass
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif path == "/stats":
+            self._send_json(200, self.server.stats())
+        elif path == "/metrics":
+            self._send_text(200, prometheus_text([self.server.metrics]), "text/plain; version=0.0.4")
+        else:
+            self._send_json(404, {"error": f"No such endpoint: {path}"})
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        stage = ENDPOINTS.get(path)
+        if stage is None:
+            self.close_connection = True
+            self._send_json(404, {"error": f"No such endpoint: {path}"})
+            return
+        t0 = time.perf_counter()
+        body = None
+        try:
+            if stage == "batch":
+                body = self._body(self.server.max_batch_bytes)
+                self._validate_batch(body)
+            else:
+                body = self._body(self.server.max_body_bytes)
+                self._validate_one(body)
+        except RequestError as e:
+            if body is not None:
+                self._discard(body)
+            else:
+                self.close_connection = True
+            self._send_error(e)
+        finally:
+            self.server.finished(stage, time.perf_counter() - t0)
+
+    def _validate_one(self, body):
+        server = self.server
+        raw = body.read(body.remaining)
+        text = raw.decode("utf-8", errors="replace")
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            data = None  # not JSON as a whole: a raw log line with a prefix, perhaps
+        targets = server.targets
+        if isinstance(data, dict) and ("record" in data or "log" in data):
+            targets = parse_targets(data["targets"]) if "targets" in data else targets
+            data = data.get("record") if "record" in data else data["log"]
+        if isinstance(data, str):
+            try:
+                data = extract_json(data)
+            except json.JSONDecodeError as e:
+                raise RequestError(400, f"Invalid JSON in log text: {e}") from None
+        elif data is None:
+            try:
+                data = extract_json(text)
+            except json.JSONDecodeError as e:
+                raise RequestError(400, f"Invalid JSON: {e}") from None
+        if not isinstance(data, dict):
+            raise RequestError(400, "No ledger record in the request body")
+        t0 = time.perf_counter()
+        try:
+            result = verify_record(data, targets, server.rules, server.target_table)
+        except RecordShapeError as e:
+            raise RequestError(400, f"Not a ledger record: {e}") from None
+        server.metrics.observe("validate", time.perf_counter() - t0, records=1, bytes=len(raw),
+                               objects=len(result["objects"]),
+                               failed=sum(1 for obj in result["objects"] if obj["fail"]))
+        self._send_json(200, result)
+
+    def _iter_batch_records(self, body, summary):
+        """Parsed records of a batch body. A leading {"targets": {...}} line sets the targets;
+        one anywhere else is not a record, and is skipped and counted as malformed.
+        """
+        first = True
+        for block in iter_stream_spans(body, READ_CHUNK):
+            summary["bytes"] += len(block)
+            try:
+                data_all = json.loads(block.decode("utf-8", errors="replace"))
+            except json.JSONDecodeError:
+                summary["malformed"] += 1
+                continue
+            if isinstance(data_all, dict) and set(data_all) == {"targets"}:
+                if first:
+                    summary["targets"] = parse_targets(data_all["targets"])
+                else:
+                    summary["malformed"] += 1
+                first = False
+                continue
+            first = False
+            if isinstance(data_all, dict):
+                summary["records"] += 1
+                yield data_all
+
+    def _validate_batch(self, body):
+        server = self.server
+        summary = {"records": 0, "objects": 0, "failed": 0, "malformed": 0, "bytes": 0,
+                   "targets": server.targets}
+        records = self._iter_batch_records(body, summary)
+        # Read up to the first record before answering, so a bad targets line is still a 400.
+        pending = next(records, None)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def stream():
+            if pending is not None:
+                yield pending
+                yield from records
+
+        tally = ParseTally()  # records validate_records skips as not shaped like a ledger record
+        out = []
+        size = 0
+        for result in validate_records(stream(), summary["targets"], server.rules,
+                                       target_table=server.target_table, tally=tally):
+            line = json.dumps(result.as_dict(), separators=(",", ":")).encode("utf-8") + b"\n"
+            out.append(line)
+            size += len(line)
+            summary["objects"] += 1
+            if result["fail"]:
+                summary["failed"] += 1
+            if size >= WRITE_CHUNK:
+                self._write_chunk(b"".join(out))
+                out, size = [], 0
+        summary["records"] -= tally.invalid
+        summary["malformed"] += tally.invalid
+        for name in ("records", "bytes", "objects", "failed"):
+            if summary[name]:
+                server.metrics.inc(name, summary[name])
+        summary["targets"] = dict(zip(TARGET_NAMES, summary["targets"]))
+        summary["passed"] = summary["failed"] == 0
+        out.append(json.dumps({"summary": summary}, separators=(",", ":")).encode("utf-8") + b"\n")
+        self._write_chunk(b"".join(out))
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class ValidationServer(HTTPServer):
+    """HTTP server that hands each connection to a fixed pool of worker threads.
+    At most workers + queue_size connections are accepted at once; further ones are
+    answered 503 straight away. Targets, rules and the target table apply to every
+    request that does not bring its own targets.
+    """
+
+    request_queue_size = 128  # listen backlog
+
+    def __init__(self, address=(DEFAULT_HOST, DEFAULT_PORT), workers=DEFAULT_WORKERS, queue_size=None,
+                 targets=("", "", ""), rules=None, target_table=None, max_body_bytes=MAX_BODY_BYTES,
+                 max_batch_bytes=MAX_BATCH_BYTES, metrics=None, access_log=False):
+        super().__init__(address, ValidationHandler)
+        self.workers = workers
+        self.queue_size = workers * QUEUE_PER_WORKER if queue_size is None else queue_size
+        self.targets = targets
+        self.rules = rules
+        self.target_table = target_table
+        self.max_body_bytes = max_body_bytes
+        self.max_batch_bytes = max_batch_bytes
+        self.metrics = metrics or Metrics({"mode": "http"})
+        self.access_log = access_log
+        self.rejected = 0
+        self.in_flight = 0
+        self.waiting = 0  # accepted connections not yet picked up by a worker
+        self._throughput = _Throughput()
+        self._slots = threading.BoundedSemaphore(workers + self.queue_size)
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ledger-http")
+        self._lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            self.metrics.inc("rejected")
+            try:
+                request.sendall(b"HTTP/1.1 503 Service Unavailable\r\nRetry-After: 1\r\n"
+                                b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+            except OSError:
+                pass
+            self.shutdown_request(request)
+            return
+        with self._lock:
+            self.waiting += 1
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        with self._lock:
+            self.waiting -= 1
+            self.in_flight += 1
+        try:
+            self.finish_request(request, client_address)
+        except (socket.timeout, ConnectionError):
+            pass
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self._lock:
+                self.in_flight -= 1
+            self._slots.release()
+
+    def finished(self, endpoint, seconds):
+        """Record one completed POST request."""
+        self.metrics.observe(endpoint, seconds)
+        self._throughput.add()
+
+    def stats(self):
+        """Latency per endpoint, throughput and pool occupancy as a plain dict."""
+        snap = self.metrics.snapshot()
+        endpoints = {name: snap["stages"][name] for name in ENDPOINTS.values() if name in snap["stages"]}
+        requests = sum(stage["count"] for stage in endpoints.values())
+        with self._lock:
+            in_flight, rejected = self.in_flight, self.rejected
+        return {
+            "uptime_s": snap["elapsed_s"],
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "connections": in_flight,
+            "queued": self.waiting,
+            "requests": requests,
+            "rejected": rejected,
+            "requests_per_s": requests / snap["elapsed_s"] if snap["elapsed_s"] else 0.0,
+            "recent_requests_per_s": self._throughput.rate(),
+            "endpoints": endpoints,
+            "counters": snap["counters"],
+        }
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
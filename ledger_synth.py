@@ -0,0 +1,142 @@
+"""Deterministic synthetic bbds_ledger.py logs for benchmarks and load tests.
+
+Records follow the shape the validator reads (key, metadata, jobProperties,
+jobMetadata, objects with objectMetadata and objectContent). Each one is written on a
+log line with a timestamp/logger prefix, optionally among plain noise lines, and a
+configurable share of records is malformed (invalid JSON, or cut off mid-record). The
+same seed always gives the same bytes.
+
+Usage:
+    python ledger_synth.py out.log --records 10000 --objects 4 --content-bytes 2048
+"""
+import argparse
+import json
+import random
+import string
+import sys
+from datetime import datetime, timedelta, timezone
+
+TICKERS = ("CPI YOY Index", "CPI MOM Index", "NFP TCH Index", "USURTOT Index", "GDP CQOQ Index",
+           "IP CHNG Index", "RSTAMOM Index", "PCE CYOY Index", "INJCJC Index", "USTBTOT Index")
+NOISE_LINES = (
+    "INFO bbds_ledger.py:88 - heartbeat ok",
+    "DEBUG bbds_ledger.py:142 - refreshing routing table",
+    "WARNING bbds_ledger.py:97 - slow ack from publisher (1203 ms)",
+    "INFO bbds_ledger.py:61 - connected to ledger service",
+)
+# Ways a record is broken. unbalanced_brace cuts the record off part way, as a crashed
+# writer would, leaving braces (and maybe a string) open at the end of its line.
+MALFORMED_KINDS = ("bad_token", "trailing_comma", "bare_word", "unbalanced_brace")
+START_TIME = datetime(2024, 3, 12, 12, 30, tzinfo=timezone.utc)
+
+
+def make_record(rng, index, objects=1, content_bytes=256, publish_time=None):
+    """One synthetic ledger record as a dict."""
+    job_id = f"{rng.randrange(16 ** 12):012x}-{index:08d}"
+    is_test = rng.random() < 0.2
+    publish_time = publish_time or START_TIME + timedelta(milliseconds=index * 250)
+    return {
+        "key": {"jobId": job_id},
+        "metadata": {"bbds.context.publishTime": publish_time.strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"},
+        "data": {
+            "jobProperties": {
+                "jobName": f"ECO_RELEASE_{index % 97:03d}",
+                "agentId": str(10000 + index % 50),
+            },
+            "jobMetadata": {"ecoticker": f"ECO{index % 500:04d}"},
+            "objects": [_make_object(rng, is_test, content_bytes) for _ in range(objects)],
+        },
+    }
+
+
+def _make_object(rng, is_test, content_bytes):
+    wire_cqa = rng.random() < 0.5
+    body = "".join(rng.choices(string.ascii_letters + string.digits + " ", k=content_bytes))
+    return {
+        "objectMetadata": {
+            "isBorgTest": "YES" if is_test else "NO",
+            "sendToBorg": "YES" if rng.random() < 0.97 else "NO",
+            "releaseDate": "NO RELEASE DATE",
+            "scalingFactor": rng.choice(("0", "1", "3", "6")),
+            "tickerValue": rng.choice(TICKERS),
+            "observationPeriod": f"2024-{rng.randint(1, 12):02d}",
+            "wireId": "778" if wire_cqa else str(rng.randint(100, 999)),
+            "class": "1" if wire_cqa else str(rng.randint(2, 9)),
+        },
+        "objectContent": [{
+            "contentMetadata": {"sourceUrl": f"https://example.com/release/{rng.randrange(10 ** 6)}"},
+            "body": body,
+        }],
+    }
+
+
+def _malform(rng, text):
+    kind = rng.choice(MALFORMED_KINDS)
+    if kind == "bad_token":
+        cut = text.index(",", rng.randrange(1, len(text) // 2))
+        return text[:cut] + "@@" + text[cut:]
+    if kind == "trailing_comma":
+        return text[:-1] + ",}"
+    if kind == "unbalanced_brace":
+        return text[:rng.randrange(len(text) // 4, len(text) // 2)]
+    return text.replace('"isBorgTest":"', '"isBorgTest":', 1).replace('","sendToBorg"', ',"sendToBorg"', 1)
+
+
+def log_prefix(index, publish_time):
+    stamp = publish_time.strftime("%Y-%m-%d %H:%M:%S,") + f"{publish_time.microsecond // 1000:03d}"
+    return f"{stamp} INFO bbds_ledger.py:212 [pid {4000 + index % 8}] - publishing ledger record: "
+
+
+def iter_log_lines(records=1000, objects=1, content_bytes=256, noise_rate=0.0, malformed_rate=0.0,
+                   seed=0):
+    """Yield the lines (without newlines) of a synthetic log.
+    noise_rate is the expected number of noise lines per record; malformed_rate is the share
+    of records that are broken in one of MALFORMED_KINDS.
+    """
+    rng = random.Random(seed)
+    for index in range(records):
+        while rng.random() < noise_rate / (1 + noise_rate):
+            yield rng.choice(NOISE_LINES)
+        publish_time = START_TIME + timedelta(milliseconds=index * 250)
+        record = make_record(rng, index, objects, content_bytes, publish_time)
+        text = json.dumps(record, separators=(",", ":"))
+        if malformed_rate and rng.random() < malformed_rate:
+            text = _malform(rng, text)
+        yield log_prefix(index, publish_time) + text
+
+
+def generate_log(path, **options):
+    """Write a synthetic log file; returns the number of bytes written."""
+    size = 0
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for line in iter_log_lines(**options):
+            size += f.write(line + "\n")
+    return size
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic bbds_ledger.py log.")
+    parser.add_argument("out", help="Output file, or '-' for stdout")
+    parser.add_argument("--records", type=int, default=1000, help="Ledger records (default 1000)")
+    parser.add_argument("--objects", type=int, default=1, help="Objects per record (default 1)")
+    parser.add_argument("--content-bytes", type=int, default=256,
+                        help="Characters of objectContent body per object (default 256)")
+    parser.add_argument("--noise", type=float, default=0.0,
+                        help="Average noise log lines per record (default 0)")
+    parser.add_argument("--malformed", type=float, default=0.0,
+                        help="Share of records written malformed, 0..1 (default 0)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default 0)")
+    args = parser.parse_args(argv)
+    options = dict(records=args.records, objects=args.objects, content_bytes=args.content_bytes,
+                   noise_rate=args.noise, malformed_rate=args.malformed, seed=args.seed)
+    if args.out == "-":
+        for line in iter_log_lines(**options):
+            sys.stdout.write(line + "\n")
+    else:
+        size = generate_log(args.out, **options)
+        print(f"Wrote {args.records} records ({size:,} bytes) to {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,113 @@
+"""Per-ticker expectations tables for multi-ticker jobs.
+
+A table maps tickerValue (or ecoticker) to that ticker's scalingFactor,
+observationPeriod, agentId and jobName. It is loaded once from CSV or JSON and
+indexed in plain dicts, so each object finds its own targets with one lookup instead
+of being checked against the single set of global target inputs. Fields a table row
+leaves blank, and objects with no row at all, fall back to the global targets.
+"""
+import csv
+import io
+import json
+from collections import namedtuple
+
+TargetRow = namedtuple("TargetRow", "ticker scaling period agent jobname ecoticker")
+
+# Accepted column names (compared case-insensitively) for each TargetRow field.
+COLUMN_ALIASES = {
+    "ticker": ("tickervalue", "ticker"),
+    "scaling": ("scalingfactor", "scaling"),
+    "period": ("observationperiod", "period"),
+    "agent": ("agentid", "agent"),
+    "jobname": ("jobname",),
+    "ecoticker": ("ecoticker", "eco_ticker"),
+}
+
+
+class TargetTableError(ValueError):
+    """Raised when an expectations table cannot be loaded."""
+
+
+def _row_from_mapping(mapping):
+    lowered = {str(k).strip().lower(): v for k, v in mapping.items()}
+    values = []
+    for field in TargetRow._fields:
+        value = next((lowered[a] for a in COLUMN_ALIASES[field] if a in lowered), None)
+        values.append("" if value is None else str(value).strip())
+    return TargetRow(*values)
+
+
+class TargetTable:
+    """Expectations indexed by tickerValue and by ecoticker."""
+
+    def __init__(self, rows):
+        self.by_ticker = {}
+        self.by_ecoticker = {}
+        for row in rows:
+            if not (row.ticker or row.ecoticker):
+                raise TargetTableError(f"Expectations row has neither tickerValue nor ecoticker: {row}")
+            if row.ticker:
+                self.by_ticker[row.ticker] = row
+            if row.ecoticker:
+                self.by_ecoticker[row.ecoticker] = row
+
+    def __len__(self):
+        return len(set(self.by_ticker.values()) | set(self.by_ecoticker.values()))
+
+    def lookup(self, meta, job_meta=None):
+        """The row for one object: by its tickerValue, else by the job's ecoticker.
+        Table keys are strings, so a value of any other type (a list, say) matches nothing.
+        """
+        ticker = meta.get("tickerValue")
+        row = self.by_ticker.get(ticker) if isinstance(ticker, str) else None
+        if row is None and job_meta:
+            ecoticker = job_meta.get("ecoticker")
+            row = self.by_ecoticker.get(ecoticker) if isinstance(ecoticker, str) else None
+        return row
+
+    def targets_for(self, meta, job_meta=None, default=("", "", "")):
+        """(ticker, scaling, period) targets for one object, blanks filled from default."""
+        row = self.lookup(meta, job_meta)
+        if row is None:
+            return default
+        return (row.ticker or default[0], row.scaling or default[1], row.period or default[2])
+
+    def expectations_for(self, meta, job_meta=None, default=("", "", "")):
+        """(agentId, jobName, ecoticker) expectations for one object, blanks filled from default."""
+        row = self.lookup(meta, job_meta)
+        if row is None:
+            return default
+        return (row.agent or default[0], row.jobname or default[1], row.ecoticker or default[2])
+
+
+def parse_target_table(text, fmt):
+    """Build a TargetTable from CSV text, or from JSON: a list of row objects or an
+    object keyed by tickerValue.
+    """
+    if fmt == "json":
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise TargetTableError(f"Invalid expectations JSON: {e}") from e
+        if isinstance(data, dict):
+            data = [{"tickerValue": key, **value} for key, value in data.items() if isinstance(value, dict)]
+        if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+            raise TargetTableError("Expectations JSON must be a list of objects or an object keyed by ticker")
+        return TargetTable(map(_row_from_mapping, data))
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames:
+            raise TargetTableError("Expectations CSV has no header row")
+        return TargetTable(_row_from_mapping(row) for row in reader)
+    raise TargetTableError(f"Unknown expectations table format '{fmt}'")
+
+
+def table_format(path):
+    """csv or json, from a file name's extension."""
+    return "json" if str(path).lower().endswith(".json") else "csv"
+
+
+def load_target_table(path):
+    """Load and index an expectations table from a .csv or .json file."""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return parse_target_table(f.read(), table_format(path))
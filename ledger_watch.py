@@ -0,0 +1,281 @@
+"""Follow a growing bbds_ledger.py log file and validate records as they are appended.
+
+LogFollower reads only the bytes appended since its last poll, so the file is never
+re-scanned from the start. Its byte offset, together with the file's identity so log
+rotation is noticed, is persisted to a small JSON state file: a restarted watcher
+resumes where it stopped. start() polls from a daemon thread and the Streamlit app only
+reads snapshot(), so the UI never waits on file I/O.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from ledger_core import ParseTally, RecordScanner, RecordShapeError, validate_record
+
+POLL_INTERVAL = 1.0  # seconds between checks for appended bytes
+READ_CHUNK = 1 << 20
+RECENT_JOBS = 50  # job summaries kept for the live view
+STATUS_COUNTS = ("pass", "fail", "warn", "review")
+
+
+def offset_file_for(log_path, state_dir):
+    """State file for a log inside state_dir, named after a hash of the log's absolute path."""
+    digest = hashlib.blake2b(os.path.abspath(log_path).encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(state_dir, f"{os.path.basename(log_path)}.{digest}.offset.json")
+
+
+def load_offset(offset_file):
+    """Return the saved (dev, ino, offset) for a log, or None if there is no usable state."""
+    try:
+        with open(offset_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        return state["dev"], state["ino"], int(state["offset"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_offset(offset_file, dev, ino, offset):
+    """Write the state through a temp file and rename, so it is never half-written."""
+    os.makedirs(os.path.dirname(offset_file) or ".", exist_ok=True)
+    tmp = offset_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"dev": dev, "ino": ino, "offset": offset}, f)
+    os.replace(tmp, offset_file)
+
+
+def summarize_job(results):
+    """Collapse one record's per-object results into a job summary."""
+    first = results[0]
+    return {
+        "jobId": first["jobId"],
+        "jobName": first["jobName"],
+        "env": first["env"],
+        "publishTime": first["publishTime"],
+        "objects": len(results),
+        **{name: sum(r[name] for r in results) for name in STATUS_COUNTS},
+        "failedObjects": [r["object"] for r in results if r["fail"]],
+    }
+
+
+class LogFollower:
+    """Incrementally validate the records appended to one log file.
+    With no saved offset, following starts at the current end of the file, or at its start
+    when from_start is set. A saved offset for a file that has since been rotated away is
+    ignored and the new file is read from the start.
+    """
+
+    def __init__(self, path, targets=("", "", ""), rules=None, offset_file=None, from_start=False,
+                 poll_interval=POLL_INTERVAL, recent=RECENT_JOBS, loads=json.loads, target_table=None,
+                 metrics=None, latency=None, dedup=None):
+        self.path = path
+        self.targets = targets
+        self.rules = rules
+        self.target_table = target_table
+        self.offset_file = offset_file
+        self.from_start = from_start
+        self.poll_interval = poll_interval
+        self.metrics = metrics  # ledger_metrics.Metrics timing scan / decode / validate, or None
+        self.tally = ParseTally()  # malformed blocks and records not shaped like a ledger record
+        self.loads = self.tally.counting(loads if metrics is None else metrics.timed_loads(loads))
+        self.latency = latency  # ledger_latency.LatencyStats, clocked once per poll, or None
+        self.dedup = dedup  # ledger_dedup.Deduplicator skipping retried records, or None
+
+        self.records = 0
+        self.objects = 0
+        self.failed = 0
+        self.duplicates = 0
+        self.rotations = 0
+        self.error = None
+        self.last_update = None  # time.time() of the last poll that found new records
+        self.recent = deque(maxlen=recent)
+
+        self._fh = None
+        self._ident = None  # (st_dev, st_ino) of the open file
+        self._read_pos = 0
+        self._scanner = RecordScanner()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def offset(self):
+        """Byte offset up to which every record has been validated."""
+        return self._read_pos - self._scanner.pending
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _open(self, offset):
+        if self._fh is not None:
+            self._fh.close()
+        self._fh = open(self.path, "rb")
+        st = os.fstat(self._fh.fileno())
+        self._ident = (st.st_dev, st.st_ino)
+        self._fh.seek(offset)
+        self._read_pos = offset
+        self._scanner = RecordScanner()
+        return st
+
+    def _open_initial(self):
+        st = self._open(0)
+        saved = load_offset(self.offset_file) if self.offset_file else None
+        if saved is not None and saved[:2] == self._ident and saved[2] <= st.st_size:
+            offset = saved[2]
+        elif saved is not None or self.from_start:
+            offset = 0  # rotated or truncated since the state was saved, or asked to
+        else:
+            offset = st.st_size
+        self._fh.seek(offset)
+        self._read_pos = offset
+
+    def _drain(self):
+        """Read to the current end of the open file and validate every completed record."""
+        metrics = self.metrics
+        latency = self.latency
+        dedup = self.dedup
+        skipped = 0
+        if latency is not None:
+            latency.set_clock()
+        perf = time.perf_counter
+        results = []
+        jobs = []
+        while True:
+            chunk = self._fh.read(READ_CHUNK)
+            if not chunk:
+                break
+            self._read_pos += len(chunk)
+            t0 = perf()
+            blocks = self._scanner.feed(chunk)
+            if metrics is not None:
+                metrics.observe("scan", perf() - t0)
+            for block in blocks:
+                if dedup is not None and dedup.seen_content(block):
+                    skipped += 1
+                    continue
+                try:
+                    data_all = self.loads(block.decode("utf-8", errors="replace"))
+                except json.JSONDecodeError:
+                    continue
+                if not isinstance(data_all, dict):
+                    continue
+                if dedup is not None and dedup.seen_identity(data_all):
+                    skipped += 1
+                    continue
+                t0 = perf()
+                try:
+                    record_results = validate_record(data_all, self.targets, self.rules, self.target_table)
+                except RecordShapeError:
+                    self.tally.invalid += 1
+                    continue
+                if metrics is not None:
+                    metrics.observe("validate", perf() - t0)
+                    metrics.count_results(record_results)
+                if latency is not None:
+                    latency.add_results(record_results)
+                results.extend(record_results)
+                jobs.append(record_results)
+        if skipped and metrics is not None:
+            metrics.inc("duplicates", skipped)
+        if jobs or skipped:
+            with self._lock:
+                self.duplicates += skipped
+                self.records += len(jobs)
+                for record_results in jobs:
+                    self.objects += len(record_results)
+                    self.failed += sum(1 for r in record_results if r["fail"])
+                    if record_results:
+                        self.recent.appendleft(summarize_job(record_results))
+                self.last_update = time.time()
+        return results
+
+    def poll(self):
+        """Validate whatever was appended since the last poll.
+        Returns the new per-object results, in the shape validate_record returns.
+        """
+        if self._fh is None:
+            if not os.path.exists(self.path):
+                return []
+            self._open_initial()
+        start = (self._ident, self.offset)
+        results = self._drain()
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None  # mid-rotation: keep reading the old file until the new one appears
+        if st is not None and (st.st_dev, st.st_ino) != self._ident:
+            # Rotated: the old file was drained above; an unfinished record in it is lost.
+            self._open(0)
+            self.rotations += 1
+            results.extend(self._drain())
+        elif st is not None and st.st_size < self._read_pos:
+            self._open(0)  # truncated in place (copytruncate)
+            self.rotations += 1
+            results.extend(self._drain())
+        if self.offset_file and (self._ident, self.offset) != start:
+            save_offset(self.offset_file, *self._ident, self.offset)
+        return results
+
+    def _close(self):
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    self.poll()
+                    self.error = None
+                except OSError as e:
+                    self.error = str(e)
+                self._stop.wait(self.poll_interval)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            if self._stop.is_set():
+                self._close()  # stop() gave up waiting for this poll and left the file open
+
+    def start(self):
+        """Poll in a daemon thread until stop() is called."""
+        if not self.running:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name=f"follow:{self.path}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        """Stop polling and close the file. If the thread is still inside a poll after
+        timeout seconds, the file is left for the thread to close when that poll ends.
+        """
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+            if thread.is_alive():
+                return
+        self._close()
+
+    def snapshot(self):
+        """Thread-safe copy of the counters and recent job summaries for display."""
+        with self._lock:
+            return {
+                "path": self.path,
+                "running": self.running,
+                "offset": self.offset,
+                "records": self.records,
+                "objects": self.objects,
+                "failed": self.failed,
+                "duplicates": self.duplicates,
+                "malformed": self.tally.malformed,
+                "invalid": self.tally.invalid,
+                "rotations": self.rotations,
+                "error": self.error,
+                "last_update": self.last_update,
+                "recent": list(self.recent),
+                "latency": None if self.latency is None else self.latency.brief(),
+            }
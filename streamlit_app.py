@@ -1,10 +1,43 @@
 import streamlit as st
+import atexit
+import hashlib
 import json
 import os
-import re
-from html import escape as html_escape
-from datetime import datetime, timezone
-from zoneinfo import ZoneInfo
+import sqlite3
+import time
+from datetime import datetime
+
+from ledger_core import (
+    CATEGORIES,
+    DRIFT_THRESHOLD_SECONDS,
+    EASTERN_TZ,
+    RecordShapeError,
+    build_verification_rows,
+    check_drift,
+    compile_rules,
+    env_label as get_env_label,
+    extract_json,
+    extract_payload,
+    format_timestamp,
+    is_safe_url,
+    iter_json_records,
+    load_rule_spec,
+    parse_publish_time,
+    safe,
+    validate_record,
+)
+from ledger_cache import TTLCache, payload_key
+from ledger_history import PAGE_SIZE, HistoryStore
+from ledger_metrics import Metrics, write_prometheus
+from ledger_humio import HumioClient, parse_job_ids
+from ledger_index import INDEX_FIELDS, LogIndex, index_file_for, read_spans
+from ledger_dedup import Deduplicator
+from ledger_diff import ENV_DIFF_PATHS, change_dict, diff_records, is_identical, parse_ignore
+from ledger_latency import LatencyStats, format_seconds
+from ledger_jsonview import JsonPathError, preview_json, resolve_json_path
+from ledger_targets import TargetTableError, load_target_table, parse_target_table, table_format
+from ledger_render import display_status, job_details_html, object_panel_html
+from ledger_watch import LogFollower, offset_file_for, summarize_job
 
 # --- CONFIGURATION ---
 HUMIO_DASHBOARD_URL = os.environ.get(
@@ -20,345 +53,168 @@ HUMIO_JOB_URL_TEMPLATE = os.environ.get(
     "&filterId=9e3WFUID6IX7ypte9Osrm3vm626FHi2y&fullscreen=false"
     "&sharedTime=true&start=15m&updateFrequency=never"
 )
-DRIFT_THRESHOLD_SECONDS = 900  # 15 minutes
-EASTERN_TZ = ZoneInfo("America/New_York")
+
+# Humio search API used to fetch ledger lines by jobId (unset: the fetch panel is disabled)
+HUMIO_API_URL = os.environ.get("HUMIO_API_URL", "")
+HUMIO_REPOSITORY = os.environ.get("HUMIO_REPOSITORY", "guts_wam")
+HUMIO_API_TOKEN = os.environ.get("HUMIO_API_TOKEN")
+HUMIO_QUERY_START = os.environ.get("HUMIO_QUERY_START", "15m")
+
+# Optional JSON rule spec replacing the built-in checks (see ledger_core.DEFAULT_RULE_SPEC)
+RULES_FILE = os.environ.get("BORG_RULES_FILE")
+
+# Optional per-ticker expectations table (CSV or JSON) loaded at startup; one can also be uploaded
+TARGETS_FILE = os.environ.get("BORG_TARGETS_FILE")
+
+# Parsed-payload / validation-result caches shared by all sessions on this server
+CACHE_MAX_ENTRIES = int(os.environ.get("BORG_CACHE_MAX_ENTRIES", "32"))
+CACHE_TTL_SECONDS = int(os.environ.get("BORG_CACHE_TTL_SECONDS", "1800"))
+CACHE_MAX_MB = int(os.environ.get("BORG_CACHE_MAX_MB", "64"))  # raw payload bytes held parsed
+
+# Watch mode: default log to follow, where read offsets persist, and live view refresh rate
+WATCH_LOG_FILE = os.environ.get("BORG_WATCH_LOG", "")
+WATCH_STATE_DIR = os.environ.get("BORG_WATCH_STATE_DIR", os.path.join(os.path.expanduser("~"), ".borg_watch"))
+WATCH_REFRESH_SECONDS = float(os.environ.get("BORG_WATCH_REFRESH_SECONDS", "2"))
+
+# Sidecar byte-offset indexes of looked-up logs: next to each log, or in this directory if set
+INDEX_DIR = os.environ.get("BORG_INDEX_DIR", "")
+
+# Validation history database, shared by every session on this server
+HISTORY_DB = os.environ.get("BORG_HISTORY_DB", os.path.join(os.path.expanduser("~"), ".borg_history.sqlite3"))
+
+# Theme stylesheet, served from ./static when static serving is enabled
+THEME_CSS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "theme.css")
+
+# Prometheus text file the app and its watch threads export stage timings to (unset: no export)
+METRICS_FILE = os.environ.get("BORG_METRICS_FILE")
 
 # --- INPUT FIELD SESSION KEYS ---
 INPUT_KEYS = ["raw_log_input", "input_t1", "input_t2", "input_t3", "input_t4", "input_t5", "input_t6"]
 
 # --- INITIALIZE SESSION STATE ---
-if "validation_history" not in st.session_state:
-    st.session_state.validation_history = []
+if "history_cursors" not in st.session_state:
+    st.session_state.history_cursors = []  # before_id of each history page behind the current one
+if "confirm_clear_history" not in st.session_state:
+    st.session_state.confirm_clear_history = False
+
+# Stage timings for this script run; folded into the server-wide totals at the end of the run.
+run_metrics = Metrics({"mode": "app"})
 
 # --- SET PAGE CONFIG ---
 st.set_page_config(page_title="BORG Jobs Verification", layout="wide")
 
 # --- BLOOMBERG-STYLE THEMING ---
-st.markdown("""
-    <style>
-    @import url('https://fonts.googleapis.com/css2?family=Roboto+Mono:wght@400;500&family=Inter:wght@400;600&display=swap');
-
-    html, body, [class*="st-"] { font-family: 'Inter', sans-serif; }
-    code { font-family: 'Roboto Mono', monospace !important; color: #d4d4d4 !important; }
-
-    /* Environment Headers */
-    .env-header { padding: 12px 20px; border-radius: 4px; font-weight: 600; margin-bottom: 20px; border-left: 6px solid; }
-    .env-test { background-color: #3a321d; color: #ffcc00; border-color: #ffcc00; }
-    .env-prod { background-color: #1b2e1f; color: #4cd964; border-color: #4cd964; }
-    .env-invalid { background-color: #3d1c1c; color: #ff3b30; border-color: #ff3b30; }
-
-    /* Drift Warning */
-    .drift-warn { background-color: #3d1c1c; color: #ff3b30; padding: 10px; border-radius: 4px; font-weight: 600; margin-bottom: 15px; border: 1px solid #ff3b30; }
-
-    /* Job Details Styling */
-    .detail-item { margin-bottom: 10px; font-size: 0.95em; line-height: 1.6; }
-    .detail-label { color: #8e8e93; font-weight: 500; margin-right: 8px; }
-    .detail-value { color: #ffffff; font-family: 'Roboto Mono', monospace; word-break: break-all; }
-    .detail-value a { color: #0a84ff; text-decoration: none; }
-    .detail-value a:hover { text-decoration: underline; }
-
-    /* CQA Yellow Label */
-    .cqa-tag { color: #ffcc00; font-weight: 600; margin-left: 5px; }
-
-    /* Utility Link Button */
-    .humio-link {
-        display: inline-block;
-        padding: 5px 12px;
-        background-color: #ff9800;
-        color: #1a1a1a !important;
-        font-weight: 600;
-        border-radius: 4px;
-        text-decoration: none !important;
-        font-size: 0.85em;
-        border: 1px solid #e68900;
-        margin-bottom: 20px;
-    }
-    .humio-link:hover {
-        background-color: #e68900;
-        text-decoration: none !important;
-    }
+@st.cache_resource
+def theme_markup(css_path):
+    """Markup that applies the theme, built once per server process.
+    With static serving on (.streamlit/config.toml) this is a <link> to the cached
+    stylesheet, versioned by content hash; otherwise the CSS is inlined as a fallback.
+    """
+    with open(css_path, "rb") as f:
+        css = f.read()
+    if st.get_option("server.enableStaticServing"):
+        version = hashlib.blake2b(css, digest_size=6).hexdigest()
+        return f'<link rel="stylesheet" href="app/static/{os.path.basename(css_path)}?v={version}">'
+    return f"<style>{css.decode('utf-8')}</style>"
 
-    /* Vertical divider between columns */
-    [data-testid="stHorizontalBlock"] > div:first-child {
-        border-right: 2px solid #3a3a3c;
-        padding-right: 20px;
-    }
 
-    /* Publish timestamp banner */
-    .pub-time-banner {
-        background-color: #1c2333;
-        color: #8e8e93;
-        padding: 8px 14px;
-        border-radius: 4px;
-        font-size: 0.9em;
-        margin-bottom: 12px;
-        border-left: 4px solid #0a84ff;
-        font-family: 'Roboto Mono', monospace;
-    }
-    .pub-time-banner strong { color: #ffffff; }
+st.markdown(theme_markup(THEME_CSS_PATH), unsafe_allow_html=True)
 
-    /* Green parse button */
-    [data-testid="stButton"] button[kind="primary"] {
-        background-color: #28a745 !important;
-        border-color: #28a745 !important;
-        color: white !important;
-    }
-    [data-testid="stButton"] button[kind="primary"]:hover {
-        background-color: #218838 !important;
-        border-color: #218838 !important;
-    }
 
-    /* Hide ALL Material Symbols/Icons text fallback globally */
-    .material-symbols-rounded,
-    .material-symbols-outlined,
-    .material-symbols-sharp,
-    .material-icons,
-    [class*="material-symbols"],
-    [class*="material-icons"],
-    [data-testid="stSidebarCollapseButton"] span,
-    [data-testid="collapsedControl"] span,
-    [data-testid="stExpander"] summary span[data-testid="stIconMaterial"],
-    [data-testid="st-expander"] summary span[data-testid="stIconMaterial"] {
-        font-size: 0 !important;
-        line-height: 0 !important;
-        overflow: hidden !important;
-        display: inline-block !important;
-        width: 1.2em !important;
-        height: 1.2em !important;
-    }
+# --- HELPER FUNCTIONS ---
 
-    /* Sidebar toggle button - hide literal text like "keyboard_double_arrow_right" */
-    [data-testid="stSidebarCollapseButton"] button,
-    [data-testid="collapsedControl"] button {
-        font-size: 0 !important;
-        overflow: hidden !important;
-    }
-    [data-testid="stSidebarCollapseButton"] button svg,
-    [data-testid="collapsedControl"] button svg {
-        font-size: 1rem !important;
-        width: 1.2em !important;
-        height: 1.2em !important;
-        display: inline-block !important;
-    }
+@st.cache_resource
+def get_rules(rules_file, mtime=None):
+    """Compile the rule spec once per version (mtime) of the file; None means the built-in checks."""
+    if not rules_file:
+        return None
+    return compile_rules(load_rule_spec(rules_file))
 
-    /* Expander chevron arrows - hide literal text like "expand_more" */
-    [data-testid="stExpander"] details summary svg,
-    [data-testid="st-expander"] details summary svg {
-        display: inline-block !important;
-    }
-    [data-testid="stExpander"] summary span[data-testid="stMarkdownContainer"],
-    [data-testid="st-expander"] summary span[data-testid="stMarkdownContainer"] {
-        display: inline !important;
-    }
-    [data-testid="stExpander"] summary::before,
-    [data-testid="stExpander"] summary::after,
-    [data-testid="st-expander"] .streamlit-expanderHeader::before,
-    [data-testid="st-expander"] .streamlit-expanderHeader::after {
-        content: "" !important;
-        display: none !important;
-    }
-    details summary .material-icons,
-    details summary [class*="icon"],
-    details summary [class*="material-symbols"] {
-        font-size: 0 !important;
-        overflow: hidden !important;
-    }
 
-    /* Style for (Collapsible) */
-    .collapsible-note {
-        font-style: italic;
-        color: #8e8e93;
-        float: right;
-    }
+def current_rules():
+    """(compiled rules, cache id) for RULES_FILE as it is on disk now, so an edit to the
+    file takes effect without restarting the app. The id keys cached validation results.
+    """
+    if not RULES_FILE:
+        return None, None
+    mtime = os.path.getmtime(RULES_FILE)
+    return get_rules(RULES_FILE, mtime), (RULES_FILE, mtime)
 
-    /* Green Button */
-    .green-button {
-        background-color: #28a745;
-        color: white;
-        font-size: 16px;
-        font-weight: bold;
-        padding: 10px 20px;
-        border: none;
-        border-radius: 5px;
-        cursor: pointer;
-        text-align: center;
-    }
-    .green-button:hover {
-        background-color: #218838;
-    }
 
-    /* Summary Banner */
-    .summary-banner {
-        display: flex;
-        gap: 16px;
-        padding: 14px 20px;
-        border-radius: 6px;
-        margin-bottom: 20px;
-        font-weight: 600;
-        font-size: 0.95em;
-        align-items: center;
-        border-left: 6px solid;
-    }
-    .summary-all-pass {
-        background-color: #1b2e1f;
-        color: #4cd964;
-        border-color: #4cd964;
-    }
-    .summary-has-fail {
-        background-color: #3d1c1c;
-        color: #ff3b30;
-        border-color: #ff3b30;
-    }
-    .summary-has-warn {
-        background-color: #3a321d;
-        color: #ffcc00;
-        border-color: #ffcc00;
-    }
-    .summary-stat {
-        display: inline-flex;
-        align-items: center;
-        gap: 4px;
-        padding: 4px 10px;
-        border-radius: 4px;
-        font-size: 0.9em;
-    }
-    .stat-pass { background-color: rgba(76, 217, 100, 0.2); color: #4cd964; }
-    .stat-fail { background-color: rgba(255, 59, 48, 0.2); color: #ff3b30; }
-    .stat-warn { background-color: rgba(255, 204, 0, 0.2); color: #ffcc00; }
-    .stat-review { background-color: rgba(142, 142, 147, 0.2); color: #8e8e93; }
-
-    /* Empty state */
-    .empty-state {
-        text-align: center;
-        padding: 40px 20px;
-        color: #636366;
-    }
-    .empty-state h3 { color: #8e8e93; margin-bottom: 10px; }
-    .empty-state code {
-        display: block;
-        background: #1c2333;
-        padding: 12px;
-        border-radius: 6px;
-        margin: 16px auto;
-        max-width: 600px;
-        text-align: left;
-        font-size: 0.85em;
-        color: #8e8e93 !important;
-    }
+@st.cache_resource
+def get_target_table_file(path, mtime):
+    """Load and index the BORG_TARGETS_FILE table once per file version (mtime)."""
+    return load_target_table(path)
 
-    /* History sidebar entries */
-    .history-entry {
-        padding: 8px 12px;
-        border-radius: 4px;
-        margin-bottom: 8px;
-        font-size: 0.85em;
-        border-left: 4px solid;
-        font-family: 'Roboto Mono', monospace;
-    }
-    .history-pass { background-color: #1b2e1f; border-color: #4cd964; color: #4cd964; }
-    .history-fail { background-color: #3d1c1c; border-color: #ff3b30; color: #ff3b30; }
-    .history-mixed { background-color: #3a321d; border-color: #ffcc00; color: #ffcc00; }
-    .history-meta { color: #636366; font-size: 0.8em; margin-top: 4px; }
-    </style>
-    """, unsafe_allow_html=True)
 
+@st.cache_resource(max_entries=8)
+def get_uploaded_target_table(file_id, name, _data):
+    """Index an uploaded expectations table once per upload; the bytes are not hashed."""
+    return parse_target_table(_data.decode("utf-8-sig"), table_format(name))
 
-# --- HELPER FUNCTIONS ---
 
-def safe(val):
-    """HTML-escape a value for safe embedding in markup."""
-    if val is None:
-        return "None"
-    return html_escape(str(val))
+@st.cache_resource
+def get_app_metrics():
+    """Stage timings and counters accumulated over every run on this server."""
+    return Metrics({"mode": "app"})
 
 
-def parse_publish_time(pub_time_str):
-    """Parse the publish timestamp string into a timezone-aware datetime, or None on failure."""
-    if not pub_time_str:
-        return None
+def export_metrics():
+    """Write the app's and every watch thread's metrics to METRICS_FILE, if configured."""
+    if not METRICS_FILE:
+        return
+    registries = [get_app_metrics()]
+    registries += [f.metrics for f in get_followers().values() if f.metrics is not None]
     try:
-        return datetime.strptime(pub_time_str, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
-    except (ValueError, TypeError):
-        return None
+        write_prometheus(METRICS_FILE, registries)
+    except OSError:
+        pass  # a missing export must never break the page
 
 
-def format_timestamp(dt_utc):
-    """Return (utc_str, eastern_str, tz_label) formatted timestamp strings, or None on failure."""
-    if dt_utc is None:
-        return None, None, None
-    formatted_utc = dt_utc.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt_utc.microsecond // 1000:03d}"
-    dt_eastern = dt_utc.astimezone(EASTERN_TZ)
-    formatted_eastern = dt_eastern.strftime("%Y-%m-%d %H:%M:%S.") + f"{dt_eastern.microsecond // 1000:03d}"
-    tz_label = dt_eastern.strftime("%Z")  # "EST" or "EDT" depending on DST
-    return formatted_utc, formatted_eastern, tz_label
+def timed_extract(raw_input):
+    """extract_json, timing the JSON decode separately from the brace scan around it."""
+    decode_s = [0.0]
 
+    def loads(text):
+        t0 = time.perf_counter()
+        try:
+            return json.loads(text)
+        finally:
+            decode_s[0] += time.perf_counter() - t0
 
-def extract_json(raw_input):
-    """Extract and parse the first JSON object from a raw log string."""
-    json_match = re.search(r'(\{.*\})', raw_input, re.DOTALL)
-    if not json_match:
-        return None
-    return json.loads(json_match.group(1))
-
-
-def check_drift(pub_dt):
-    """Return a human-readable drift string if the timestamp is stale, else None."""
-    if pub_dt is None:
-        return None
-    drift_seconds = (datetime.now(timezone.utc) - pub_dt).total_seconds()
-    if drift_seconds <= DRIFT_THRESHOLD_SECONDS:
-        return None
-    drift_hours = int(drift_seconds // 3600)
-    drift_mins = int((drift_seconds % 3600) // 60)
-    return f"{drift_hours}h {drift_mins}m" if drift_hours > 0 else f"{drift_mins}m"
-
-
-def is_safe_url(url):
-    """Basic check that a URL uses https."""
-    return url and str(url).startswith("https://")
+    t0 = time.perf_counter()
+    try:
+        return extract_json(raw_input, loads)
+    finally:
+        run_metrics.observe("scan", time.perf_counter() - t0 - decode_s[0])
+        run_metrics.observe("decode", decode_s[0], records=1, bytes=len(raw_input))
 
 
-def compute_row_status(act, goal, r_type):
-    """Compute the (status_text, bg_color, category) for a single verification row.
-    category is one of: 'pass', 'fail', 'warn', 'review'.
+@st.cache_resource
+def get_caches():
+    """Return the (payload_cache, result_cache) pair shared by every session.
+    payload_cache: payload hash -> parsed record and extracted fields, weighted by raw size.
+    result_cache: (payload hash, targets, expectations, rules, targets table) -> validated objects.
     """
-    is_empty = act is None or str(act).strip() == ""
-
-    if is_empty:
-        return "MISSING", "rgba(255, 59, 48, 0.15)", "fail"
-    elif r_type == "binary":
-        if act == "YES":
-            return "TEST", "rgba(255, 204, 0, 0.15)", "warn"
-        elif act == "NO":
-            return "PROD", "rgba(76, 217, 100, 0.15)", "pass"
-        else:
-            return f"INVALID (Exp: {safe(goal)})", "rgba(255, 59, 48, 0.15)", "fail"
-    elif r_type == "fixed":
-        if act == goal:
-            return "OK", "rgba(76, 217, 100, 0.1)", "pass"
-        else:
-            return f"MISMATCH (Exp: {safe(goal)})", "rgba(255, 59, 48, 0.15)", "fail"
-    elif r_type == "target" and goal:
-        if str(act) == str(goal):
-            return "MATCH", "rgba(76, 217, 100, 0.1)", "pass"
-        else:
-            return f"MISMATCH (Exp: {safe(goal)})", "rgba(255, 59, 48, 0.15)", "fail"
-    else:
-        return "Review", "transparent", "review"
+    payload_cache = TTLCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS, max_weight=CACHE_MAX_MB << 20)
+    result_cache = TTLCache(CACHE_MAX_ENTRIES * 4, CACHE_TTL_SECONDS)
+    return payload_cache, result_cache
 
 
-STATUS_ICONS = {
-    "pass": "&#9989;",
-    "fail": "&#10060;",
-    "warn": "&#129514;",
-    "review": "&#128064;",
-}
-
-# Special overrides for binary field display
-BINARY_STATUS_TEXT = {
-    "TEST": "&#129514; TEST",
-    "PROD": "&#128640; PROD",
-}
+def load_payload(raw_input, key):
+    """Parse a raw log once per content hash; reruns on the same paste hit the cache.
+    Returns the extract_payload dict plus "data_all", or None if there is no JSON block.
+    """
+    payload_cache, _ = get_caches()
+    payload = payload_cache.get(key)
+    if payload is None:
+        data_all = timed_extract(raw_input)
+        if data_all is None:
+            return None
+        with run_metrics.stage("payload"):
+            payload = {"data_all": data_all, **extract_payload(data_all)}
+        payload_cache.put(key, payload, weight=len(raw_input))
+    return payload
 
 
 def render_detail(container, label, actual, expected=None):
@@ -385,31 +241,6 @@ def render_copyable_detail(container, label, value):
     container.code(str(value) if value else "None", language=None)
 
 
-def build_verification_rows(meta, is_borg, targets):
-    """Build the verification rows and return (rows_with_status, counts).
-    Each row: (label, actual, goal, r_type, status_text, bg, category).
-    counts: dict with keys 'pass', 'fail', 'warn', 'review'.
-    """
-    t_ticker, t_scaling, t_period = targets
-    rows_raw = [
-        ("isBorgTest", is_borg, "YES/NO", "binary"),
-        ("sendToBorg", meta.get("sendToBorg"), "YES", "fixed"),
-        ("releaseDate", meta.get("releaseDate"), "NO RELEASE DATE", "fixed"),
-        ("scalingFactor", meta.get("scalingFactor"), t_scaling, "target"),
-        ("tickerValue", meta.get("tickerValue"), t_ticker, "target"),
-        ("observationPeriod", meta.get("observationPeriod"), t_period, "target"),
-    ]
-
-    counts = {"pass": 0, "fail": 0, "warn": 0, "review": 0}
-    rows_with_status = []
-    for label, act, goal, r_type in rows_raw:
-        status_text, bg, category = compute_row_status(act, goal, r_type)
-        counts[category] += 1
-        rows_with_status.append((label, act, goal, r_type, status_text, bg, category))
-
-    return rows_with_status, counts
-
-
 def render_summary_banner(container, counts):
     """Render the pass/fail/warn summary banner."""
     total = sum(counts.values())
@@ -454,12 +285,7 @@ def render_verification_table(container, rows_with_status, has_targets):
     h_cols[-1].markdown("**Status**")
 
     for label, act, goal, r_type, status_text, bg, category in rows_with_status:
-        # Build display status with icon
-        if r_type == "binary" and status_text in BINARY_STATUS_TEXT:
-            display_status = BINARY_STATUS_TEXT[status_text]
-        else:
-            icon = STATUS_ICONS.get(category, "")
-            display_status = f"{icon} {status_text}"
+        status_display = display_status(r_type, status_text, category)
 
         row_cols = container.columns([1.5, 1, 1, 1] if has_targets else [1.5, 1, 1])
         row_cols[0].markdown(
@@ -477,7 +303,7 @@ def render_verification_table(container, rows_with_status, has_targets):
                 unsafe_allow_html=True
             )
         row_cols[-1].markdown(
-            f'<div style="background:{bg}; padding:5px; font-weight:600; text-align:right;">{display_status}</div>',
+            f'<div style="background:{bg}; padding:5px; font-weight:600; text-align:right;">{status_display}</div>',
             unsafe_allow_html=True
         )
 
@@ -491,7 +317,7 @@ def render_job_details(container, meta, content, job_props, job_meta, data_all,
     cqa = ' <span class="cqa-tag">[CQA]</span>' if (w_id == "778" and c_id == "1") else ""
 
     # Copyable key fields
-    parsed_job_id = data_all.get('key', {}).get('jobId')
+    parsed_job_id = (data_all.get('key') or {}).get('jobId')
     agent_id = job_props.get('agentId')
     eco_ticker = job_meta.get('ecoticker')
 
@@ -563,19 +389,24 @@ def render_job_details(container, meta, content, job_props, job_meta, data_all,
     return parsed_job_id
 
 
-def add_to_history(job_id, job_name, env, counts, timestamp_str):
-    """Add a validation run to session history."""
-    entry = {
-        "timestamp": datetime.now(EASTERN_TZ).strftime("%H:%M:%S"),
-        "job_id": str(job_id) if job_id else "N/A",
-        "job_name": str(job_name) if job_name else "N/A",
-        "env": env,
-        "counts": dict(counts),
-        "pub_time": timestamp_str or "N/A",
-    }
-    st.session_state.validation_history.insert(0, entry)
-    # Keep last 20 entries
-    st.session_state.validation_history = st.session_state.validation_history[:20]
+@st.cache_resource
+def get_history(path):
+    """Open the history database once per server process; queued runs are committed on exit."""
+    store = HistoryStore(path)
+    atexit.register(store.close)
+    return store
+
+
+def add_to_history(job_id, job_name, env, counts, timestamp_str, tickers=()):
+    """Record a validation run in the history database; counts are the run's totals."""
+    get_history(HISTORY_DB).add(
+        str(job_id) if job_id else "N/A",
+        str(job_name) if job_name else "N/A",
+        env,
+        counts,
+        timestamp_str or "N/A",
+        tickers,
+    )
 
 
 def render_empty_state():
@@ -616,22 +447,518 @@ def render_empty_state():
 
 
 def reset_form():
-    """Clear all input fields."""
+    """Clear all input fields and the parsed log."""
     for key in INPUT_KEYS:
         st.session_state[key] = ""
+    st.session_state.active_log = ""
 
 
-# --- SIDEBAR: VALIDATION HISTORY ---
-with st.sidebar:
-    st.markdown("### Validation History")
-    if not st.session_state.validation_history:
-        st.caption("No validations yet. Parse a log to see history here.")
+OBJECT_FILTERS = {
+    "All": None,
+    "Failing": "FAIL",
+    "Warnings": "WARN",
+    "Passing": "PASS",
+}
+OBJECT_SORTS = ["Input order", "Most failures", "Ticker"]
+
+
+def overall_status(counts):
+    """Collapse per-check counts into one FAIL / WARN / PASS status."""
+    if counts["fail"] > 0:
+        return "FAIL"
+    if counts["warn"] > 0:
+        return "WARN"
+    return "PASS"
+
+
+def evaluate_objects(objects, targets, rules, job_props, job_meta, expectations, target_table=None):
+    """Validate every (meta, content) object once and return one result dict per object.
+    With a target_table each object is checked against its own row's targets and expectations.
+    """
+    items = []
+    for i, (meta, content) in enumerate(objects):
+        rows_with_status, counts = build_verification_rows(
+            meta, targets, rules, content, job_props, job_meta, target_table
+        )
+        if target_table is not None:
+            expectations_i = target_table.expectations_for(meta, job_meta, expectations)
+        else:
+            expectations_i = expectations
+        items.append({
+            "index": i,
+            "meta": meta,
+            "content": content,
+            "rows": rows_with_status,
+            "counts": counts,
+            "env": get_env_label(meta.get('isBorgTest')),
+            "status": overall_status(counts),
+            "expectations": expectations_i,
+        })
+    return items
+
+
+@st.fragment
+def render_object_detail(item, job, border=False):
+    """Render the full banner, headers, table and details for one object.
+    A fragment: its own widgets rerun only this panel; Reset Form reruns the page.
+    """
+    container = st.container(border=border)
+    i, meta, content = item["index"], item["meta"], item["content"]
+    rows_with_status, counts = item["rows"], item["counts"]
+    is_borg = meta.get('isBorgTest')
+    pub_dt, pub_time_str = job["pub_dt"], job["pub_time_str"]
+
+    # --- Summary Banner ---
+    render_summary_banner(container, counts)
+
+    # Environment header
+    if item["env"] == "TEST":
+        container.markdown(
+            '<div class="env-header env-test">TEST / DEV / BETA (isBorgTest=YES)</div>',
+            unsafe_allow_html=True
+        )
+    elif item["env"] == "PROD":
+        container.markdown(
+            '<div class="env-header env-prod">PRODUCTION &#9888;&#65039; '
+            '(Ready for Results - isBorgTest=NO)</div>',
+            unsafe_allow_html=True
+        )
     else:
-        if st.button("Clear History", key="clear_history"):
-            st.session_state.validation_history = []
+        if is_borg:
+            msg = f"INVALID: isBorgTest is '{safe(is_borg)}'"
+        else:
+            msg = "MISSING: isBorgTest is NULL"
+        container.markdown(
+            f'<div class="env-header env-invalid">{msg}</div>',
+            unsafe_allow_html=True
+        )
+
+    # Publish timestamp banner
+    if pub_dt:
+        formatted_utc, formatted_eastern, tz_label = format_timestamp(pub_dt)
+        eastern_part = ""
+        if formatted_eastern:
+            eastern_part = (
+                f' <em style="color:#636366; font-size:0.85em;">'
+                f'({formatted_eastern} {tz_label})</em>'
+            )
+        container.markdown(
+            f'<div class="pub-time-banner">Payload Timestamp: '
+            f'<strong>{formatted_utc} UTC</strong>{eastern_part}</div>',
+            unsafe_allow_html=True
+        )
+    elif pub_time_str:
+        container.markdown(
+            f'<div class="pub-time-banner">Payload Timestamp: '
+            f'<strong>{safe(pub_time_str)}</strong> (unparseable)</div>',
+            unsafe_allow_html=True
+        )
+
+    if single_element_render:
+        # Whole table + details as one pre-escaped element: one delta per object.
+        with run_metrics.stage("render_html"):
+            details_html = job_details_html(
+                meta, content, job["job_props"], job["job_meta"], job["data_all"],
+                item["expectations"], HUMIO_JOB_URL_TEMPLATE
+            )
+            panel_html = object_panel_html(rows_with_status, job["has_targets"], details_html)
+        container.markdown(panel_html, unsafe_allow_html=True)
+        if container.button("&#9851;&#65039; Reset Form", on_click=reset_form, key=f"reset_{i}"):
             st.rerun()
+    else:
+        col1, col2 = container.columns([3, 2])
+
+        with col1:
+            render_verification_table(col1, rows_with_status, job["has_targets"])
 
-        for idx, entry in enumerate(st.session_state.validation_history):
+        with col2:
+            render_job_details(
+                col2, meta, content, job["job_props"], job["job_meta"], job["data_all"],
+                item["expectations"]
+            )
+            if container.button("&#9851;&#65039; Reset Form", on_click=reset_form, key=f"reset_{i}"):
+                st.rerun()
+
+
+@st.fragment
+def render_object_browser(items, job):
+    """Summary grid of every object with filter/sort, plus full detail for one selected object.
+    A fragment, so filtering, sorting and picking an object do not revalidate the job.
+    """
+    status_totals = {status: 0 for status in ("FAIL", "WARN", "PASS")}
+    for item in items:
+        status_totals[item["status"]] += 1
+    st.markdown(
+        f'<div class="summary-banner {"summary-has-fail" if status_totals["FAIL"] else "summary-all-pass"}">'
+        f'<strong>{len(items)} objects</strong>'
+        f'<span class="summary-stat stat-fail">&#10060; {status_totals["FAIL"]} Failing</span>'
+        f'<span class="summary-stat stat-warn">&#129514; {status_totals["WARN"]} Warnings</span>'
+        f'<span class="summary-stat stat-pass">&#9989; {status_totals["PASS"]} Passing</span></div>',
+        unsafe_allow_html=True
+    )
+
+    f_col, s_col = st.columns([3, 2])
+    status_filter = OBJECT_FILTERS[f_col.radio(
+        "Show", list(OBJECT_FILTERS), horizontal=True, key="object_filter"
+    )]
+    sort_by = s_col.selectbox("Sort by", OBJECT_SORTS, key="object_sort")
+
+    shown = [item for item in items if status_filter is None or item["status"] == status_filter]
+    if sort_by == "Most failures":
+        shown.sort(key=lambda item: (-item["counts"]["fail"], -item["counts"]["warn"], item["index"]))
+    elif sort_by == "Ticker":
+        shown.sort(key=lambda item: (str(item["meta"].get("tickerValue") or ""), item["index"]))
+
+    # One dataframe element for the whole grid; the browser virtualises its rows.
+    st.dataframe(
+        [
+            {
+                "#": item["index"] + 1,
+                "Ticker": item["meta"].get("tickerValue"),
+                "Env": item["env"],
+                "Status": item["status"],
+                "Pass": item["counts"]["pass"],
+                "Fail": item["counts"]["fail"],
+                "Warn": item["counts"]["warn"],
+                "Review": item["counts"]["review"],
+                "Failing": ", ".join(row[0] for row in item["rows"] if row[6] == "fail"),
+            }
+            for item in shown
+        ],
+        hide_index=True,
+    )
+
+    if not shown:
+        st.info("No objects match this filter.")
+        return
+
+    by_index = {item["index"]: item for item in shown}
+    selected = st.selectbox(
+        "Object detail",
+        list(by_index),
+        format_func=lambda i: (
+            f"Object {i + 1} - {by_index[i]['meta'].get('tickerValue') or 'no ticker'} "
+            f"({by_index[i]['status']})"
+        ),
+        key="object_select",
+    )
+    render_object_detail(by_index[selected], job, border=True)
+
+
+def render_raw_json_viewer(data_all):
+    """Lazy raw JSON viewer: a bounded preview of one chosen subtree, only while switched on."""
+    if not st.toggle("&#128196; Raw Parsed JSON", key="show_raw_json"):
+        return
+    p_col, d_col = st.columns([3, 1])
+    path = p_col.text_input(
+        "Subtree path", key="raw_json_path",
+        placeholder='e.g. data.objects[17] or metadata["bbds.context.publishTime"]'
+    )
+    depth = d_col.number_input("Depth", min_value=1, max_value=10, value=3, key="raw_json_depth")
+    try:
+        subtree = resolve_json_path(data_all, path)
+    except JsonPathError as e:
+        st.warning(f"Path not found: {e}")
+        return
+    st.caption("Preview is truncated: deep branches, long lists and long strings are summarised. "
+               "Enter a path to drill into a subtree.")
+    st.json(preview_json(subtree, max_depth=depth), expanded=2)
+
+
+# --- WATCH MODE ---
+
+@st.cache_resource
+def get_followers():
+    """Running log followers by path, shared by every session: reloading the page neither
+    orphans a reader thread nor starts a second one on the same file and offset state.
+    """
+    return {}
+
+
+def start_watch(path, targets, rules, from_start, target_table=None):
+    """(Re)start following a log file with the current targets."""
+    followers = get_followers()
+    existing = followers.pop(path, None)
+    if existing is not None:
+        existing.stop()
+    follower = LogFollower(path, targets, rules, offset_file=offset_file_for(path, WATCH_STATE_DIR),
+                           from_start=from_start, target_table=target_table,
+                           metrics=Metrics({"mode": "watch", "log": os.path.basename(path)}),
+                           latency=LatencyStats(), dedup=Deduplicator())
+    followers[path] = follower.start()
+    st.session_state.watch_path = path
+
+
+def stop_watch(path):
+    follower = get_followers().pop(path, None)
+    if follower is not None:
+        follower.stop()
+
+
+@st.fragment(run_every=WATCH_REFRESH_SECONDS)
+def render_watch_panel(path):
+    """Live summary of a followed log. Refreshes on its own timer without rerunning the page;
+    it only reads the follower's snapshot, never the file.
+    """
+    follower = get_followers().get(path)
+    if follower is None:
+        return
+    snap = follower.snapshot()
+    export_metrics()
+    updated = "no new records yet"
+    if snap["last_update"]:
+        updated = "last record " + datetime.fromtimestamp(snap["last_update"], EASTERN_TZ).strftime("%H:%M:%S %Z")
+    st.markdown(f"#### &#128225; Watching `{path}`")
+    st.caption(
+        f"{snap['records']} records &middot; {snap['objects']} objects &middot; "
+        f"{snap['failed']} failing &middot; {snap['duplicates']} duplicates skipped &middot; "
+        f"{snap['malformed'] + snap['invalid']} malformed skipped &middot; offset {snap['offset']:,} bytes &middot; "
+        f"{snap['rotations']} rotations &middot; {updated}"
+    )
+    latency = snap["latency"]
+    if latency and latency["records"]:
+        st.caption(
+            f"Publish drift p50 &le; {format_seconds(latency['p50_s'])} &middot; "
+            f"p99 &le; {format_seconds(latency['p99_s'])} &middot; "
+            f"{latency['stale']} published more than {format_seconds(DRIFT_THRESHOLD_SECONDS)} before arrival"
+        )
+    if not snap["running"]:
+        st.error(f"Follower stopped: {snap['error'] or 'the polling thread has exited'}. "
+                 "Click **Start Watching** again to resume from the saved offset.")
+    elif snap["error"]:
+        st.warning(f"Cannot read log: {snap['error']}")
+    if not snap["recent"]:
+        st.info("Waiting for new ledger records...")
+        return
+    st.dataframe(
+        [
+            {
+                "Status": overall_status(job),
+                "Job Name": job["jobName"],
+                "Job ID": job["jobId"],
+                "Env": job["env"],
+                "Objects": job["objects"],
+                "Pass": job["pass"],
+                "Fail": job["fail"],
+                "Warn": job["warn"],
+                "Review": job["review"],
+                "Failing objects": ", ".join(str(i + 1) for i in job["failedObjects"]),
+                "Published": job["publishTime"],
+            }
+            for job in snap["recent"]
+        ],
+        hide_index=True,
+    )
+
+
+# --- HUMIO FETCH ---
+
+@st.cache_resource
+def get_humio_client(base_url, repository, start):
+    """One pooled, response-caching Humio client per server process and configuration."""
+    return HumioClient(base_url, repository, token=HUMIO_API_TOKEN, start=start)
+
+
+def fetch_humio_jobs(job_ids, targets, rules, target_table=None):
+    """Fetch and validate each jobId; returns one summary dict per job, in input order.
+    Each summary keeps the fetched text so the job can be opened in the detail view.
+    """
+    client = get_humio_client(HUMIO_API_URL, HUMIO_REPOSITORY, HUMIO_QUERY_START)
+    jobs = []
+    for job_id, lines, error in client.fetch_jobs(job_ids):
+        text = "\n".join(lines)
+        results = []
+        for data_all in iter_json_records(text):
+            try:
+                results.extend(validate_record(data_all, targets, rules, target_table))
+            except RecordShapeError:
+                continue
+        summary = summarize_job(results) if results else {"objects": 0, "failedObjects": []}
+        jobs.append({**summary, "jobId": job_id, "text": text,
+                     "error": str(error) if error else ("" if results else "No ledger records found")})
+    return jobs
+
+
+def render_job_results(jobs, key):
+    """Summary table of fetched or looked-up jobs, plus a picker that opens one in the detail view."""
+    fetched = [job for job in jobs if not job["error"]]
+    st.caption(f"{len(jobs)} jobs requested &middot; {len(fetched)} found &middot; "
+               f"{sum(1 for job in fetched if job['fail'])} with failures")
+    st.dataframe(
+        [
+            {
+                "Status": overall_status(job) if not job["error"] else "ERROR",
+                "Job ID": job["jobId"],
+                "Job Name": job.get("jobName"),
+                "Env": job.get("env"),
+                "Objects": job["objects"],
+                "Pass": job.get("pass"),
+                "Fail": job.get("fail"),
+                "Warn": job.get("warn"),
+                "Review": job.get("review"),
+                "Failing objects": ", ".join(str(i + 1) for i in job["failedObjects"]),
+                "Error": job["error"],
+            }
+            for job in jobs
+        ],
+        hide_index=True,
+    )
+    if fetched:
+        h1, h2 = st.columns([3, 1])
+        pick = h1.selectbox("Open a job", [job["jobId"] for job in fetched], key=f"{key}_pick",
+                            label_visibility="collapsed")
+        if h2.button("Open in viewer", key=f"{key}_open"):
+            text = next(job["text"] for job in fetched if job["jobId"] == pick)
+            st.session_state.active_log = text
+            st.session_state.active_key = payload_key(text)
+
+
+# --- INDEXED LOG LOOKUP ---
+
+def lookup_indexed_jobs(path, field, value, targets, rules, target_table=None):
+    """Bring a log's sidecar index up to date, seek to the records matching one key and
+    validate them. Returns (summaries shaped like fetch_humio_jobs', records newly indexed,
+    the offset indexing stopped at before an unclosed record, or None).
+    """
+    with LogIndex(path, index_file_for(path, INDEX_DIR)) as index:
+        added = index.update()
+        spans = index.lookup({field: value})
+    jobs = []
+    for text in read_spans(path, spans):
+        try:
+            results = validate_record(json.loads(text), targets, rules, target_table)
+        except (json.JSONDecodeError, RecordShapeError):
+            continue
+        if results:
+            jobs.append({**summarize_job(results), "text": text, "error": ""})
+    return jobs, added, index.stopped_at
+
+
+@st.fragment
+def render_compare_panel():
+    """Diff two pasted runs of a job. Editing either side reruns only this panel."""
+    c1, c2 = st.columns(2)
+    raw_a = c1.text_area("First run (e.g. TEST)", height=120, key="diff_input_a")
+    raw_b = c2.text_area("Second run (e.g. PROD)", height=120, key="diff_input_b")
+    ignore_env = st.checkbox(
+        "Ignore fields every TEST/PROD pair differs in", value=True, key="diff_ignore_env",
+        help=", ".join(ENV_DIFF_PATHS)
+    )
+    if not (raw_a.strip() and raw_b.strip()):
+        st.caption("Paste a log entry on each side. Objects are paired by tickerValue.")
+        return
+    try:
+        record_a, record_b = extract_json(raw_a), extract_json(raw_b)
+    except json.JSONDecodeError as e:
+        st.error(f"Invalid JSON: {e}")
+        return
+    if record_a is None or record_b is None:
+        st.error("No JSON block detected on the " + ("first" if record_a is None else "second") + " side.")
+        return
+    diff = diff_records(record_a, record_b, parse_ignore(ENV_DIFF_PATHS) if ignore_env else frozenset())
+    if is_identical(diff):
+        st.success(f"No differences ({diff['same']} objects identical).")
+        return
+    st.caption(f"{len(diff['objects'])} objects differ &middot; {diff['same']} identical &middot; "
+               f"{len(diff['only_a'])} only in the first run &middot; {len(diff['only_b'])} only in the second")
+    rows = [("Job", change) for change in diff["job"]]
+    rows += [(f"{obj['ticker']} (#{obj['index'][0] + 1})", change)
+             for obj in diff["objects"] for change in obj["changes"]]
+    table = []
+    for where, change in rows:
+        shown = change_dict(change)
+        table.append({
+            "Object": where,
+            "Field": shown["path"] or "(whole object)",
+            "First run": json.dumps(shown["a"]) if "a" in shown else "(missing)",
+            "Second run": json.dumps(shown["b"]) if "b" in shown else "(missing)",
+        })
+    for side, key in (("First run", "only_a"), ("Second run", "only_b")):
+        for obj in diff[key]:
+            table.append({
+                "Object": f"{obj['ticker']} (#{obj['index'] + 1})",
+                "Field": "(whole object)",
+                "First run": "present" if side == "First run" else "(missing)",
+                "Second run": "present" if side == "Second run" else "(missing)",
+            })
+    st.dataframe(table, hide_index=True)
+
+
+def stage_rows(snapshot):
+    return [
+        {
+            "Stage": name,
+            "Calls": stats["count"],
+            "Total ms": round(stats["total_s"] * 1e3, 2),
+            "Mean ms": round(stats["mean_ms"], 3),
+            "p99 ms (bucket)": stats["p99_ms"],
+        }
+        for name, stats in snapshot["stages"].items()
+    ]
+
+
+def render_timings_panel(run_snapshot, server_snapshot):
+    """Opt-in debug panel: where this run's time went, and totals since the server started."""
+    with st.sidebar.expander("&#9201;&#65039; Timings", expanded=True):
+        st.markdown("**This run**")
+        if run_snapshot["stages"]:
+            st.dataframe(stage_rows(run_snapshot), hide_index=True)
+        else:
+            st.caption("Nothing was parsed, validated or rendered (all served from cache).")
+        counters = server_snapshot["counters"]
+        st.markdown("**Since server start**")
+        st.caption(f"{counters['records']:,} records &middot; {counters['objects']:,} objects &middot; "
+                   f"{counters['bytes'] / 1e6:,.1f} MB parsed &middot; {counters['failed']:,} failing objects")
+        if server_snapshot["stages"]:
+            st.dataframe(stage_rows(server_snapshot), hide_index=True)
+        if METRICS_FILE:
+            st.caption(f"Exported to `{METRICS_FILE}`")
+
+
+@st.fragment
+def render_history_sidebar():
+    """Sidebar history list. Searching, filtering, paging and clearing rerun only this
+    fragment, never the validation on the main page.
+    """
+    st.markdown("### Validation History")
+    history = get_history(HISTORY_DB)
+    h_search = st.text_input("Search history", key="history_search", placeholder="jobId, ticker or job name",
+                             on_change=lambda: st.session_state.history_cursors.clear())
+    hf1, hf2 = st.columns(2)
+    h_env = hf1.selectbox("Env", ["All", "PROD", "TEST", "INVALID"], key="history_env",
+                          on_change=lambda: st.session_state.history_cursors.clear())
+    h_failed = hf2.toggle("Failed only", key="history_failed",
+                          on_change=lambda: st.session_state.history_cursors.clear())
+    history_filters = {
+        "search": h_search.strip() or None,
+        "env": None if h_env == "All" else h_env,
+        "failed": True if h_failed else None,
+    }
+    cursors = st.session_state.history_cursors
+    entries = history.query(PAGE_SIZE, cursors[-1] if cursors else None, **history_filters)
+    if not entries and not cursors:
+        st.caption("No matching validations. Parse a log to see history here."
+                   if any(history_filters.values()) else "No validations yet. Parse a log to see history here.")
+    else:
+        # The database is shared by every session on this server, so clearing asks first.
+        if not st.session_state.confirm_clear_history:
+            if st.button("Clear History", key="clear_history"):
+                st.session_state.confirm_clear_history = True
+                st.rerun(scope="fragment")
+        else:
+            st.warning(f"Delete all {history.count():,} validations? The history is shared by "
+                       "everyone using this server.")
+            hc1, hc2 = st.columns(2)
+            if hc1.button("Delete all", key="clear_history_confirm", type="primary"):
+                history.clear()
+                cursors.clear()
+                st.session_state.confirm_clear_history = False
+                st.rerun(scope="fragment")
+            if hc2.button("Cancel", key="clear_history_cancel"):
+                st.session_state.confirm_clear_history = False
+                st.rerun(scope="fragment")
+
+        for entry in entries:
             c = entry["counts"]
             if c["fail"] > 0:
                 css_class = "history-fail"
@@ -644,16 +971,90 @@ with st.sidebar:
                 icon = "&#9989;"
 
             summary = f"{c['pass']}P / {c['fail']}F / {c['warn']}W"
+            timestamp = datetime.fromtimestamp(entry["ts"], EASTERN_TZ).strftime("%m-%d %H:%M:%S")
             st.markdown(
                 f'<div class="history-entry {css_class}">'
                 f'{icon} <strong>{safe(entry["job_name"])}</strong><br>'
                 f'<span style="color:#d4d4d4;">{summary} &middot; {safe(entry["env"])}</span><br>'
-                f'<div class="history-meta">{safe(entry["timestamp"])} &middot; '
+                f'<div class="history-meta">{safe(timestamp)} &middot; '
                 f'Job: {safe(entry["job_id"])}</div>'
                 f'</div>',
                 unsafe_allow_html=True
             )
 
+        hp1, hp2 = st.columns(2)
+        if hp1.button("Newer", key="history_newer", disabled=not cursors):
+            cursors.pop()
+            st.rerun(scope="fragment")
+        if hp2.button("Older", key="history_older", disabled=len(entries) < PAGE_SIZE):
+            cursors.append(entries[-1]["id"])
+            st.rerun(scope="fragment")
+
+
+def load_target_table_input():
+    """The expectations table in effect: an uploaded file, else TARGETS_FILE.
+    Returns (table, cache id, source name, error message); both loaders are cached.
+    """
+    upload = st.session_state.get("targets_upload")
+    try:
+        if upload is not None:
+            table = get_uploaded_target_table(upload.file_id, upload.name, upload.getvalue())
+            return table, upload.file_id, upload.name, None
+        if TARGETS_FILE:
+            mtime = os.path.getmtime(TARGETS_FILE)
+            return get_target_table_file(TARGETS_FILE, mtime), (TARGETS_FILE, mtime), TARGETS_FILE, None
+    except (OSError, UnicodeDecodeError, TargetTableError) as e:
+        return None, None, None, str(e)
+    return None, None, None, None
+
+
+@st.fragment
+def render_target_inputs():
+    """Target and expectation inputs. Typing here reruns only this fragment; the page is
+    rerun only when a parsed log is on screen and its results depend on the new values.
+    """
+    st.markdown('<span class="collapsible-note">(Collapsible)</span>', unsafe_allow_html=True)
+    st.write("Enter values for this specific run. Blank fields will remain neutral.")
+    c1, c2, c3 = st.columns(3)
+    c1.text_input("Target Ticker Value", key="input_t1")
+    c2.text_input("Target Scaling Factor", key="input_t2")
+    c3.text_input("Target Observation Period", key="input_t3")
+
+    st.divider()
+    c4, c5, c6 = st.columns(3)
+    c4.text_input("Expected Agent ID", key="input_t4")
+    c5.text_input("Expected Job Name", key="input_t5")
+    c6.text_input("Expected Eco Ticker", key="input_t6")
+
+    st.divider()
+    st.file_uploader(
+        "Per-ticker expectations table (CSV or JSON)", type=["csv", "json"], key="targets_upload",
+        help="Columns: tickerValue and/or ecoticker, plus any of scalingFactor, observationPeriod, "
+             "agentId, jobName. Each object is checked against its own row; the fields above fill blanks."
+    )
+    target_table, target_table_id, source, error = load_target_table_input()
+    if error:
+        st.error(f"Cannot load expectations table: {error}")
+    if target_table is not None:
+        st.caption(f"{len(target_table):,} tickers loaded from {source}.")
+
+    current = tuple(st.session_state.get(key, "") for key in INPUT_KEYS[1:]) + (target_table_id,)
+    if st.session_state.get("active_log") and current != st.session_state.get("applied_targets"):
+        st.rerun()
+
+
+# --- SIDEBAR: VALIDATION HISTORY ---
+with st.sidebar:
+    single_element_render = st.toggle(
+        "Fast rendering", value=True, key="single_element_render",
+        help="Send each object's table and job details as one HTML block instead of per-field widgets."
+    )
+    show_timings = st.toggle(
+        "Show timings", value=False, key="show_timings",
+        help="Debug panel with per-stage timings for this run and totals since the server started."
+    )
+    render_history_sidebar()
+
 # --- HEADER SECTION ---
 st.title("Bloomberg BORG Jobs Verification")
 st.markdown("""
@@ -669,38 +1070,121 @@ st.markdown(
 )
 
 # --- TARGET INPUTS ---
-with st.expander("&#127919; Target Values (Scenario-Specific Inputs)"):
-    st.markdown('<span class="collapsible-note">(Collapsible)</span>', unsafe_allow_html=True)
-    st.write("Enter values for this specific run. Blank fields will remain neutral.")
-    c1, c2, c3 = st.columns(3)
-    t_ticker = c1.text_input("Target Ticker Value", key="input_t1")
-    t_scaling = c2.text_input("Target Scaling Factor", key="input_t2")
-    t_period = c3.text_input("Target Observation Period", key="input_t3")
+# Read from session state before the fragment draws the widgets, and recorded as the
+# values this page run validates with; the fragment compares against them.
+t_ticker, t_scaling, t_period, e_agent, e_jobname, e_ecoticker = (
+    st.session_state.get(key, "") for key in INPUT_KEYS[1:]
+)
+target_table, target_table_id, _, _ = load_target_table_input()
+st.session_state.applied_targets = (t_ticker, t_scaling, t_period, e_agent, e_jobname, e_ecoticker,
+                                    target_table_id)
 
-    st.divider()
-    c4, c5, c6 = st.columns(3)
-    e_agent = c4.text_input("Expected Agent ID", key="input_t4")
-    e_jobname = c5.text_input("Expected Job Name", key="input_t5")
-    e_ecoticker = c6.text_input("Expected Eco Ticker", key="input_t6")
+with st.expander("&#127919; Target Values (Scenario-Specific Inputs)"):
+    render_target_inputs()
 
 raw_input = st.text_area("Paste Raw Log Entry Here:", height=150, key="raw_log_input")
 parse_btn = st.button("Parse and Validate Log", type="primary")
 
+# --- WATCH MODE ---
+with st.expander("&#128225; Watch a Local Log File"):
+    st.write("Follow a bbds_ledger.py log and validate records as they are appended. "
+             "Uses the target values above as they are when watching starts.")
+    watch_path = st.text_input("Log file path", value=WATCH_LOG_FILE, key="watch_path_input")
+    watch_from_start = st.checkbox("Read lines already in the file", key="watch_from_start",
+                                   help="Only applies when there is no saved offset for this file.")
+    w1, w2, _ = st.columns([1, 1, 4])
+    if w1.button("Start Watching", disabled=not watch_path):
+        if os.path.isfile(watch_path):
+            start_watch(watch_path, (t_ticker, t_scaling, t_period), current_rules()[0], watch_from_start,
+                        target_table)
+        else:
+            st.error(f"No such file: {watch_path}")
+    if w2.button("Stop", disabled=not st.session_state.get("watch_path")):
+        stop_watch(st.session_state.pop("watch_path"))
+
+if st.session_state.get("watch_path") in get_followers():
+    render_watch_panel(st.session_state.watch_path)
+
+# --- FETCH BY JOB ID ---
+with st.expander("&#128269; Fetch Jobs from Humio"):
+    if not HUMIO_API_URL:
+        st.info("Set HUMIO_API_URL (and HUMIO_REPOSITORY / HUMIO_API_TOKEN) to fetch ledger records by jobId.")
+    else:
+        st.write(f"Searches `{HUMIO_REPOSITORY}` over the last {HUMIO_QUERY_START} and validates every "
+                 "ledger record found, using the target values above.")
+        humio_ids = st.text_area("jobIds (one per line, or comma separated)", height=100, key="humio_job_ids")
+        if st.button("Fetch and Validate", disabled=not humio_ids.strip()):
+            with st.spinner("Querying Humio..."):
+                st.session_state.humio_jobs = fetch_humio_jobs(
+                    parse_job_ids(humio_ids), (t_ticker, t_scaling, t_period), current_rules()[0],
+                    target_table,
+                )
+        if st.session_state.get("humio_jobs"):
+            render_job_results(st.session_state.humio_jobs, "humio")
+
+# --- INDEXED LOG LOOKUP ---
+with st.expander("&#128194; Look Up Records in a Log File"):
+    st.write("Finds a job's records in a large log through a sidecar byte-offset index and validates "
+             "only those, using the target values above. The first lookup indexes the whole log; later "
+             "ones only index what was appended since.")
+    lookup_path = st.text_input("Log file path", value=WATCH_LOG_FILE, key="lookup_path_input")
+    l1, l2 = st.columns([1, 3])
+    lookup_field = l1.selectbox("Field", list(INDEX_FIELDS), key="lookup_field")
+    lookup_value = l2.text_input("Value", key="lookup_value")
+    if st.button("Look Up and Validate", disabled=not (lookup_path and lookup_value.strip())):
+        if not os.path.isfile(lookup_path):
+            st.error(f"No such file: {lookup_path}")
+        else:
+            try:
+                with st.spinner("Updating the index..."):
+                    jobs, added, stopped_at = lookup_indexed_jobs(
+                        lookup_path, lookup_field, lookup_value.strip(), (t_ticker, t_scaling, t_period),
+                        current_rules()[0], target_table,
+                    )
+                st.session_state.lookup_jobs = jobs
+                st.session_state.lookup_added = added
+                st.session_state.lookup_stopped_at = stopped_at
+            except (OSError, sqlite3.Error) as e:
+                st.error(f"Cannot index {lookup_path}: {e}")
+    if "lookup_jobs" in st.session_state:
+        if st.session_state.lookup_added:
+            st.caption(f"{st.session_state.lookup_added:,} newly appended records indexed.")
+        if st.session_state.lookup_stopped_at is not None:
+            st.caption(f"Indexing stopped at byte {st.session_state.lookup_stopped_at:,}: the record there "
+                       "has not closed yet, so it is not searchable until a later lookup.")
+        if st.session_state.lookup_jobs:
+            render_job_results(st.session_state.lookup_jobs, "lookup")
+        else:
+            st.info("No matching records.")
+
+# --- COMPARE TWO RUNS ---
+with st.expander("&#128260; Compare Two Runs"):
+    render_compare_panel()
+
 st.divider()
 
-has_targets = any((t_ticker, t_scaling, t_period))
+has_targets = any((t_ticker, t_scaling, t_period)) or target_table is not None
+
+# --- MAIN VALIDATION ---
+# The parsed log is kept in session state so widget interactions (filters, object picker,
+# target inputs) re-render the current job instead of dropping back to the empty state.
+if parse_btn:
+    st.session_state.active_log = raw_input
+    st.session_state.active_key = payload_key(raw_input)
+active_log = st.session_state.get("active_log")
 
-# --- MAIN VALIDATION (only runs when button is clicked) ---
-if parse_btn and raw_input:
+if active_log:
     try:
-        data_all = extract_json(raw_input)
-        if data_all is None:
+        active_key = st.session_state.active_key
+        payload = load_payload(active_log, active_key)
+        if payload is None:
             st.error("No JSON block detected in the pasted input.")
         else:
-            obj_list = data_all.get('data', {}).get('objects', [])
-            job_props = data_all.get('data', {}).get('jobProperties', {})
-            job_meta = data_all.get('data', {}).get('jobMetadata', {})
-            pub_time_str = data_all.get('metadata', {}).get('bbds.context.publishTime')
+            data_all = payload["data_all"]
+            job_props = payload["job_props"]
+            job_meta = payload["job_meta"]
+            pub_time_str = payload["pub_time_str"]
+            rules, rules_id = current_rules()
 
             # Parse timestamp once and reuse
             pub_dt = parse_publish_time(pub_time_str)
@@ -714,114 +1198,64 @@ if parse_btn and raw_input:
                     unsafe_allow_html=True
                 )
 
-            # --- Multi-object tabs vs single render ---
-            if len(obj_list) > 1:
-                tab_labels = [f"Object {i + 1}" for i in range(len(obj_list))]
-                tabs = st.tabs(tab_labels)
-            else:
-                tabs = None
-
-            for i, obj in enumerate(obj_list):
-                # Use tab container if multiple objects, otherwise main page
-                if tabs is not None:
-                    obj_container = tabs[i]
-                else:
-                    obj_container = st
-
-                meta = obj.get('objectMetadata', {})
-                content = obj.get('objectContent', [{}])[0].get('contentMetadata', {})
-                is_borg = meta.get('isBorgTest')
-
-                # Pre-compute verification results
-                rows_with_status, counts = build_verification_rows(
-                    meta, is_borg, (t_ticker, t_scaling, t_period)
+            # Validation is cheap; rendering is not. Validate every object up front, then
+            # render full detail only for what is on screen.
+            # Cached per (payload, targets, expectations, rules, targets table): editing a target revalidates
+            # from the cached payload without re-parsing the log.
+            targets = (t_ticker, t_scaling, t_period)
+            expectations = (e_agent, e_jobname, e_ecoticker)
+            _, result_cache = get_caches()
+            result_key = (active_key, targets, expectations, rules_id, target_table_id)
+            items = result_cache.get(result_key)
+            if items is None:
+                with run_metrics.stage("validate"):
+                    items = evaluate_objects(payload["objects"], targets, rules, job_props, job_meta,
+                                             expectations, target_table)
+                run_metrics.inc("objects", len(items))
+                run_metrics.inc("failed", sum(1 for item in items if item["counts"]["fail"]))
+                result_cache.put(result_key, items)
+            job = {
+                "data_all": data_all,
+                "job_props": job_props,
+                "job_meta": job_meta,
+                "pub_dt": pub_dt,
+                "pub_time_str": pub_time_str,
+                "has_targets": has_targets,
+            }
+
+            with run_metrics.stage("render"):
+                if len(items) > 1:
+                    render_object_browser(items, job)
+                elif items:
+                    render_object_detail(items[0], job)
+
+            # Add to history once per parse, with the counts totalled over every object
+            if parse_btn and items:
+                add_to_history(
+                    (data_all.get('key') or {}).get('jobId'),
+                    job_props.get('jobName'),
+                    items[0]["env"],
+                    {name: sum(item["counts"][name] for item in items) for name in CATEGORIES},
+                    pub_time_str,
+                    [meta.get("tickerValue") for meta, _ in payload["objects"]],
                 )
 
-                # --- Summary Banner ---
-                render_summary_banner(obj_container, counts)
-
-                # Environment header
-                if is_borg == "YES":
-                    obj_container.markdown(
-                        '<div class="env-header env-test">TEST / DEV / BETA (isBorgTest=YES)</div>',
-                        unsafe_allow_html=True
-                    )
-                    env_label = "TEST"
-                elif is_borg == "NO":
-                    obj_container.markdown(
-                        '<div class="env-header env-prod">PRODUCTION &#9888;&#65039; '
-                        '(Ready for Results - isBorgTest=NO)</div>',
-                        unsafe_allow_html=True
-                    )
-                    env_label = "PROD"
-                else:
-                    if is_borg:
-                        msg = f"INVALID: isBorgTest is '{safe(is_borg)}'"
-                    else:
-                        msg = "MISSING: isBorgTest is NULL"
-                    obj_container.markdown(
-                        f'<div class="env-header env-invalid">{msg}</div>',
-                        unsafe_allow_html=True
-                    )
-                    env_label = "INVALID"
-
-                # Publish timestamp banner
-                if pub_dt:
-                    formatted_utc, formatted_eastern, tz_label = format_timestamp(pub_dt)
-                    eastern_part = ""
-                    if formatted_eastern:
-                        eastern_part = (
-                            f' <em style="color:#636366; font-size:0.85em;">'
-                            f'({formatted_eastern} {tz_label})</em>'
-                        )
-                    obj_container.markdown(
-                        f'<div class="pub-time-banner">Payload Timestamp: '
-                        f'<strong>{formatted_utc} UTC</strong>{eastern_part}</div>',
-                        unsafe_allow_html=True
-                    )
-                elif pub_time_str:
-                    obj_container.markdown(
-                        f'<div class="pub-time-banner">Payload Timestamp: '
-                        f'<strong>{safe(pub_time_str)}</strong> (unparseable)</div>',
-                        unsafe_allow_html=True
-                    )
-
-                col1, col2 = obj_container.columns([3, 2])
-
-                with col1:
-                    render_verification_table(col1, rows_with_status, has_targets)
-
-                with col2:
-                    parsed_job_id = render_job_details(
-                        col2, meta, content, job_props, job_meta, data_all,
-                        (e_agent, e_jobname, e_ecoticker)
-                    )
-                    obj_container.button(
-                        "&#9851;&#65039; Reset Form",
-                        on_click=reset_form,
-                        key=f"reset_{i}"
-                    )
-
-                # Add to history (only for first object to avoid duplicates)
-                if i == 0:
-                    add_to_history(
-                        data_all.get('key', {}).get('jobId'),
-                        job_props.get('jobName'),
-                        env_label,
-                        counts,
-                        pub_time_str
-                    )
-
-            # --- Collapsible Raw JSON Viewer ---
-            with st.expander("&#128196; Raw Parsed JSON"):
-                st.json(data_all)
+            # --- Raw JSON Viewer (nothing is sent until it is switched on) ---
+            render_raw_json_viewer(data_all)
 
     except json.JSONDecodeError as e:
         st.error(f"Invalid JSON: {e}")
+    except RecordShapeError as e:
+        st.error(f"Not a ledger record: {e}")
     except Exception as e:
         st.error(f"Error ({type(e).__name__}): {e}")
         st.exception(e)
 else:
     # --- Empty State Guidance ---
-    if not parse_btn:
-        render_empty_state()
+    render_empty_state()
+
+# --- METRICS ---
+get_app_metrics().merge(run_metrics)
+export_metrics()
+if show_timings:
+    render_timings_panel(run_metrics.snapshot(), get_app_metrics().snapshot())
@@ -0,0 +1,36 @@
+import time
+
+from ledger_cache import TTLCache, payload_key
+
+
+def test_payload_key_is_a_stable_content_hash():
+    assert payload_key("log text") == payload_key("log text")
+    assert payload_key("log text") != payload_key("log text ")
+    assert payload_key("\ud800") == payload_key("\ud800")  # lone surrogates from pasted text
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TTLCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_weight_cap_evicts_and_rejects_oversized_values():
+    cache = TTLCache(max_entries=10, max_weight=100)
+    cache.put("a", "x", weight=60)
+    cache.put("b", "y", weight=60)
+    assert cache.get("a") is None and cache.get("b") == "y"
+    cache.put("huge", "z", weight=101)
+    assert cache.get("huge") is None and len(cache) == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = TTLCache(ttl_seconds=0.05)
+    cache.put("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.06)
+    assert cache.get("a", "gone") == "gone" and len(cache) == 0
@@ -0,0 +1,91 @@
+import json
+import random
+
+import pytest
+
+from ledger_batch import validate_records
+from ledger_columnar import iter_table_results, validate_columnar
+from ledger_core import DEFAULT_RULE_SPEC, compile_rules
+from ledger_synth import iter_log_lines
+from ledger_targets import parse_target_table
+
+TARGETS = ("CPI YOY Index", "1", "2024-03")
+# Values a field may hold besides the usual strings, lists of equal length included.
+ODD_VALUES = [None, "", " ", "YES", "NO", "1", 1, 1.0, True, False, 0, [1, 2], [3, 4], ["YES", "NO"],
+              {"a": 1}]
+RULES = compile_rules(DEFAULT_RULE_SPEC + [
+    {"label": "wire", "path": "objectMetadata.wireId", "type": "regex", "expected": r"7\d+"},
+    {"label": "scale", "path": "objectMetadata.scalingFactor", "type": "range", "expected": [0, 10]},
+    {"label": "src", "path": "contentMetadata.sourceUrl", "type": "fixed", "expected": "x"},
+    {"label": "cls", "path": "objectMetadata.class", "type": "fixed", "expected": "1",
+     "when": {"objectMetadata.isBorgTest": "YES"}},
+])
+
+
+@pytest.fixture(scope="module")
+def records():
+    lines = iter_log_lines(120, 3, 128, seed=5)
+    records = [json.loads(line[line.index("{"):]) for line in lines]
+    rng = random.Random(1)
+    for record in records:
+        for obj in record["data"]["objects"]:
+            meta = obj["objectMetadata"]
+            for field in ("isBorgTest", "sendToBorg", "scalingFactor", "tickerValue", "wireId", "class"):
+                if rng.random() < 0.3:
+                    meta[field] = rng.choice(ODD_VALUES)
+    return records
+
+
+def per_object(records, targets, target_table=None):
+    return [r.as_dict() for r in validate_records(records, targets, RULES, target_table=target_table)]
+
+
+def columnar(records, targets, use_numpy, target_table=None):
+    table = validate_columnar(records, targets, RULES, use_numpy=use_numpy, target_table=target_table)
+    return [r.as_dict() for r in iter_table_results(table)]
+
+
+@pytest.mark.parametrize("targets", [("", "", ""), TARGETS])
+def test_columnar_matches_per_object(records, targets):
+    assert columnar(records, targets, use_numpy=False) == per_object(records, targets)
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_columnar_matches_per_object_with_target_table(records, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    table = parse_target_table("tickerValue,scalingFactor,observationPeriod\nCPI YOY Index,1,2024-03\n"
+                               "GDP CQOQ Index,6,\n", "csv")
+    assert columnar(records, TARGETS, use_numpy, table) == per_object(records, TARGETS, table)
+
+
+@pytest.mark.parametrize("targets", [("", "", ""), TARGETS])
+def test_numpy_columnar_matches_per_object(records, targets):
+    pytest.importorskip("numpy")
+    assert columnar(records, targets, use_numpy=True) == per_object(records, targets)
+
+
+def test_numpy_columnar_with_list_values_in_every_column(records):
+    pytest.importorskip("numpy")
+    listed = json.loads(json.dumps(records[:3]))
+    for record in listed:
+        for obj in record["data"]["objects"]:
+            obj["objectMetadata"].update(isBorgTest=["YES", "NO"], tickerValue=["a", "b"], scalingFactor=[1, 2])
+    assert columnar(listed, TARGETS, use_numpy=True) == per_object(listed, TARGETS)
+
+
+def test_list_valued_column_stays_one_dimensional():
+    np = pytest.importorskip("numpy")
+    from ledger_columnar import _object_array
+    column = _object_array([[1, 2], [3, 4]])
+    assert column.shape == (2,)
+    assert isinstance(column, np.ndarray)
+
+
+def test_malformed_records_are_skipped_and_counted(records):
+    from ledger_core import ParseTally
+    tally = ParseTally()
+    mixed = [{"data": "ok"}] + records[:5] + [{"data": {"objects": [None]}}]
+    table = validate_columnar(mixed, TARGETS, RULES, use_numpy=False, tally=tally)
+    assert tally.invalid == 2
+    assert [r.as_dict() for r in iter_table_results(table)] == per_object(records[:5], TARGETS)
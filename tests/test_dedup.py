@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from ledger_dedup import BloomFilter, BoundedSet, Deduplicator
+from ledger_synth import iter_log_lines
+
+
+def record_texts(records, seed=0):
+    return [line[line.index("{"):] for line in iter_log_lines(records, 2, 64, seed=seed)]
+
+
+@pytest.mark.parametrize("mode", ["exact", "bloom"])
+def test_duplicates_and_replays_are_skipped_once_seen(mode):
+    texts = record_texts(20)
+    replay = json.dumps(json.loads(texts[3]), indent=1)  # same identities, different bytes
+    dedup = Deduplicator(mode)
+    kept = list(dedup.iter_records(texts + texts[:5] + [replay]))
+    assert [r["key"]["jobId"] for r in kept] == [json.loads(t)["key"]["jobId"] for t in texts]
+    summary = dedup.summary()
+    assert (summary["records"], summary["duplicates"], summary["replays"]) == (26, 5, 1)
+    assert summary["top_jobs"][0] == {"jobId": json.loads(texts[3])["key"]["jobId"], "skipped": 2}
+
+
+def test_malformed_blocks_are_neither_counted_nor_duplicates():
+    texts = record_texts(3)
+    broken = texts[0][:40]
+    dedup = Deduplicator()
+    kept = list(dedup.iter_records([broken, texts[0], broken, texts[1], broken]))
+    assert len(kept) == 2
+    assert (dedup.records, dedup.duplicates, dedup.replays) == (2, 0, 0)
+    assert list(dedup.iter_texts([broken, texts[2], texts[2]])) == [broken, texts[2]]
+    assert (dedup.records, dedup.duplicates) == (4, 1)
+
+
+def test_bounded_set_forgets_the_oldest():
+    seen = BoundedSet(max_entries=2)
+    assert [seen.add(k) for k in (b"a", b"b", b"a", b"c")] == [False, False, True, False]
+    assert b"a" not in seen and b"c" in seen
+
+
+def test_bloom_filter_rotates_generations():
+    bloom = BloomFilter(capacity=100, error_rate=0.01)
+    keys = [bytes([i, j]) * 8 for i in range(3) for j in range(100)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys[-100:])
+    assert sum(key in bloom for key in keys[:100]) < 10  # two generations back: forgotten
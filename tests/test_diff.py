@@ -0,0 +1,69 @@
+import copy
+import json
+import random
+
+from ledger_diff import (
+    ENV_DIFF_PATHS, MISSING, diff_logs, diff_records, diff_to_dict, is_identical, parse_ignore, subtree_digests,
+)
+from ledger_synth import make_record
+
+
+def test_digests_ignore_key_order_but_not_types():
+    a, b = {"a": 1, "b": {"c": [1, "2"]}}, {"b": {"c": [1, "2"]}, "a": 1}
+    assert subtree_digests(a)[id(a)] == subtree_digests(b)[id(b)]
+    c = {"a": 1, "b": {"c": [1, 2]}}
+    assert subtree_digests(a)[id(a)] != subtree_digests(c)[id(c)]
+
+
+def test_test_and_prod_runs_differ_only_in_environment_fields():
+    prod = make_record(random.Random(1), 1, objects=3)
+    test = copy.deepcopy(prod)
+    test["key"]["jobId"] = "other"
+    test["metadata"]["bbds.context.publishTime"] = "2024-03-12T13:00:00.000Z"
+    for obj in test["data"]["objects"]:
+        obj["objectMetadata"]["isBorgTest"] = "YES"
+    assert not is_identical(diff_records(prod, test))
+    assert is_identical(diff_records(prod, test, parse_ignore(ENV_DIFF_PATHS)))
+
+
+def test_objects_pair_by_ticker_and_report_only_changed_fields():
+    a = {"key": {"jobId": "1"}, "data": {"objects": [
+        {"objectMetadata": {"tickerValue": "A", "scalingFactor": "1"}},
+        {"objectMetadata": {"tickerValue": "B", "scalingFactor": "1"}},
+        {"objectMetadata": {"tickerValue": "C"}},
+    ]}}
+    b = {"key": {"jobId": "1"}, "data": {"objects": [
+        {"objectMetadata": {"tickerValue": "B", "scalingFactor": "6"}},
+        {"objectMetadata": {"tickerValue": "A", "scalingFactor": "1"}},
+        {"objectMetadata": {"tickerValue": "D"}},
+    ]}}
+    diff = diff_records(a, b)
+    assert diff["job"] == [] and diff["same"] == 1
+    assert diff["objects"] == [{"ticker": "B", "index": (1, 0),
+                                "changes": [(("objectMetadata", "scalingFactor"), "1", "6")]}]
+    assert diff["only_a"] == [{"ticker": "C", "index": 2}] and diff["only_b"] == [{"ticker": "D", "index": 2}]
+    as_dict = diff_to_dict(diff)
+    assert as_dict["objects"][0]["changes"] == [{"path": "objectMetadata.scalingFactor", "a": "1", "b": "6"}]
+    json.dumps(as_dict)
+
+
+def test_missing_and_type_changes():
+    diff = diff_records({"key": {"jobId": 1, "x": 1}}, {"key": {"jobId": "1", "y": 2}})
+    assert sorted(diff["job"], key=repr) == sorted([
+        (("key", "jobId"), 1, "1"), (("key", "x"), 1, MISSING), (("key", "y"), MISSING, 2)], key=repr)
+
+
+def test_logs_pair_records_by_job_name(tmp_path):
+    rng = random.Random(3)
+    first, second, third = (make_record(rng, i) for i in range(3))
+    changed = copy.deepcopy(second)
+    changed["data"]["jobProperties"]["agentId"] = "99"
+    path_a, path_b = tmp_path / "a.log", tmp_path / "b.log"
+    path_a.write_text("".join(f"INFO: {json.dumps(r)}\n" for r in (first, second)))
+    path_b.write_text("".join(f"INFO: {json.dumps(r)}\n" for r in (changed, third, first)))
+    results = list(diff_logs(str(path_a), str(path_b)))
+    assert [(r["jobName"], "diff" in r) for r in results] == [
+        (first["data"]["jobProperties"]["jobName"], True), (second["data"]["jobProperties"]["jobName"], True),
+        (third["data"]["jobProperties"]["jobName"], False)]
+    assert is_identical(results[0]["diff"])
+    assert results[1]["diff"]["job"] == [(("data", "jobProperties", "agentId"), second["data"]["jobProperties"]["agentId"], "99")]
@@ -0,0 +1,56 @@
+import pytest
+
+from ledger_history import HistoryStore, parse_age
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = HistoryStore(str(tmp_path / "history.db"), batch_size=100, flush_seconds=3600)
+    for i in range(30):
+        store.add(f"job-{i % 10}", f"ECO_RELEASE_{i % 3:03d}", "PROD" if i % 2 else "TEST",
+                  {"pass": 5, "fail": i % 4 == 0}, tickers=("CPI YOY Index", f"T{i % 5}", ""), ts=1000 + i)
+    yield store
+    store.close()
+
+
+def test_queued_runs_are_visible_to_reads_and_persist(store, tmp_path):
+    assert store.count() == 30
+    store.close()
+    reopened = HistoryStore(str(tmp_path / "history.db"))
+    assert reopened.count() == 30
+    reopened.close()
+
+
+def test_filters(store):
+    assert store.count(job_id="job-3") == 3
+    assert store.count(env="PROD", failed=True) == 0  # failures are on even i, all TEST
+    assert store.count(failed=True) == 8
+    assert store.count(ticker="T2") == 6
+    assert store.count(since=1010, until=1020) == 10
+    assert store.count(search="ECO_RELEASE_00") == 30  # jobName prefix
+    assert store.count(search="T4") == 6  # ticker
+    run = store.query(job_id="job-9", limit=1)[0]
+    assert (run["job_name"], run["env"], run["counts"]["pass"]) == ("ECO_RELEASE_002", "PROD", 5)
+    assert sorted(run["tickers"]) == ["CPI YOY Index", "T4"]
+
+
+def test_keyset_pages_cover_every_run_once(store):
+    ids, before = [], None
+    while True:
+        page = store.query(limit=7, before_id=before)
+        if not page:
+            break
+        ids += [run["id"] for run in page]
+        before = page[-1]["id"]
+    assert ids == sorted(ids, reverse=True) and len(set(ids)) == 30
+
+
+def test_clear(store):
+    store.clear()
+    assert store.count() == 0 and store.count(ticker="T1") == 0
+
+
+def test_parse_age():
+    assert [parse_age(a) for a in ("15m", "36h", " 7D", "1.5w")] == [900, 129600, 604800, 907200]
+    with pytest.raises(ValueError):
+        parse_age("yesterday")
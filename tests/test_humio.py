@@ -0,0 +1,74 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from ledger_humio import HumioClient, iter_line_records, job_query, parse_job_ids
+
+
+class StubHumio(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so pooled connections can be reused
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        server = self.server
+        with server.lock:
+            server.requests.append((self.path, self.headers.get("Authorization"), body["queryString"]))
+            server.clients.add(self.client_address)
+        job_id = json.loads(body["queryString"])
+        if job_id == "broken":
+            payload, status = b"search failed", 500
+        else:
+            record = json.dumps({"key": {"jobId": job_id}})
+            events = [{"@rawstring": f"INFO publishing ledger record: {record}"}, {"other": 1}]
+            payload, status = "".join(json.dumps(e) + "\n" for e in events).encode(), 200
+        self.send_response(status)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def humio():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHumio)
+    server.lock, server.requests, server.clients = threading.Lock(), [], set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def client_for(server, **options):
+    host, port = server.server_address[:2]
+    return HumioClient(f"http://{host}:{port}/humio", "ledger repo", token="t0k", **options)
+
+
+def test_jobs_are_fetched_in_order_with_errors_kept_per_job(humio):
+    client = client_for(humio)
+    fetched = list(client.fetch_jobs(["a", "broken", "b", "a"], workers=4))
+    client.close()
+    assert [job_id for job_id, _, _ in fetched] == ["a", "broken", "b"]
+    assert [r["key"]["jobId"] for r in iter_line_records(fetched[0][1])] == ["a"]
+    assert fetched[1][1] == [] and "HTTP 500" in str(fetched[1][2])
+    path, auth, _ = humio.requests[0]
+    assert path == "/humio/api/v1/repositories/ledger%20repo/query" and auth == "Bearer t0k"
+
+
+def test_connections_are_reused_and_responses_cached(humio):
+    client = client_for(humio)
+    for job_id in ("a", "b", "c", "a", "b"):
+        assert len(client.fetch_job(job_id)) == 1
+    client.close()
+    assert len(humio.requests) == 3  # the repeats came from the cache
+    assert len(humio.clients) == 1  # one keep-alive connection served them all
+
+
+def test_query_and_id_parsing():
+    assert json.loads(job_query('we"ird\\id')) == 'we"ird\\id'
+    assert parse_job_ids("a, b\nc a  d") == ["a", "b", "c", "d"]
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from ledger_index import LogIndex, index_file_for, iter_span_records, record_keys
+
+
+def _record(job, tickers, agent="7"):
+    return {"key": {"jobId": job}, "data": {
+        "jobProperties": {"agentId": agent}, "jobMetadata": {"ecoticker": f"E{job}"},
+        "objects": [{"objectMetadata": {"tickerValue": t}} for t in tickers]}}
+
+
+def _line(record):
+    return f"2024-03-12 INFO published: {json.dumps(record)}\n"
+
+
+def test_record_keys_are_distinct_and_skip_non_scalar_values():
+    keys = record_keys({"key": {"jobId": 12}, "data": {
+        "jobProperties": {"agentId": ["x"]},
+        "objects": [{"objectMetadata": {"tickerValue": "A"}}, {"objectMetadata": {"tickerValue": "A"}}, 3]}})
+    assert keys == [("jobId", "12"), ("tickerValue", "A")]
+
+
+def test_lookup_seeks_to_matching_records_and_update_only_scans_appended_bytes(tmp_path):
+    log = tmp_path / "ledger.log"
+    log.write_text(_line(_record("1", ["A", "B"])) + "not a record {broken\n" + _line(_record("2", ["B"], agent="8")))
+    with LogIndex(str(log)) as index:
+        assert index.index_path == index_file_for(str(log))
+        assert index.update() == 2 and index.skipped == 1
+        spans = index.lookup({"tickerValue": "B"})
+        assert [r["key"]["jobId"] for r in iter_span_records(str(log), spans)] == ["1", "2"]
+        assert [r["key"]["jobId"] for r in iter_span_records(
+            str(log), index.lookup({"tickerValue": ["A", "B"], "agentId": "8"}))] == ["2"]
+
+        tail = _line(_record("3", ["C"]))
+        with open(log, "a") as f:
+            f.write(tail[:40])
+        assert index.update() == 0
+        assert index.stopped_at is not None and index.pending == log.stat().st_size - index.stopped_at
+        with open(log, "a") as f:
+            f.write(tail[40:])
+        assert index.update() == 1 and index.stopped_at is None
+        assert index.stats()["records"] == 3 and index.stats()["indexed_to"] == index.stats()["log_bytes"] - 1
+        assert [r["key"]["jobId"] for r in iter_span_records(str(log), index.lookup({"jobId": "3"}))] == ["3"]
+
+
+def test_rotated_log_is_indexed_again_and_index_persists(tmp_path):
+    log = tmp_path / "ledger.log"
+    log.write_text(_line(_record("1", ["A"])) + _line(_record("2", ["B"])))
+    with LogIndex(str(log), str(tmp_path / "idx" / "ledger.sqlite3")) as index:
+        assert index.update() == 2
+    with LogIndex(str(log), str(tmp_path / "idx" / "ledger.sqlite3")) as index:
+        assert index.update() == 0 and index.stats()["records"] == 2
+        log.write_text(_line(_record("9", ["Z"])))
+        assert index.update() == 1
+        assert index.lookup({"jobId": "1"}) == []
+        assert index.stats()["keys"]["tickerValue"] == 1
+
+
+def test_lookup_rejects_unknown_fields(tmp_path):
+    log = tmp_path / "ledger.log"
+    log.write_text(_line(_record("1", ["A"])))
+    with LogIndex(str(log)) as index:
+        index.update()
+        for filters in ({"nope": "1"}, {}, {"jobId": []}):
+            with pytest.raises(ValueError):
+                index.lookup(filters)
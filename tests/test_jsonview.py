@@ -0,0 +1,45 @@
+import pytest
+
+from ledger_jsonview import (
+    WILDCARD, JsonPathError, format_json_path, parse_json_path, preview_json, resolve_json_path,
+)
+
+PAYLOAD = {"metadata": {"bbds.context.publishTime": "2024-03-12T12:30:00Z"},
+           "data": {"objects": [{"objectMetadata": {"tickerValue": "A"}}, {"objectMetadata": {"tickerValue": "B"}}]}}
+
+
+@pytest.mark.parametrize("path, parts", [
+    ("data.objects[1].objectMetadata", ["data", "objects", 1, "objectMetadata"]),
+    ('metadata["bbds.context.publishTime"]', ["metadata", "bbds.context.publishTime"]),
+    ("data.objects[*].objectMetadata.tickerValue", ["data", "objects", WILDCARD, "objectMetadata", "tickerValue"]),
+    ('a["say \\"hi\\""]', ["a", 'say "hi"']),
+])
+def test_paths_round_trip(path, parts):
+    assert parse_json_path(path) == parts
+    assert parse_json_path(format_json_path(parts)) == parts
+
+
+def test_resolve_json_path():
+    assert resolve_json_path(PAYLOAD, "") is PAYLOAD
+    assert resolve_json_path(PAYLOAD, "data.objects[1].objectMetadata.tickerValue") == "B"
+    assert resolve_json_path(PAYLOAD, 'metadata["bbds.context.publishTime"]').startswith("2024")
+
+
+@pytest.mark.parametrize("path, message", [
+    ("data.objects[2]", "data.objects has no index [2]"),
+    ("data.nope", "data has no key 'nope'"),
+    ("data.objects[*]", "[*] selects many items"),
+    ("data..objects[", "Cannot parse path"),
+])
+def test_bad_paths_say_where_they_stopped(path, message):
+    with pytest.raises(JsonPathError, match=message.replace("[", r"\[").replace("*", r"\*")):
+        resolve_json_path(PAYLOAD, path)
+
+
+def test_preview_is_bounded():
+    value = {"long": "x" * 1000, "items": list(range(100)), "deep": {"a": {"b": {"c": {"d": 1}}}}}
+    preview = preview_json(value, max_depth=3, max_items=10, max_str=20)
+    assert preview["long"] == "x" * 20 + "... (980 more chars)"
+    assert preview["items"] == list(range(10)) + ["... 90 more items"]
+    assert preview["deep"] == {"a": {"b": "{... 1 keys}"}}
+    assert preview_json({str(i): i for i in range(5)}, max_items=2) == {"0": 0, "1": 1, "...": "3 more keys"}
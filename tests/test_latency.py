@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from ledger_core import _parse_iso_fallback, parse_iso_epoch
+from ledger_latency import LatencyStats, format_report
+
+NOW = datetime(2024, 3, 12, 13, 0, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("2024-03-12T13:00:00Z", NOW),
+    ("2024-03-12T13:00:00.5Z", NOW + 0.5),
+    ("2024-03-12 13:00:00.123456789", NOW + 0.123456),
+    ("2024-03-12T14:00:00+01:00", NOW),
+    ("2024-03-12T08:00:00-0500", NOW),
+])
+def test_timestamps_parse_like_the_fallback(text, expected):
+    assert parse_iso_epoch(text) == pytest.approx(expected)
+    assert _parse_iso_fallback(text).timestamp() == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("text", [None, "", "2024-03-12", "2024-W11-2T13:00:00", "2024-02-30T13:00:00Z", 17])
+def test_bad_timestamps_are_none(text):
+    assert parse_iso_epoch(text) is None
+
+
+def result(job, obj, ticker, publish_time):
+    return {"jobId": job, "jobName": f"name-{job}", "object": obj, "tickerValue": ticker, "publishTime": publish_time}
+
+
+def test_drift_summary_against_one_clock():
+    stats = LatencyStats(now=NOW, stale_seconds=900, worst=2)
+    results = [result("a", 0, "T1", "2024-03-12T12:59:58Z"), result("a", 1, "T2", "2024-03-12T12:59:58Z"),
+               result("b", 0, "T1", "2024-03-12T12:00:00Z"), result("c", 0, "T1", "2024-03-12T11:00:00Z"),
+               result("d", 0, "T1", "2024-03-12T10:00:00Z"), result("e", 0, "T1", "not a time")]
+    assert list(stats.track(results)) == results
+    report = stats.summary()
+    assert (report["records"], report["parsed"], report["unparseable"], report["stale"]) == (5, 4, 1, 3)
+    assert (report["min_s"], report["max_s"]) == (2.0, 10800.0)
+    assert [w["jobId"] for w in report["worst"]] == ["d", "c"]  # bounded to the two stalest
+    by_ticker = {row["name"]: row["count"] for row in report["by_ticker"]}
+    assert by_ticker == {"T1": 4, "T2": 1}  # every object's ticker gets its record's drift
+    assert stats.brief()["records"] == 5
+    assert format_report(report)[0].startswith("Publish latency over 4 records (1 unparseable)")
@@ -0,0 +1,63 @@
+import io
+import json
+
+import pytest
+
+from ledger_batch import iter_batch_results
+from ledger_metrics import Histogram, Metrics, prometheus_text, write_prometheus
+from ledger_synth import iter_log_lines
+
+
+def test_histogram_buckets_and_quantiles():
+    hist = Histogram((0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 2.0):
+        hist.observe(seconds)
+    assert hist.counts == [2, 1, 1] and hist.count == 4
+    assert (hist.quantile(0.5), hist.quantile(0.75), hist.quantile(1.0)) == (0.1, 1.0, float("inf"))
+
+
+def test_timed_loads_counts_records_bytes_and_failures():
+    metrics = Metrics()
+    loads = metrics.timed_loads(json.loads)
+    loads('{"a": 1}')
+    with pytest.raises(json.JSONDecodeError):
+        loads("{bad")
+    snap = metrics.snapshot()
+    assert (snap["counters"]["records"], snap["counters"]["bytes"]) == (1, 12)
+    assert snap["stages"]["decode"]["count"] == 2
+
+
+def test_merge_adds_counters_and_histograms():
+    a, b = Metrics(), Metrics()
+    a.observe("validate", 0.001, objects=2)
+    b.observe("validate", 0.002, objects=3)
+    b.inc("failed")
+    a.merge(b)
+    snap = a.snapshot()
+    assert (snap["counters"]["objects"], snap["counters"]["failed"]) == (5, 1)
+    assert snap["stages"]["validate"]["count"] == 2
+
+
+def test_prometheus_text(tmp_path):
+    batch, watch = Metrics({"mode": "batch"}), Metrics({"mode": 'w"1'})
+    batch.observe("scan", 0.00002, records=3)
+    text = prometheus_text([batch, watch])
+    assert text.count("# TYPE borg_ledger_records_total counter") == 1
+    assert 'borg_ledger_records_total{mode="batch"} 3' in text
+    assert 'borg_ledger_records_total{mode="w\\"1"} 0' in text
+    assert 'borg_ledger_stage_seconds_bucket{mode="batch",stage="scan",le="1e-05"} 0' in text
+    assert 'borg_ledger_stage_seconds_bucket{mode="batch",stage="scan",le="+Inf"} 1' in text
+    assert 'borg_ledger_stage_seconds_count{mode="batch",stage="scan"} 1' in text
+    path = tmp_path / "out" / "ledger.prom"
+    write_prometheus(str(path), [batch])
+    assert path.read_text() == prometheus_text([batch]) and [p.name for p in path.parent.iterdir()] == ["ledger.prom"]
+
+
+def test_parallel_workers_count_the_same_records_and_bytes():
+    text = "\n".join(iter_log_lines(200, 2, 64, 0.3, 0.1, seed=2)) + "\n"
+    counters = []
+    for workers in (1, 3):
+        metrics = Metrics()
+        list(iter_batch_results(io.StringIO(text), ("", "", ""), workers, chunk_bytes=4096, metrics=metrics))
+        counters.append({k: metrics.counters[k] for k in ("records", "bytes")})
+    assert counters[0] == counters[1] and counters[0]["records"] > 0
@@ -0,0 +1,99 @@
+import json
+import random
+
+import pytest
+
+from ledger_core import RecordShapeError, validate_record
+from ledger_projection import DECODE_INLINE_CHARS, build_projection, parse_projected, projected_loads
+from ledger_synth import iter_log_lines
+
+loads = projected_loads()
+
+
+def outcome(record):
+    try:
+        return validate_record(record)
+    except RecordShapeError:
+        return "not a record"
+
+
+def record_texts(records, content_bytes, seed=0):
+    return [line[line.index("{"):] for line in iter_log_lines(records, 2, content_bytes, seed=seed)]
+
+
+@pytest.fixture(scope="module")
+def large_record():
+    """A record big enough that objectContent is skipped rather than decoded whole."""
+    text = record_texts(1, DECODE_INLINE_CHARS * 2)[0]
+    record = json.loads(text)
+    record["data"]["objects"][0]["objectContent"][0]["rows"] = [
+        {"k": f"v{i}", "n": i, "f": -1.5e3, "a": [1, True, None, {"x": "\\u00e9"}]} for i in range(100)
+    ]
+    return json.dumps(record)
+
+
+@pytest.mark.parametrize("content_bytes", [64, DECODE_INLINE_CHARS * 2])
+def test_projection_validates_like_json_loads(content_bytes):
+    for text in record_texts(30, content_bytes, seed=2):
+        assert validate_record(loads(text)) == validate_record(json.loads(text))
+
+
+def test_projection_drops_unread_branches(large_record):
+    record = loads(large_record)
+    assert record["key"] == json.loads(large_record)["key"]
+    assert "objectContent" not in record["data"]["objects"][0] or \
+        "body" not in record["data"]["objects"][0]["objectContent"][0]
+
+
+def test_projection_keeps_list_valued_fields():
+    text = json.dumps({"key": {"jobId": ["a", "b"]}, "data": {"objects": [
+        {"objectMetadata": {"tickerValue": [1, 2], "isBorgTest": "NO"}, "pad": "x" * DECODE_INLINE_CHARS}]}})
+    assert loads(text) == {"key": {"jobId": ["a", "b"]}, "data": {"objects": [
+        {"objectMetadata": {"tickerValue": [1, 2], "isBorgTest": "NO"}}]}}
+
+
+@pytest.mark.parametrize("old, new", [
+    ('"rows": [', '"rows": ["a\x01b", '),     # raw control character
+    ('"rows": [', '"rows": ["a\\qb", '),      # invalid escape
+    ('"rows": [', '"rows": [@, '),            # stray character
+    ('"rows": [', '"rows": [['),              # never closes
+])
+def test_malformed_skipped_branch_is_rejected(large_record, old, new):
+    text = large_record.replace(old, new, 1)
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(text)
+    with pytest.raises(json.JSONDecodeError):
+        loads(text)
+
+
+@pytest.mark.parametrize("text", ['{"key": {"jobId": "a"}} x', '{"key": {"jobId": "a"}}}', '{"key": 1,}', "[1] [2]"])
+def test_trailing_data_is_rejected(text):
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(text)
+    with pytest.raises(json.JSONDecodeError):
+        parse_projected(text, build_projection(["key.jobId"]))
+
+
+@pytest.mark.parametrize("old, new", [('"n": 1, ', '"n": 1 '), ('"rows": [', '"rows": [tru, '), ('"rows": [', '"rows": [01, ')])
+def test_tokens_inside_skipped_branch_are_not_parsed(large_record, old, new):
+    # The documented exception: a fault that only token parsing would catch goes unnoticed.
+    text = large_record.replace(old, new, 1)
+    with pytest.raises(json.JSONDecodeError):
+        json.loads(text)
+    assert loads(text)["key"] == json.loads(large_record)["key"]
+
+
+def test_random_mutations_of_small_records_agree_with_json_loads():
+    rng = random.Random(7)
+    texts = record_texts(50, 200, seed=1)
+    for _ in range(3000):
+        text = rng.choice(texts)
+        k = rng.randrange(len(text) + 1)
+        text = text[:k] + rng.choice('{}[]",:\\ x0-.\n\x01') + text[k + rng.randrange(2):]
+        try:
+            expected = json.loads(text)
+        except json.JSONDecodeError:
+            with pytest.raises(json.JSONDecodeError):
+                loads(text)
+        else:
+            assert outcome(loads(text)) == outcome(expected)
@@ -0,0 +1,44 @@
+from ledger_core import build_verification_rows
+from ledger_render import job_details_html, object_panel_html, verification_table_html
+
+META = {"isBorgTest": "NO", "sendToBorg": "YES", "releaseDate": "NO RELEASE DATE", "scalingFactor": "1",
+        "tickerValue": "<script>alert(1)</script>", "observationPeriod": "2024-03", "wireId": "778", "class": "1"}
+DATA_ALL = {"key": {"jobId": "j&1"}}
+JOB_PROPS = {"agentId": "10001", "jobName": "ECO_RELEASE_001"}
+JOB_META = {"ecoticker": "ECO0001"}
+URL = "https://humio.example/job/{job_id}"
+
+
+def test_verification_table_escapes_values_and_shows_targets():
+    rows, counts = build_verification_rows(META, ("CPI YOY Index", "1", ""))
+    html = verification_table_html(rows, has_targets=True)
+    assert "<script>" not in html and "&lt;script&gt;" in html
+    assert html.count('class="verify-row"') == len(rows)
+    assert "<span>Target</span>" in html and "CPI YOY Index" in html
+    assert "&#128640; PROD" in html  # binary isBorgTest row
+    assert counts["fail"] == 1  # tickerValue does not match its target
+
+
+def test_verification_table_without_targets_has_no_target_column():
+    rows, _ = build_verification_rows(META, ("", "", ""))
+    html = verification_table_html(rows, has_targets=False)
+    assert "verify-no-targets" in html and "verify-target" not in html
+
+
+def test_job_details_marks_mismatches_and_links_only_https():
+    html = job_details_html(META, {"sourceUrl": "javascript:alert(1)"}, JOB_PROPS, JOB_META, DATA_ALL,
+                            ("10001", "OTHER_JOB", "ECO9999"), URL)
+    assert "[CQA]" in html
+    assert "Expected: ECO9999" in html and "Exp: OTHER_JOB" in html and "Expected: 10001" not in html
+    assert "<a href='javascript" not in html
+    assert 'href="https://humio.example/job/j&amp;1"' in html
+    linked = job_details_html(META, {"sourceUrl": "https://example.com/r"}, JOB_PROPS, JOB_META, DATA_ALL,
+                              ("", "", ""), URL)
+    assert "<a href='https://example.com/r'" in linked
+
+
+def test_object_panel_is_one_element():
+    rows, _ = build_verification_rows(META, ("", "", ""))
+    html = object_panel_html(rows, False, "<div>details</div>")
+    assert html.startswith('<div class="object-panel">') and html.endswith("</div>")
+    assert html.count('<div class="object-panel">') == 1 and "<div>details</div>" in html
@@ -0,0 +1,40 @@
+import pytest
+
+from ledger_core import DEFAULT_RULE_SPEC, RuleSpecError, compile_rules, compute_row_status
+
+ACTUALS = [None, "", "  ", "YES", "NO", "yes", "1", "1.0", 1, 1.0, True, False, 0, "NO RELEASE DATE",
+           "CPI YOY Index", ["YES"], {"a": 1}]
+GOALS = ["", None, "1", "YES", "NO RELEASE DATE", "CPI YOY Index", 1]
+
+
+@pytest.mark.parametrize("r_type", ["binary", "fixed", "target"])
+def test_compiled_checks_match_compute_row_status(r_type):
+    for goal in GOALS:
+        spec = {"label": "f", "path": "objectMetadata.f", "type": r_type,
+                "expected": "$ticker" if r_type == "target" else goal}
+        if r_type != "target" and not isinstance(goal, str):
+            continue
+        (rule,) = compile_rules([spec])
+        for act in ACTUALS:
+            assert rule.check(act, goal) == compute_row_status(act, goal, r_type), (r_type, act, goal)
+
+
+def test_default_rules_compile():
+    rules = compile_rules(DEFAULT_RULE_SPEC)
+    assert [rule.label for rule in rules] == [spec["label"] for spec in DEFAULT_RULE_SPEC]
+
+
+@pytest.mark.parametrize("spec", [
+    {"label": "x", "path": "nowhere.f", "type": "fixed", "expected": "1"},
+    {"label": "x", "path": "objectMetadata.f", "type": "regex", "expected": "("},
+    {"label": "x", "path": "objectMetadata.f", "type": "range", "expected": [1]},
+])
+def test_bad_rule_specs_are_rejected(spec):
+    with pytest.raises(RuleSpecError):
+        compile_rules([spec])
+
+
+@pytest.mark.parametrize("r_type", ["range", "numeric-range"])
+def test_range_rule(r_type):
+    (rule,) = compile_rules([{"label": "x", "path": "objectMetadata.f", "type": r_type, "expected": [0, None]}])
+    assert [rule.check(act, None)[2] for act in ("3", -1, "x", None)] == ["pass", "fail", "fail", "fail"]
@@ -0,0 +1,127 @@
+import io
+import json
+import random
+
+import pytest
+
+from ledger_core import RecordScanner, extract_json, iter_json_records, iter_record_spans, iter_stream_records
+from ledger_mmap import iter_buffer_records, iter_range_boundaries
+from ledger_synth import iter_log_lines
+
+
+def well_formed_ids(lines):
+    """jobIds of the lines whose record parses on its own, in order."""
+    ids = []
+    for line in lines:
+        try:
+            ids.append(json.loads(line[line.index("{"):])["key"]["jobId"])
+        except (ValueError, KeyError, TypeError):
+            continue
+    return ids
+
+
+def job_ids(records):
+    return [record["key"]["jobId"] for record in records]
+
+
+def scanner_blocks(text, sizes):
+    scanner = RecordScanner()
+    blocks, pos = [], 0
+    for size in sizes:
+        blocks += scanner.feed(text[pos:pos + size])
+        pos += size
+    blocks += scanner.feed(text[pos:])
+    return blocks + scanner.close()
+
+
+@pytest.fixture(scope="module")
+def malformed_log():
+    lines = list(iter_log_lines(300, 2, 200, 0.5, 0.2, seed=3))
+    return "\n".join(lines) + "\n", well_formed_ids(lines)
+
+
+def test_every_well_formed_record_survives_malformed_neighbours(malformed_log):
+    text, expected = malformed_log
+    assert job_ids(iter_json_records(text)) == expected
+
+
+def test_stream_matches_single_pass(malformed_log):
+    text, expected = malformed_log
+    for chunk_size in (1, 7, 64, 4096):
+        assert job_ids(iter_stream_records(io.StringIO(text), chunk_size)) == expected
+
+
+def test_scanner_matches_spans_under_random_chunking(malformed_log):
+    text, _ = malformed_log
+    spans = [text[start:end] for start, end in iter_record_spans(text)]
+    rng = random.Random(0)
+    for _ in range(20):
+        sizes = [rng.randrange(1, 300) for _ in range(len(text) // 150)]
+        assert scanner_blocks(text, sizes) == spans
+
+
+def test_unclosed_brace_costs_only_its_own_record():
+    good = '{"key": {"jobId": "a"}}'
+    text = 'prefix {"key": {"jobId": "cut", "data": {\n' + good + "\n"
+    assert job_ids(iter_json_records(text)) == ["a"]
+    assert [text[s:e] for s, e in iter_record_spans(text)][0] == '{"key": {"jobId": "cut", "data": {'
+
+
+def test_unterminated_string_resyncs_on_next_line():
+    text = '{"key": {"jobId": "cut\n{"key": {"jobId": "b"}}\n'
+    assert job_ids(iter_json_records(text)) == ["b"]
+
+
+def test_pretty_printed_record_spans_lines():
+    text = 'log:\n{\n  "key": {\n    "jobId": "p"\n  }\n}\n'
+    assert job_ids(iter_json_records(text)) == ["p"]
+
+
+RECORD = {"key": {"jobId": "p"}, "data": {"objects": [{"objectMetadata": {"tickerValue": "X", "n": [1, -2.5, True, None]}}]}}
+
+
+@pytest.mark.parametrize("indent", [2, 0])
+def test_pretty_printed_record_after_log_prefix(indent):
+    text = "INFO bbds_ledger.py:212 - publishing ledger record: " + json.dumps(RECORD, indent=indent) + "\n"
+    assert extract_json(text) == RECORD
+    assert [text[s:e] for s, e in iter_record_spans(text)] == [json.dumps(RECORD, indent=indent)]
+
+
+@pytest.mark.parametrize("indent", [2, 0])
+def test_pretty_printed_records_between_log_lines(indent):
+    pretty = json.dumps(RECORD, indent=indent)
+    text = f"2024-03-12 12:30:00,000 INFO ledger: {pretty}\n{pretty}\nDEBUG done\n{pretty}\n"
+    assert job_ids(iter_json_records(text)) == ["p", "p", "p"]
+    assert job_ids(iter_stream_records(io.StringIO(text), 5)) == ["p", "p", "p"]
+
+
+def test_cut_off_record_is_not_continued_by_the_next_log_line():
+    cut = '2024-03-12 12:30:00,000 INFO ledger: {"key": {"jobId": "cut"},\n'
+    text = cut + '2024-03-12 12:30:00,250 INFO ledger: {"key": {"jobId": "b"}}\n{"key": {"jobId": "c"}}\n'
+    assert job_ids(iter_json_records(text)) == ["b", "c"]
+    assert [text[s:e] for s, e in iter_record_spans(text)][0] == '{"key": {"jobId": "cut"},'
+
+
+def test_truncated_tail_is_pending_until_closed():
+    text = '{"key": {"jobId": "a"}}\n{"key": {"jobId": "b"},\n  "data": {'
+    assert [text[s:e] for s, e in iter_record_spans(text, partial=False)] == ['{"key": {"jobId": "a"}}']
+    scanner = RecordScanner()
+    assert scanner.feed(text) == ['{"key": {"jobId": "a"}}']
+    assert scanner.pending == len(text) - text.index('{"key": {"jobId": "b"}')
+    assert scanner.feed("}}\n") == ['{"key": {"jobId": "b"},\n  "data": {}}']
+
+
+def test_scanner_close_breaks_open_block():
+    scanner = RecordScanner()
+    assert scanner.feed('{"key": {"jobId": "a"') == []
+    assert scanner.close() == ['{"key": {"jobId": "a"']
+
+
+def test_range_split_finds_the_same_records(malformed_log):
+    text, expected = malformed_log
+    buf = text.encode()
+    for range_bytes in (1, 100, 5000, 1 << 20):
+        found = []
+        for start, end in iter_range_boundaries(buf, range_bytes):
+            found += job_ids(iter_buffer_records(buf, start, end))
+        assert found == expected
@@ -0,0 +1,103 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from ledger_server import ValidationServer
+from ledger_synth import iter_log_lines
+
+RECORDS = [line[line.index("{"):] for line in iter_log_lines(3, 2, 64, seed=5)]
+
+
+@pytest.fixture(scope="module")
+def server():
+    server = ValidationServer(("127.0.0.1", 0), workers=2, max_body_bytes=1 << 16)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def request(server, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, response.read()
+    finally:
+        conn.close()
+
+
+def post(server, path, body):
+    return request(server, "POST", path, body.encode("utf-8"))
+
+
+def test_valid_record(server):
+    status, body = post(server, "/validate", RECORDS[0])
+    assert status == 200
+    assert json.loads(body)["objects"]
+
+
+@pytest.mark.parametrize("body, message", [
+    ('{"data": "ok"}', "Not a ledger record"),
+    ('{"key": {"jobId": 1}, "data": {"objects": [null]}}', "Not a ledger record"),
+    ('{"key": ', "Invalid JSON"),
+    ("[1, 2]", "No ledger record"),
+    ('{"log": "prefix {\\"key\\": "}', "Invalid JSON in log text"),
+    ('{"record": {}, "targets": [1]}', '"targets" must be an object'),
+    ('{"record": {}, "targets": {"colour": "red"}}', "Unknown targets"),
+])
+def test_validate_bad_request(server, body, message):
+    status, body = post(server, "/validate", body)
+    assert status == 400
+    assert message in json.loads(body)["error"]
+
+
+def test_batch_bad_targets_line(server):
+    status, body = post(server, "/validate/batch", '{"targets": "x"}\n' + RECORDS[0])
+    assert status == 400
+    assert '"targets" must be an object' in json.loads(body)["error"]
+
+
+def test_batch_counts_malformed_records(server):
+    text = "\n".join([RECORDS[0], '{"key": ', '{"data": "ok"}', RECORDS[1]]) + "\n"
+    status, body = post(server, "/validate/batch", text)
+    assert status == 200
+    summary = json.loads(body.splitlines()[-1])["summary"]
+    assert summary["records"] == 2
+    assert summary["malformed"] == 2
+
+
+def test_batch_targets_line_only_counts_first(server):
+    targets = '{"targets": {"ticker": "CPI YOY Index"}}'
+    status, body = post(server, "/validate/batch", "\n".join([targets, RECORDS[0], targets, RECORDS[1]]))
+    assert status == 200
+    lines = [json.loads(line) for line in body.splitlines()]
+    summary = lines[-1]["summary"]
+    assert (summary["records"], summary["malformed"]) == (2, 1)
+    assert summary["targets"]["ticker"] == "CPI YOY Index"
+    assert len(lines) - 1 == sum(len(json.loads(r)["data"]["objects"]) for r in RECORDS[:2])
+
+
+def test_missing_content_length(server):
+    conn = http.client.HTTPConnection(*server.server_address[:2], timeout=10)
+    try:
+        conn.putrequest("POST", "/validate")
+        conn.endheaders()
+        assert conn.getresponse().status == 411
+    finally:
+        conn.close()
+
+
+def test_oversized_body(server):
+    status, _ = post(server, "/validate", "x" * ((1 << 16) + 1))
+    assert status == 413
+
+
+@pytest.mark.parametrize("method, path", [("POST", "/nope"), ("GET", "/nope")])
+def test_unknown_endpoint(server, method, path):
+    status, _ = request(server, method, path, b"{}" if method == "POST" else None)
+    assert status == 404
@@ -0,0 +1,47 @@
+import pytest
+
+from ledger_core import build_verification_rows
+from ledger_targets import TargetTableError, load_target_table, parse_target_table
+
+CSV = "TickerValue,Scaling,observationPeriod,agentId,jobName,ecoticker\n" \
+      "CPI YOY Index,1,2024-03,10001,ECO_RELEASE_001,\n" \
+      ",6,2024-Q1,,,ECO0042\n"
+DEFAULT = ("GLOBAL", "0", "2024-01")
+
+
+def test_lookup_by_ticker_then_ecoticker_with_blanks_from_default():
+    table = parse_target_table(CSV, "csv")
+    assert len(table) == 2
+    assert table.targets_for({"tickerValue": "CPI YOY Index"}, None, DEFAULT) == ("CPI YOY Index", "1", "2024-03")
+    assert table.targets_for({"tickerValue": "OTHER"}, {"ecoticker": "ECO0042"}, DEFAULT) == ("GLOBAL", "6", "2024-Q1")
+    assert table.targets_for({"tickerValue": "OTHER"}, {"ecoticker": "NONE"}, DEFAULT) == DEFAULT
+    assert table.expectations_for({"tickerValue": "CPI YOY Index"}) == ("10001", "ECO_RELEASE_001", "")
+
+
+def test_non_string_keys_match_nothing():
+    table = parse_target_table(CSV, "csv")
+    assert table.lookup({"tickerValue": ["CPI YOY Index"]}, {"ecoticker": {"a": 1}}) is None
+
+
+def test_json_forms_and_file_loading(tmp_path):
+    keyed = parse_target_table('{"CPI YOY Index": {"scalingFactor": 1}}', "json")
+    listed = parse_target_table('[{"tickerValue": "CPI YOY Index", "scalingFactor": "1"}]', "json")
+    assert keyed.by_ticker == listed.by_ticker
+    path = tmp_path / "targets.csv"
+    path.write_text("\ufeff" + CSV, encoding="utf-8")  # spreadsheet exports start with a BOM
+    assert len(load_target_table(path)) == 2
+
+
+@pytest.mark.parametrize("text, fmt", [("", "csv"), ("scaling\n1\n", "csv"), ("{", "json"), ("[1]", "json"),
+                                       ("a", "xml")])
+def test_bad_tables_are_rejected(text, fmt):
+    with pytest.raises(TargetTableError):
+        parse_target_table(text, fmt)
+
+
+def test_each_object_is_checked_against_its_own_row():
+    table = parse_target_table(CSV, "csv")
+    meta = {"tickerValue": "CPI YOY Index", "scalingFactor": "1", "observationPeriod": "2024-03"}
+    rows, _ = build_verification_rows(meta, DEFAULT, target_table=table)
+    statuses = {label: category for label, _, _, r_type, _, _, category in rows if r_type == "target"}
+    assert set(statuses.values()) == {"pass"}
@@ -0,0 +1,84 @@
+import os
+import time
+
+from ledger_synth import iter_log_lines
+from ledger_watch import LogFollower, load_offset, offset_file_for
+
+LINES = [line + "\n" for line in iter_log_lines(8, 2, 32, seed=9)]
+
+
+def append(path, text):
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(text)
+
+
+def job_ids(results):
+    return sorted({r["jobId"] for r in results})
+
+
+def ids_of(lines):
+    return sorted(line.split('"jobId":"')[1].split('"')[0] for line in lines)
+
+
+def test_offset_is_saved_and_resumed(tmp_path):
+    log = tmp_path / "ledger.log"
+    state = offset_file_for(str(log), str(tmp_path / "state"))
+    append(log, "".join(LINES[:3]))
+    follower = LogFollower(str(log), offset_file=state, from_start=True)
+    assert job_ids(follower.poll()) == ids_of(LINES[:3])
+
+    cut = LINES[3].index("{") + 30
+    append(log, LINES[3][:cut])  # a record still being written is held back
+    assert follower.poll() == []
+    assert load_offset(state)[2] == os.path.getsize(log) - 30
+    follower.stop()
+
+    append(log, LINES[3][cut:])
+    resumed = LogFollower(str(log), offset_file=state)
+    assert job_ids(resumed.poll()) == ids_of(LINES[3:4])
+    assert resumed.poll() == []
+    resumed.stop()
+
+
+def test_without_saved_offset_following_starts_at_the_end(tmp_path):
+    log = tmp_path / "ledger.log"
+    append(log, "".join(LINES[:2]))
+    follower = LogFollower(str(log))
+    assert follower.poll() == []
+    append(log, LINES[2])
+    assert job_ids(follower.poll()) == ids_of(LINES[2:3])
+    follower.stop()
+
+
+def test_rotation_and_truncation_restart_from_the_new_start(tmp_path):
+    log = tmp_path / "ledger.log"
+    append(log, LINES[0])
+    follower = LogFollower(str(log), from_start=True)
+    follower.poll()
+    os.rename(log, tmp_path / "ledger.log.1")
+    append(log, LINES[1])
+    assert job_ids(follower.poll()) == ids_of(LINES[1:2])
+    with open(log, "w", encoding="utf-8") as f:  # copytruncate
+        f.write("")
+    append(log, LINES[2][:10])
+    follower.poll()
+    append(log, LINES[2][10:])
+    assert job_ids(follower.poll()) == ids_of(LINES[2:3])
+    assert follower.snapshot()["rotations"] == 2
+    follower.stop()
+
+
+def test_bad_records_are_counted_and_the_thread_keeps_running(tmp_path):
+    log = tmp_path / "ledger.log"
+    append(log, "")
+    follower = LogFollower(str(log), from_start=True, poll_interval=0.01).start()
+    append(log, '{"data": "ok"}\n{"key": \n' + LINES[4])
+    deadline = time.monotonic() + 5
+    while follower.snapshot()["records"] < 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    snap = follower.snapshot()
+    assert snap["running"] and snap["error"] is None
+    assert (snap["records"], snap["invalid"], snap["malformed"]) == (1, 1, 1)
+    assert snap["recent"][0]["jobId"] == ids_of(LINES[4:5])[0]
+    follower.stop()
+    assert not follower.running